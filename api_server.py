@@ -0,0 +1,260 @@
+"""
+本地 HTTP/JSON 接口服务（仅依赖标准库，基于 asyncio）
+
+所有接口均为 POST，请求体和响应体都是 JSON 对象。除注册和登录外，请求体需携带
+登录返回的 user_id 和 session_token。连接默认保持（keep-alive），所有请求共用
+同一份常驻内存的用户数据，同时处理的请求数受 --max-concurrency 限制。
+
+    POST /register     {"username", "password"}
+    POST /login        {"username", "password"}  ->  {"user_id", "session_token"}
+    POST /logout       {"user_id", "session_token"}
+    POST /deposit      {"user_id", "session_token", "amount"}  ->  {"balance"}
+    POST /withdraw     {"user_id", "session_token", "amount"}  ->  {"balance"}
+    POST /balance      {"user_id", "session_token"}  ->  {"balance"}
+    POST /freeze       {"user_id", "session_token"}
+    POST /unfreeze     {"user_id", "session_token"}
+    POST /report-loss  {"user_id", "session_token"}
+
+用法: python api_server.py [--host 127.0.0.1] [--port 8000] [--max-concurrency 64] [--metrics-file FILE]
+"""
+import argparse
+import asyncio
+import json
+import math
+import signal
+from http import HTTPStatus
+from typing import Optional
+from services.account_service import AccountService
+from services.async_service import (AsyncAccountService, AsyncTransactionService, AsyncUserService,
+                                    StorageExecutor)
+from services.transaction_service import TransactionService
+from services.user_service import UserService
+from utils.data_manager import DataManager
+from utils import metrics
+
+# 请求体和请求头的上限
+MAX_BODY_SIZE = 64 * 1024
+MAX_HEADERS = 100
+# 保持连接的空闲超时（秒）
+IDLE_TIMEOUT = 30.0
+DEFAULT_MAX_CONCURRENCY = 64
+
+
+class HttpError(Exception):
+    """请求无法解析，回复错误后关闭连接"""
+
+    def __init__(self, status: int, message: str):
+        self.status = status
+        super().__init__(message)
+
+
+def _require(params: dict, name: str, kind):
+    """取出必填参数并检查类型，不合法时抛出 ValueError"""
+    value = params.get(name)
+    # bool 是 int 的子类，金额不接受 true/false
+    if value is None or not isinstance(value, kind) or isinstance(value, bool):
+        raise ValueError(f"缺少参数或参数类型错误: {name}")
+    # json 模块接受 Infinity / NaN，金额不接受
+    if isinstance(value, float) and not math.isfinite(value):
+        raise ValueError(f"参数取值无效: {name}")
+    return value
+
+
+class BankApiServer:
+    def __init__(self, data_manager: Optional[DataManager] = None, executor: Optional[StorageExecutor] = None,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY, idle_timeout: float = IDLE_TIMEOUT):
+        # 三个服务共享同一份常驻内存的用户数据
+        data_manager = data_manager if data_manager is not None else DataManager()
+        self.user_service = AsyncUserService(UserService(data_manager), executor)
+        self.account_service = AsyncAccountService(AccountService(data_manager), executor)
+        self.transaction_service = AsyncTransactionService(TransactionService(data_manager), executor)
+        self.max_concurrency = max_concurrency
+        self.idle_timeout = idle_timeout
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # 路径 -> (处理函数, 是否需要登录)
+        self._routes = {
+            "/register": (self._register, False),
+            "/login": (self._login, False),
+            "/logout": (self._logout, True),
+            "/deposit": (self._deposit, True),
+            "/withdraw": (self._withdraw, True),
+            "/balance": (self._balance, True),
+            "/freeze": (self._freeze, True),
+            "/unfreeze": (self._unfreeze, True),
+            "/report-loss": (self._report_loss, True),
+        }
+
+    async def _register(self, params: dict, user) -> dict:
+        success, message = await self.user_service.register(_require(params, "username", str),
+                                                            _require(params, "password", str))
+        return {"success": success, "message": message}
+
+    async def _login(self, params: dict, user) -> dict:
+        success, message, user, session_token = await self.user_service.login(
+            _require(params, "username", str), _require(params, "password", str))
+        result = {"success": success, "message": message}
+        if success:
+            result.update(user_id=user.user_id, session_token=session_token)
+        return result
+
+    async def _logout(self, params: dict, user) -> dict:
+        success, message = await self.user_service.logout(user)
+        return {"success": success, "message": message}
+
+    async def _deposit(self, params: dict, user) -> dict:
+        success, message, balance = await self.transaction_service.deposit(
+            user, _require(params, "amount", (int, float)))
+        return {"success": success, "message": message, "balance": balance}
+
+    async def _withdraw(self, params: dict, user) -> dict:
+        success, message, balance = await self.transaction_service.withdraw(
+            user, _require(params, "amount", (int, float)))
+        return {"success": success, "message": message, "balance": balance}
+
+    async def _balance(self, params: dict, user) -> dict:
+        success, message, balance = await self.transaction_service.check_balance(user)
+        return {"success": success, "message": message, "balance": balance}
+
+    async def _freeze(self, params: dict, user) -> dict:
+        success, message = await self.account_service.freeze_account(user)
+        return {"success": success, "message": message}
+
+    async def _unfreeze(self, params: dict, user) -> dict:
+        success, message = await self.account_service.unfreeze_account(user)
+        return {"success": success, "message": message}
+
+    async def _report_loss(self, params: dict, user) -> dict:
+        success, message = await self.account_service.report_loss(user)
+        return {"success": success, "message": message}
+
+    async def handle_request(self, method: str, path: str, body: bytes) -> tuple[int, dict]:
+        """处理一个请求，返回 (HTTP 状态码, 响应 JSON)"""
+        route = self._routes.get(path.split("?", 1)[0])
+        if route is None:
+            return 404, {"success": False, "message": "接口不存在"}
+        if method != "POST":
+            return 405, {"success": False, "message": "只支持 POST 请求"}
+        try:
+            params = json.loads(body) if body else {}
+        except ValueError:
+            params = None
+        if not isinstance(params, dict):
+            return 400, {"success": False, "message": "请求体必须是 JSON 对象"}
+        handler, needs_session = route
+        user = None
+        try:
+            if needs_session:
+                valid, user = await self.user_service.validate_session(
+                    _require(params, "user_id", str), _require(params, "session_token", str))
+                if not valid:
+                    return 401, {"success": False, "message": "会话无效，请重新登录"}
+            return 200, await handler(params, user)
+        except ValueError as e:
+            return 400, {"success": False, "message": str(e)}
+        except Exception as e:
+            # 未预料的错误只影响本次请求，连接上仍按协议回复
+            print(f"处理请求 {path} 时出错: {e!r}")
+            return 500, {"success": False, "message": "服务器内部错误"}
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[tuple]:
+        """读取一个请求，返回 (method, path, body, keep_alive)，客户端关闭连接时返回 None"""
+        line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HttpError(400, "请求行格式错误")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise HttpError(431, "请求头过多")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HttpError(400, "Content-Length 格式错误")
+        if length < 0 or length > MAX_BODY_SIZE:
+            raise HttpError(413, "请求体过大")
+        body = await reader.readexactly(length) if length else b""
+        connection = headers.get("connection", "").lower()
+        # HTTP/1.1 默认保持连接，HTTP/1.0 需显式声明
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+        return method, target, body, keep_alive
+
+    @staticmethod
+    def _write_response(writer: asyncio.StreamWriter, status: int, payload: dict, keep_alive: bool) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """处理一个连接上的所有请求"""
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HttpError as e:
+                    self._write_response(writer, e.status, {"success": False, "message": str(e)}, False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, body, keep_alive = request
+                async with self._semaphore:
+                    status, payload = await self.handle_request(method, path, body)
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ValueError, ConnectionError):
+            # 空闲超时、客户端中途断开或请求行过长
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8000) -> asyncio.AbstractServer:
+        """开始监听，返回 asyncio 服务器对象（port 为 0 时由系统分配端口）"""
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return await asyncio.start_server(self._handle_connection, host, port)
+
+
+async def serve(host: str, port: int, max_concurrency: int, metrics_file: Optional[str] = None) -> None:
+    if metrics_file and hasattr(signal, "SIGUSR1"):
+        # 由事件循环在处理函数之外响应信号，不会打断持有统计锁的代码
+        asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, metrics.write_metrics_in_background,
+                                                      metrics_file)
+    server = await BankApiServer(max_concurrency=max_concurrency).start(host, port)
+    address = server.sockets[0].getsockname()
+    print(f"银行接口服务已启动: http://{address[0]}:{address[1]}")
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="银行卡管理系统 HTTP/JSON 接口服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8000, help="监听端口")
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY,
+                        help="同时处理的最大请求数")
+    parser.add_argument("--metrics-file", help="开启操作耗时统计，收到 SIGUSR1 和退出时写入该文件"
+                                               "（扩展名为 .json 时为 JSON，否则为 Prometheus 文本格式）")
+    args = parser.parse_args()
+    if args.metrics_file:
+        metrics.export_to(args.metrics_file)
+    try:
+        asyncio.run(serve(args.host, args.port, args.max_concurrency, args.metrics_file))
+    except KeyboardInterrupt:
+        print("服务已停止")
+
+
+if __name__ == "__main__":
+    main()
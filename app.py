@@ -1,14 +1,19 @@
+import argparse
 import sys
 from services.user_service import UserService
 from services.account_service import AccountService
 from services.transaction_service import TransactionService
 from models.user import User
+from utils.data_manager import DataManager
+from utils import metrics
 
 class BankSystem:
     def __init__(self):
-        self.user_service = UserService()
-        self.account_service = AccountService()
-        self.transaction_service = TransactionService()
+        # 三个服务共享同一份常驻内存的用户数据
+        data_manager = DataManager()
+        self.user_service = UserService(data_manager)
+        self.account_service = AccountService(data_manager)
+        self.transaction_service = TransactionService(data_manager)
         self.current_user = None
         self.current_session_token = None
 
@@ -136,6 +141,24 @@ class BankSystem:
         print(message)
         if success:
             print(f"当前余额: {balance}")
+            self.show_history()
+
+    def show_history(self):
+        """分页显示交易记录"""
+        print("\n最近交易记录:")
+        cursor = None
+        while True:
+            success, message, records, cursor = self.transaction_service.get_history(
+                self.current_user, 10, cursor)
+            if not records:
+                print("暂无交易记录")
+                return
+            for record in records:
+                print(record.describe())
+            if cursor is None:
+                return
+            if input("输入 m 查看更早的记录，其他键返回: ").strip().lower() != "m":
+                return
         
     def view_user_info(self):
         """查看个人信息"""
@@ -191,7 +214,7 @@ class BankSystem:
         """已登录状态菜单"""
         # 验证会话
         if self.current_user and self.current_session_token:
-            is_valid, user = self.user_service.validate_session(
+            is_valid = self.user_service.check_session(
                 self.current_user.user_id, 
                 self.current_session_token
             )
@@ -226,10 +249,8 @@ class BankSystem:
             return
             
         # 验证原密码
-        success, message, user = self.user_service.login(
-            self.current_user.username, old_password)
-        if not success:
-            print(f"原密码{message}")
+        if not self.user_service.verify_password(self.current_user, old_password):
+            print("原密码错误")
             return
             
         new_password = input("请输入新密码: ").strip()
@@ -243,8 +264,7 @@ class BankSystem:
             return
             
         # 更新密码
-        self.current_user.password = self.user_service._hash_password(new_password)
-        success, message = self.user_service.update_user_info(self.current_user)
+        success, message = self.user_service.change_password(self.current_user, old_password, new_password)
         print(message)
 
     def account_management(self):
@@ -275,7 +295,7 @@ class BankSystem:
         if confirm == "y":
             # 验证会话
             if self.current_user and self.current_session_token:
-                is_valid, user = self.user_service.validate_session(
+                is_valid = self.user_service.check_session(
                     self.current_user.user_id, 
                     self.current_session_token
                 )
@@ -315,9 +335,7 @@ class BankSystem:
         if confirm == "y":
             password = input("请输入密码确认: ").strip()
             # 验证密码
-            success, message, user = self.user_service.login(
-                self.current_user.username, password)
-            if success:
+            if self.user_service.verify_password(self.current_user, password):
                 success, message = self.account_service.close_account(self.current_user)
                 print(message)
                 if success:
@@ -329,6 +347,12 @@ class BankSystem:
 
 
 def main():
+    parser = argparse.ArgumentParser(description="银行卡管理系统")
+    parser.add_argument("--metrics-file", help="开启操作耗时统计，收到 SIGUSR1 和退出时写入该文件"
+                                               "（扩展名为 .json 时为 JSON，否则为 Prometheus 文本格式）")
+    args = parser.parse_args()
+    if args.metrics_file:
+        metrics.export_to(args.metrics_file)
     bank_system = BankSystem()
     bank_system.main_menu()
 
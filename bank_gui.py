@@ -3,6 +3,7 @@ from tkinter import messagebox, simpledialog
 from services.user_service import UserService
 from services.transaction_service import TransactionService
 from services.account_service import AccountService
+from utils.data_manager import DataManager
 
 class BankGUI:
     def __init__(self, root):
@@ -10,9 +11,11 @@ class BankGUI:
         self.root.title("银行卡管理系统")
         self.root.geometry("1420x920")
         self.root.configure(bg="#f0f4f8")
-        self.user_service = UserService()
-        self.transaction_service = TransactionService()
-        self.account_service = AccountService()
+        # 三个服务共享同一份常驻内存的用户数据
+        data_manager = DataManager()
+        self.user_service = UserService(data_manager)
+        self.transaction_service = TransactionService(data_manager)
+        self.account_service = AccountService(data_manager)
         self.current_user = None
         self.current_session_token = None
         self.main_menu()
@@ -159,8 +162,25 @@ class BankGUI:
             info = message
             fg = "red"
         tk.Label(frame, text=info, font=("微软雅黑", 15), fg=fg, bg="#f0f4f8").pack(pady=30)
+        tk.Label(frame, text="最近交易记录", font=("微软雅黑", 14, "bold"), fg="#2d4059", bg="#f0f4f8").pack()
+        history_label = tk.Label(frame, font=("微软雅黑", 12), fg="#2d4059", bg="#f0f4f8", justify="left")
+        history_label.pack(pady=10)
+        page = {"cursor": None}
+
+        def show_page():
+            success, message, records, page["cursor"] = self.transaction_service.get_history(
+                self.current_user, 10, page["cursor"])
+            history_label.config(text="\n".join(r.describe() for r in records) if records else "暂无交易记录")
+            if page["cursor"] is None:
+                older_button.config(state="disabled")
+
         btn_style = {"font": ("微软雅黑", 13), "bg": "#30a7e1", "fg": "white", "activebackground": "#1976d2", "activeforeground": "#fff", "relief": "groove", "bd": 2, "width": 12, "height": 2}
-        tk.Button(frame, text="返回菜单", command=self.user_menu, **btn_style).pack(pady=20)
+        btn_frame = tk.Frame(frame, bg="#f0f4f8")
+        btn_frame.pack(pady=20)
+        older_button = tk.Button(btn_frame, text="更早的记录", command=show_page, **btn_style)
+        older_button.grid(row=0, column=0, padx=20)
+        tk.Button(btn_frame, text="返回菜单", command=self.user_menu, **btn_style).grid(row=0, column=1, padx=20)
+        show_page()
 
     def report_loss(self):
         if messagebox.askyesno("挂失", "确定要挂失账户吗？此操作不可逆！"):
@@ -0,0 +1,69 @@
+"""生成基准测试用的合成账户数据"""
+import json
+import os
+from typing import Iterator
+from models.user import User
+from utils.data_manager import DataManager
+from utils.storage.binary_snapshot import json_to_binary
+
+# 所有合成账户共用的密码哈希（明文为 "123"）
+PASSWORD_HASH = "a665a45920422f9d417e4867efdc4fb8a04a1f3fff1fa07e998e86f7f7a27ae3"
+TIMESTAMP = "2025-01-01T00:00:00"
+# 非 JSON 后端生成数据时每批写入的账户数
+BATCH_SIZE = 10000
+
+
+def user_id_of(i: int) -> str:
+    """第 i 个合成账户的ID（与 uuid4 字符串等长）"""
+    return f"00000000-0000-4000-8000-{i:012d}"
+
+
+def username_of(i: int) -> str:
+    """第 i 个合成账户的用户名"""
+    return f"user{i:07d}"
+
+
+def iter_user_dicts(count: int) -> Iterator[dict]:
+    """依次生成 count 个合成账户的字典"""
+    for i in range(count):
+        yield User(user_id_of(i), username_of(i), PASSWORD_HASH, balance=float(i % 10000),
+                   last_login=TIMESTAMP).to_dict()
+
+
+def write_json_book(path: str, count: int) -> None:
+    """写入包含 count 个合成账户的 users.json（紧凑格式，便于快速生成）"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("[")
+        for i, data in enumerate(iter_user_dicts(count)):
+            if i:
+                f.write(",")
+            f.write(json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+        f.write("]")
+
+
+def build_book(directory: str, storage: str, count: int) -> str:
+    """
+    在 directory 中为指定存储后端生成包含 count 个合成账户的数据文件，返回文件路径
+    JSON 直接写文件，binary 由 JSON 转换，其他后端分批 add_users 写入
+    """
+    json_file = os.path.join(directory, "users.json")
+    if storage == "json":
+        write_json_book(json_file, count)
+        return json_file
+    data_file = os.path.join(directory, "users." + storage)
+    if storage == "binary":
+        write_json_book(json_file, count)
+        json_to_binary(json_file, data_file)
+        os.remove(json_file)
+        return data_file
+    data_manager = DataManager(data_file, storage=storage)
+    batch = []
+    for data in iter_user_dicts(count):
+        batch.append(User.from_dict(data))
+        if len(batch) == BATCH_SIZE:
+            data_manager.add_users(batch)
+            batch = []
+    if batch:
+        data_manager.add_users(batch)
+    data_manager.close()
+    return data_file
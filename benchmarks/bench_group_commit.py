@@ -0,0 +1,71 @@
+"""
+组提交吞吐量基准测试
+
+多个线程同时对各自的账户执行存款更新，比较日志模式下每条记录 fsync 一次与
+组提交（按时间间隔或记录数统一 fsync）的吞吐量，并输出组大小和提交延迟。
+
+用法: python -m benchmarks.bench_group_commit [--threads 16] [--ops 50] [--intervals 1,5,20]
+                                               [--group-size 256]
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from benchmarks._book import user_id_of, write_json_book
+from utils.data_manager import DataManager
+
+
+def measure(data_file: str, threads: int, ops: int, **options) -> dict:
+    """返回吞吐量（笔/秒），启用组提交时附带组提交统计"""
+    data_manager = DataManager(data_file, storage="json", journal=True, compact_threshold=0, **options)
+    users = [data_manager.find_user_by_id(user_id_of(i)) for i in range(threads)]
+
+    def run(user):
+        for _ in range(ops):
+            user.deposit(1.0)
+            data_manager.update_user(user)
+
+    workers = [threading.Thread(target=run, args=(user,)) for user in users]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    result = {"ops_per_second": threads * ops / elapsed}
+    if data_manager.storage.group_commit:
+        result.update(data_manager.storage.group_commit.stats())
+    data_manager.close()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="组提交吞吐量基准测试")
+    parser.add_argument("--threads", type=int, default=16, help="并发写入的线程数")
+    parser.add_argument("--ops", type=int, default=50, help="每个线程执行的更新次数")
+    parser.add_argument("--intervals", default="1,5,20", help="组提交时间间隔（毫秒）列表，逗号分隔")
+    parser.add_argument("--group-size", type=int, default=256, help="一组最多累计的记录数")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_file = os.path.join(tmp_dir, "users.json")
+        write_json_book(data_file, args.threads)
+        result = {"mode": "fsync_every=1"}
+        result.update(measure(data_file, args.threads, args.ops, fsync_every=1))
+        results.append(result)
+        print(f"每条 fsync          {result['ops_per_second']:10.0f} 笔/秒")
+        for interval in (float(s) for s in args.intervals.split(",")):
+            result = {"mode": f"group_commit_ms={interval:g}"}
+            result.update(measure(data_file, args.threads, args.ops, group_commit_ms=interval,
+                                  group_commit_size=args.group_size))
+            results.append(result)
+            print(f"组提交 {interval:5g} ms     {result['ops_per_second']:10.0f} 笔/秒  "
+                  f"平均组大小 {result['avg_batch_size']:6.1f}  平均提交延迟 {result['avg_commit_ms']:6.2f} ms")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
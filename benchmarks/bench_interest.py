@@ -0,0 +1,56 @@
+"""
+日终计息基准测试
+
+生成合成账户后执行一次日终计息与收费，分别给出生成列式快照、计算和整批写回的耗时。
+
+用法: python -m benchmarks.bench_interest [--users 1000000] [--storage json] [--journal]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from benchmarks._book import write_json_book
+from services.interest_service import InterestRules, InterestService, compute_postings
+from utils.account_columns import AccountColumns, np
+from utils.data_manager import DataManager
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="日终计息基准测试")
+    parser.add_argument("--users", type=int, default=1_000_000, help="合成账户数量")
+    parser.add_argument("--storage", default="json", help="存储后端（json / sqlite / mmap 等）")
+    parser.add_argument("--journal", action="store_true", help="JSON 存储启用日志模式")
+    args = parser.parse_args()
+
+    rules = InterestRules([(0, 0.0035), (500000, 0.01)], min_balance_cents=100000, fee_cents=500)
+    result = {"users": args.users, "storage": args.storage, "numpy": np is not None}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source = os.path.join(tmp_dir, "users.json")
+        write_json_book(source, args.users)
+        options = {"journal": True, "compact_threshold": 0} if args.journal else {}
+        data_file = source
+        if args.storage != "json":
+            data_file = os.path.join(tmp_dir, "users." + args.storage)
+            DataManager(data_file, storage=args.storage).save_users(DataManager(source, storage="json").load_users())
+        data_manager = DataManager(data_file, storage=args.storage, **options)
+
+        start = time.perf_counter()
+        columns = AccountColumns.from_data_manager(data_manager)
+        result["snapshot_seconds"] = time.perf_counter() - start
+        start = time.perf_counter()
+        compute_postings(columns, rules)
+        result["compute_seconds"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        success, message, summary = InterestService(data_manager).run_end_of_day(rules)
+        result["end_of_day_seconds"] = time.perf_counter() - start
+        result.update(summary)
+        data_manager.close()
+    print(f"列式快照 {result['snapshot_seconds']:.2f} s，计算 {result['compute_seconds']:.2f} s，"
+          f"完整日终（快照 + 计算 + 写回） {result['end_of_day_seconds']:.2f} s：{message}")
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+日志模式写入开销基准测试
+
+对不同规模的账户簿执行若干次存款更新，比较整文件重写模式与日志模式下
+每笔交易的平均写入耗时。日志模式的耗时应与账户数量无关。
+
+用法: python -m benchmarks.bench_journal [--sizes 1000,10000,100000,1000000]
+                                          [--ops 200] [--rewrite-limit 100000]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from benchmarks._book import user_id_of, write_json_book
+from utils.data_manager import DataManager
+
+
+def measure(data_file: str, size: int, ops: int, journal: bool) -> float:
+    """返回每次 update_user 的平均耗时（微秒）"""
+    data_manager = DataManager(data_file, journal=journal, fsync_every=0, compact_threshold=0)
+    users = [data_manager.find_user_by_id(user_id_of(i * size // ops)) for i in range(ops)]
+    start = time.perf_counter()
+    for user in users:
+        user.deposit(1.0)
+        data_manager.update_user(user)
+    elapsed = time.perf_counter() - start
+    data_manager.close()
+    return elapsed / ops * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="日志模式写入开销基准测试")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000", help="账户数量列表，逗号分隔")
+    parser.add_argument("--ops", type=int, default=200, help="每种规模执行的更新次数")
+    parser.add_argument("--rewrite-limit", type=int, default=100000,
+                        help="超过该规模时跳过整文件重写模式（太慢）")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in (int(s) for s in args.sizes.split(",")):
+            data_file = os.path.join(tmp_dir, f"users_{size}.json")
+            write_json_book(data_file, size)
+            result = {"users": size, "journal_us_per_op": measure(data_file, size, args.ops, True)}
+            if size <= args.rewrite_limit:
+                result["rewrite_us_per_op"] = measure(data_file, size, args.ops, False)
+            results.append(result)
+            rewrite = result.get("rewrite_us_per_op")
+            rewrite_text = f"{rewrite:12.1f} us/笔" if rewrite is not None else "已跳过"
+            print(f"{size:>9} 个账户  日志模式 {result['journal_us_per_op']:10.1f} us/笔  重写模式 {rewrite_text}")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
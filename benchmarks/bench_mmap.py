@@ -0,0 +1,52 @@
+"""
+内存映射槽位存储写入开销基准测试
+
+对不同规模的账户文件执行若干次存款更新，每次原地改写一个槽位并刷新所在的页。
+每笔交易的耗时应与账户数量无关。
+
+用法: python -m benchmarks.bench_mmap [--sizes 1000,100000,1000000] [--ops 200] [--no-flush]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from benchmarks._book import iter_user_dicts, user_id_of
+from models.user import User
+from utils.data_manager import DataManager
+
+
+def measure(data_file: str, size: int, ops: int, flush: bool) -> float:
+    """返回每次 update_user 的平均耗时（微秒）"""
+    data_manager = DataManager(data_file, storage="mmap", flush=flush)
+    users = [data_manager.find_user_by_id(user_id_of(i * size // ops)) for i in range(ops)]
+    start = time.perf_counter()
+    for user in users:
+        user.deposit(1.0)
+        data_manager.update_user(user)
+    elapsed = time.perf_counter() - start
+    data_manager.close()
+    return elapsed / ops * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="内存映射槽位存储写入开销基准测试")
+    parser.add_argument("--sizes", default="1000,100000,1000000", help="账户数量列表，逗号分隔")
+    parser.add_argument("--ops", type=int, default=200, help="每种规模执行的更新次数")
+    parser.add_argument("--no-flush", action="store_true", help="不在每次写入后刷新页面")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in (int(s) for s in args.sizes.split(",")):
+            data_file = os.path.join(tmp_dir, f"users_{size}.dat")
+            DataManager(data_file, storage="mmap").save_users(
+                [User.from_dict(data) for data in iter_user_dicts(size)])
+            result = {"users": size, "us_per_op": measure(data_file, size, args.ops, not args.no_flush)}
+            results.append(result)
+            print(f"{size:>9} 个账户  {result['us_per_op']:10.1f} us/笔")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
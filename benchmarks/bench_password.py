@@ -0,0 +1,62 @@
+"""
+密码哈希基准测试
+
+多个线程同时验证各自的密码，比较在调用线程中直接计算 scrypt 与在进程池中计算的
+吞吐量，并给出命中验证缓存时单次验证的耗时。
+
+用法: python -m benchmarks.bench_password [--threads 8] [--ops 4] [--log2-n 14] [--workers 4]
+"""
+import argparse
+import json
+import threading
+import time
+from utils.password_hasher import DEFAULT_LOG2_N, DEFAULT_WORKERS, PasswordHasher
+
+
+def measure(hasher: PasswordHasher, hashes: list, ops: int) -> float:
+    """返回每秒完成的验证次数（缓存已关闭）"""
+    def run(hashed):
+        for _ in range(ops):
+            hasher.verify("123", hashed)
+
+    workers = [threading.Thread(target=run, args=(hashed,)) for hashed in hashes]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return len(hashes) * ops / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="密码哈希基准测试")
+    parser.add_argument("--threads", type=int, default=8, help="并发验证的线程数")
+    parser.add_argument("--ops", type=int, default=4, help="每个线程验证的次数")
+    parser.add_argument("--log2-n", type=int, default=DEFAULT_LOG2_N, help="scrypt 参数 N 的以 2 为底的对数")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="进程池大小")
+    args = parser.parse_args()
+
+    results = {}
+    inline = PasswordHasher(log2_n=args.log2_n, workers=0, cache_ttl=0)
+    hashes = [inline.hash("123") for _ in range(args.threads)]
+    results["inline_per_second"] = measure(inline, hashes, args.ops)
+    print(f"调用线程中计算    {results['inline_per_second']:8.1f} 次/秒")
+
+    pooled = PasswordHasher(log2_n=args.log2_n, workers=args.workers, cache_ttl=0)
+    pooled.verify("123", hashes[0])  # 启动工作进程
+    results["pool_per_second"] = measure(pooled, hashes, args.ops)
+    pooled.close()
+    print(f"进程池（{args.workers} 进程）  {results['pool_per_second']:8.1f} 次/秒")
+
+    cached = PasswordHasher(log2_n=args.log2_n, workers=0)
+    cached.verify("123", hashes[0])
+    start = time.perf_counter()
+    for _ in range(10000):
+        cached.verify("123", hashes[0])
+    results["cached_verify_us"] = (time.perf_counter() - start) / 10000 * 1e6
+    print(f"命中缓存          {results['cached_verify_us']:8.2f} 微秒/次")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
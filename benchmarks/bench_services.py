@@ -0,0 +1,176 @@
+"""
+服务层基准测试
+
+为每种存储后端和账户规模生成合成账户，通过真实存储依次执行注册、登录、会话验证、存款、取款、
+冻结/解冻、登出和销户，给出每种操作的吞吐量和延迟（平均、p50、p99）。结果以 JSON 输出，
+并与保存的基线比较：p50 延迟超过基线 (1 + --tolerance) 倍的操作视为退化，退出码为 1
+（用中位数而不是吞吐量比较，个别慢调用不会造成误报）。
+
+账户的选取使用固定的随机种子，同样的参数在同一台机器上可重复；基线只在参数（操作次数、
+scrypt 参数、日志模式）相同时比较。基线与机器有关，换机器后先用 --save-baseline 重新生成。
+
+用法: python -m benchmarks.bench_services [--sizes 1000,10000,1000000] [--storage json,sqlite,mmap]
+                                          [--ops 100] [--log2-n 10] [--journal] [--output results.json]
+                                          [--baseline benchmarks/baseline.json] [--save-baseline]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+from benchmarks._book import build_book, user_id_of
+from services.account_service import AccountService
+from services.transaction_service import TransactionService
+from services.user_service import UserService
+from utils.data_manager import DataManager
+from utils.password_hasher import PasswordHasher
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+PASSWORD = "bench-password"
+# 依次执行的操作
+OPERATIONS = ["register", "login", "check_session", "validate_session", "deposit", "withdraw",
+              "freeze", "unfreeze", "logout", "close_account"]
+
+
+def measure(calls: List[Callable[[], bool]]) -> dict:
+    """依次执行 calls，每个调用返回是否成功；返回吞吐量、延迟（微秒）和失败次数"""
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    for call in calls:
+        begin = time.perf_counter()
+        if not call():
+            errors += 1
+        latencies.append(time.perf_counter() - begin)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "ops": len(calls),
+        "errors": errors,
+        "ops_per_second": len(calls) / elapsed if elapsed else 0.0,
+        "mean_us": sum(latencies) / len(latencies) * 1e6,
+        "p50_us": latencies[len(latencies) // 2] * 1e6,
+        "p99_us": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e6,
+    }
+
+
+def run_book(data_manager: DataManager, size: int, ops: int, log2_n: int, seed: int) -> Dict[str, dict]:
+    """在一个合成账户表上依次测量各操作"""
+    users = UserService(data_manager, hasher=PasswordHasher(log2_n=log2_n, workers=0, cache_ttl=0))
+    transactions, accounts = TransactionService(data_manager), AccountService(data_manager)
+    names = [f"bench{i:06d}" for i in range(ops)]
+    # 存取款、冻结解冻作用于已有的合成账户，注册、登录、登出、销户作用于新注册的账户
+    existing = [data_manager.find_user_by_id(user_id_of(i))
+                for i in random.Random(seed).sample(range(size), min(ops, size))]
+    sessions = {}
+
+    def login(name):
+        success, _, user, token = users.login(name, PASSWORD)
+        sessions[name] = (user, token)
+        return success
+
+    results = {
+        "register": measure([lambda n=n: users.register(n, PASSWORD)[0] for n in names]),
+        "login": measure([lambda n=n: login(n) for n in names]),
+    }
+    results["check_session"] = measure([lambda n=n: users.check_session(sessions[n][0].user_id, sessions[n][1])
+                                        for n in names])
+    results["validate_session"] = measure([lambda n=n: users.validate_session(sessions[n][0].user_id,
+                                                                              sessions[n][1])[0] for n in names])
+    results["deposit"] = measure([lambda u=u: transactions.deposit(u, 100)[0] for u in existing])
+    results["withdraw"] = measure([lambda u=u: transactions.withdraw(u, 50)[0] for u in existing])
+    results["freeze"] = measure([lambda u=u: accounts.freeze_account(u)[0] for u in existing])
+    results["unfreeze"] = measure([lambda u=u: accounts.unfreeze_account(u)[0] for u in existing])
+    results["logout"] = measure([lambda n=n: users.logout(sessions[n][0])[0] for n in names])
+    results["close_account"] = measure([lambda n=n: accounts.close_account(sessions[n][0])[0] for n in names])
+    return results
+
+
+def compare(results: Dict[str, Dict[str, dict]], baseline: Dict[str, Dict[str, dict]],
+            tolerance: float) -> List[str]:
+    """返回 p50 延迟超过基线 (1 + tolerance) 倍的操作说明"""
+    regressions = []
+    for book, operations in results.items():
+        for name, current in operations.items():
+            previous = baseline.get(book, {}).get(name)
+            if previous is None:
+                continue
+            ratio = current["p50_us"] / previous["p50_us"]
+            if ratio > 1 + tolerance:
+                regressions.append(f"{book} {name}: p50 {current['p50_us']:.1f} µs，"
+                                   f"基线 {previous['p50_us']:.1f} µs（{ratio:.1f} 倍）")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="服务层基准测试")
+    parser.add_argument("--sizes", default="1000,10000", help="合成账户数量，逗号分隔（如 1000,10000,1000000）")
+    parser.add_argument("--storage", default="json,sqlite,mmap", help="存储后端，逗号分隔")
+    parser.add_argument("--ops", type=int, default=100, help="每种操作执行的次数")
+    parser.add_argument("--log2-n", type=int, default=10,
+                        help="scrypt 参数 N 的以 2 为底的对数（默认低于生产参数，避免哈希耗时掩盖存储的变化）")
+    parser.add_argument("--journal", action="store_true", help="JSON / binary 存储启用日志模式")
+    parser.add_argument("--seed", type=int, default=0, help="选取账户的随机种子")
+    parser.add_argument("--output", help="把结果写入该 JSON 文件")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线文件")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--tolerance", type=float, default=1.0,
+                        help="允许 p50 延迟高于基线的比例（默认 1.0，即慢一倍以上才算退化，以容忍机器负载的波动）")
+    args = parser.parse_args()
+
+    parameters = {"ops": args.ops, "log2_n": args.log2_n, "journal": args.journal, "seed": args.seed}
+    report = {
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpu_count": os.cpu_count()},
+        "parameters": parameters,
+        "results": {},
+    }
+    for storage in args.storage.split(","):
+        for size in (int(s) for s in args.sizes.split(",")):
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                start = time.perf_counter()
+                data_file = build_book(tmp_dir, storage, size)
+                options = {"journal": True} if args.journal and storage in ("json", "binary") else {}
+                data_manager = DataManager(data_file, storage=storage, **options)
+                data_manager.find_user_by_id(user_id_of(0))  # 加载数据文件
+                print(f"{storage} {size} 个账户：生成并加载 {time.perf_counter() - start:.1f} s")
+                results = run_book(data_manager, size, args.ops, args.log2_n, args.seed)
+                data_manager.close()
+            report["results"][f"{storage}/{size}"] = results
+            for name in OPERATIONS:
+                data = results[name]
+                print(f"  {name:<17}{data['ops_per_second']:10.1f} 次/秒  p50 {data['p50_us']:9.1f} µs  "
+                      f"p99 {data['p99_us']:9.1f} µs" + (f"  失败 {data['errors']}" if data["errors"] else ""))
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"已保存基线: {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"没有基线文件 {args.baseline}，可加 --save-baseline 生成")
+        return
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get("parameters") != parameters:
+        print(f"基线的参数 {baseline.get('parameters')} 与本次不同，不做比较")
+        return
+    regressions = compare(report["results"], baseline["results"], args.tolerance)
+    if regressions:
+        print("性能退化:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("与基线相比没有明显退化")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+快照格式基准测试
+
+比较 JSON（indent=2）快照与二进制快照在不同规模下的保存耗时、加载耗时和文件大小。
+加载耗时为构造 DataManager 的时间，即读取快照并建立内存索引的完整启动开销。
+
+用法: python -m benchmarks.bench_snapshot [--sizes 100000,1000000]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from benchmarks._book import iter_user_dicts
+from models.user import User
+from utils.data_manager import DataManager
+
+FORMATS = {"json": "users.json", "binary": "users.bin"}
+
+
+def measure(data_file: str, storage: str, users: list) -> dict:
+    """返回保存耗时、加载耗时（秒）和文件大小（字节）"""
+    data_manager = DataManager(data_file, storage=storage)
+    start = time.perf_counter()
+    data_manager.save_users(users)
+    save_seconds = time.perf_counter() - start
+    data_manager.close()
+
+    start = time.perf_counter()
+    data_manager = DataManager(data_file, storage=storage)
+    load_seconds = time.perf_counter() - start
+    data_manager.close()
+    return {"save_seconds": save_seconds, "load_seconds": load_seconds,
+            "file_bytes": os.path.getsize(data_file)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="快照格式基准测试")
+    parser.add_argument("--sizes", default="100000,1000000", help="账户数量列表，逗号分隔")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in (int(s) for s in args.sizes.split(",")):
+            users = [User.from_dict(data) for data in iter_user_dicts(size)]
+            for storage, file_name in FORMATS.items():
+                data_file = os.path.join(tmp_dir, f"{size}_{file_name}")
+                result = {"users": size, "format": storage}
+                result.update(measure(data_file, storage, users))
+                results.append(result)
+                print(f"{size:>9} 个账户  {storage:<6}  保存 {result['save_seconds']:7.2f} s  "
+                      f"加载 {result['load_seconds']:7.2f} s  大小 {result['file_bytes'] / 2 ** 20:8.1f} MiB")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
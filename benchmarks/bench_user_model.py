@@ -0,0 +1,76 @@
+"""
+User 模型内存占用与加载耗时基准测试
+
+分别测量：
+1. 从已解析的字典构造 User 的耗时和每个对象占用的内存（不含共享的字符串）
+2. 通过 JSON 存储后端完整加载账户簿的耗时和常驻内存（含字符串）
+
+用法: python -m benchmarks.bench_user_model [--users 1000000]
+"""
+import argparse
+import gc
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from benchmarks._book import PASSWORD_HASH, TIMESTAMP, user_id_of, username_of, write_json_book
+from models.user import User
+from utils.data_manager import DataManager
+
+
+def make_dicts(count: int) -> list:
+    """生成 count 个与存储格式一致的用户字典"""
+    return [{"user_id": user_id_of(i), "username": username_of(i), "password": PASSWORD_HASH,
+             "balance_cents": i, "is_frozen": False, "is_lost": False, "is_using": False,
+             "session_token": None, "last_login": TIMESTAMP, "created_at": TIMESTAMP, "version": 0}
+            for i in range(count)]
+
+
+def measure_construction(count: int) -> dict:
+    """测量 User.from_dict 的耗时和对象本身的内存"""
+    dicts = make_dicts(count)
+    gc.collect()
+    start = time.perf_counter()
+    users = [User.from_dict(data) for data in dicts]
+    elapsed = time.perf_counter() - start
+    del users
+    gc.collect()
+    tracemalloc.start()
+    users = [User.from_dict(data) for data in dicts]
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del users
+    return {"us_per_user": elapsed / count * 1e6, "object_bytes_per_user": allocated / count}
+
+
+def measure_load(count: int) -> dict:
+    """测量 JSON 后端加载整个账户簿的耗时、常驻内存和峰值内存"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_file = os.path.join(tmp_dir, "users.json")
+        write_json_book(data_file, count)
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        data_manager = DataManager(data_file, storage="json")
+        elapsed = time.perf_counter() - start
+        resident, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        data_manager.close()
+        return {"load_seconds": elapsed, "file_bytes": os.path.getsize(data_file),
+                "resident_bytes_per_user": resident / count, "peak_bytes_per_user": peak / count}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="User 模型内存占用与加载耗时基准测试")
+    parser.add_argument("--users", type=int, default=1000000, help="账户数量")
+    args = parser.parse_args()
+
+    result = {"users": args.users}
+    result.update(measure_construction(args.users))
+    result.update(measure_load(args.users))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
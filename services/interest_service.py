@@ -0,0 +1,213 @@
+"""
+日终计息与收费
+
+对全部账户生成列式快照，按规则一次算出所有账户的利息和管理费，再整批写回
+（整批只持久化一次），并把每笔利息和管理费记入交易流水。已安装 NumPy 时向量化计算，
+否则逐个账户计算，结果完全相同。
+
+用法: python -m services.interest_service [--tiers 0:0.0035,50000:0.01] [--min-balance 100]
+                                           [--fee 5] [--days 1] [--dry-run]
+      [--storage json|binary|sqlite|mmap] [--data-file PATH]
+"""
+import argparse
+import math
+from decimal import Decimal
+from typing import Iterable, List, Optional, Tuple
+from models.user import User
+from utils.account_columns import AccountColumns, np
+from utils.data_manager import DataManager
+from utils.money import to_cents
+from utils.storage.base import ConcurrentModificationError
+
+# 流水中的交易类型
+INTEREST = "interest"
+FEE = "fee"
+DAYS_PER_YEAR = 365
+# 写回时发现账户被其他终端修改，重新生成快照并计算的最多次数
+MAX_ATTEMPTS = 3
+
+
+class InterestRules:
+    """计息与收费规则"""
+
+    def __init__(self, tiers: Iterable[Tuple[int, float]] = ((0, 0.0035),), min_balance_cents: int = 0,
+                 fee_cents: int = 0, days: int = 1, exclude_frozen: bool = True, exclude_lost: bool = True):
+        """
+        tiers: [(起点余额（分）, 年利率)]，分段累进计息：余额落在每一档的部分按该档利率计息
+        min_balance_cents / fee_cents: 余额低于最低余额的账户收取的管理费（不超过余额）
+        days: 计息天数，每日利息 = 年利息 / 365
+        exclude_frozen / exclude_lost: 冻结、挂失的账户不计息也不收费
+        """
+        self.tiers = sorted((int(start), float(rate)) for start, rate in tiers)
+        if not self.tiers or self.tiers[0][0] != 0:
+            raise ValueError("第一档计息区间必须从余额 0 开始")
+        if len({start for start, _ in self.tiers}) != len(self.tiers):
+            raise ValueError("计息区间的起点不能重复")
+        if any(not math.isfinite(rate) or rate < 0 for _, rate in self.tiers):
+            raise ValueError("年利率必须是非负数")
+        if min_balance_cents < 0 or fee_cents < 0 or days < 1:
+            raise ValueError("最低余额、管理费不能为负数，计息天数至少为 1")
+        self.min_balance_cents = min_balance_cents
+        self.fee_cents = fee_cents
+        self.days = days
+        self.exclude_frozen = exclude_frozen
+        self.exclude_lost = exclude_lost
+
+    def _bands(self) -> List[Tuple[int, float, float]]:
+        """[(起点, 终点, 年利率)]，最后一档没有上限"""
+        ends = [start for start, _ in self.tiers[1:]] + [math.inf]
+        return [(start, end, rate) for (start, rate), end in zip(self.tiers, ends)]
+
+
+def compute_postings(columns: AccountColumns, rules: InterestRules):
+    """
+    计算每个账户的利息和管理费（分），返回与快照各行对应的两列 (interest, fee)
+    管理费按计息前的余额判断；利息四舍五入到分
+    """
+    bands = rules._bands()
+    scale = rules.days / DAYS_PER_YEAR
+    if np is not None:
+        balance = columns.balance_cents
+        excluded = np.zeros(len(columns), dtype=bool)
+        if rules.exclude_frozen:
+            excluded |= columns.is_frozen
+        if rules.exclude_lost:
+            excluded |= columns.is_lost
+        values = balance.astype(np.float64)
+        yearly = np.zeros(len(columns), dtype=np.float64)
+        for start, end, rate in bands:
+            yearly += (np.clip(values, start, end) - start) * rate
+        interest = np.floor(yearly * scale + 0.5).astype(np.int64)
+        fee = np.where(balance < rules.min_balance_cents, np.minimum(balance, rules.fee_cents), 0).astype(np.int64)
+        interest[excluded] = 0
+        fee[excluded] = 0
+        return interest, fee
+
+    interest, fee = [0] * len(columns), [0] * len(columns)
+    for i, balance in enumerate(columns.balance_cents):
+        if (rules.exclude_frozen and columns.is_frozen[i]) or (rules.exclude_lost and columns.is_lost[i]):
+            continue
+        yearly = 0.0
+        for start, end, rate in bands:
+            yearly += (min(max(float(balance), start), end) - start) * rate
+        interest[i] = math.floor(yearly * scale + 0.5)
+        if balance < rules.min_balance_cents:
+            fee[i] = min(balance, rules.fee_cents)
+    return interest, fee
+
+
+def _changed_rows(interest, fee) -> List[int]:
+    """有利息或管理费的行"""
+    if np is not None:
+        return np.flatnonzero((interest != 0) | (fee != 0)).tolist()
+    return [i for i, (a, b) in enumerate(zip(interest, fee)) if a or b]
+
+
+def _total(column) -> int:
+    return int(column.sum()) if np is not None else sum(column)
+
+
+class InterestService:
+    def __init__(self, data_manager: Optional[DataManager] = None):
+        self.data_manager = data_manager if data_manager is not None else DataManager()
+
+    def _collect(self, columns: AccountColumns, rows: List[int]) -> Optional[List[User]]:
+        """
+        按快照的顺序再遍历一次存储，取出需要入账的账户
+        任一账户已被删除或版本号与快照不同时返回 None
+        """
+        wanted = {columns.user_ids[i]: i for i in rows}
+        users: List[Optional[User]] = [None] * len(rows)
+        position = {row: n for n, row in enumerate(rows)}
+        for user in self.data_manager.iter_users():
+            row = wanted.get(user.user_id)
+            if row is None:
+                continue
+            if user.version != columns.versions[row]:
+                return None
+            users[position[row]] = user
+        return users if all(user is not None for user in users) else None
+
+    def run_end_of_day(self, rules: InterestRules, dry_run: bool = False) -> tuple[bool, str, dict]:
+        """
+        日终计息与收费，所有账户的变更整批写回
+        dry_run: 只计算不入账
+        返回 (success, message, 汇总)，汇总含 accounts, interest_accounts, interest_cents,
+        fee_accounts, fee_cents
+        """
+        for _ in range(MAX_ATTEMPTS):
+            columns = AccountColumns.from_data_manager(self.data_manager)
+            interest, fee = compute_postings(columns, rules)
+            rows = _changed_rows(interest, fee)
+            summary = {
+                "accounts": len(columns),
+                "interest_accounts": sum(1 for i in rows if interest[i]),
+                "interest_cents": _total(interest),
+                "fee_accounts": sum(1 for i in rows if fee[i]),
+                "fee_cents": _total(fee),
+            }
+            if dry_run or not rows:
+                return True, "计算完成" if dry_run else "没有需要入账的账户", summary
+            users = self._collect(columns, rows)
+            if users is None:
+                # 快照生成后有账户被修改，重新计算
+                continue
+            entries = []
+            for row, user in zip(rows, users):
+                if fee[row]:
+                    user.balance_cents -= int(fee[row])
+                    entries.append((user.user_id, FEE, int(fee[row]), user.balance_cents))
+                if interest[row]:
+                    user.balance_cents += int(interest[row])
+                    entries.append((user.user_id, INTEREST, int(interest[row]), user.balance_cents))
+            try:
+                saved = self.data_manager.update_users(users)
+            except ConcurrentModificationError:
+                continue
+            if not saved:
+                return False, "入账失败，请稍后重试", summary
+            try:
+                self.data_manager.ledger.append_many(entries)
+            except OSError as e:
+                print(f"写入交易流水时出错: {e}")
+            return True, "计息完成", summary
+        return False, "账户信息在计息期间被频繁修改，请稍后重试", {}
+
+
+def _parse_tiers(text: str) -> List[Tuple[int, float]]:
+    """解析 "起点余额(元):年利率,..." 格式的计息区间"""
+    tiers = []
+    for item in text.split(","):
+        start, _, rate = item.partition(":")
+        tiers.append((to_cents(Decimal(start)), float(rate)))
+    return tiers
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="日终计息与收费")
+    parser.add_argument("--tiers", default="0:0.0035", help="分段计息区间，格式为 起点余额(元):年利率，逗号分隔")
+    parser.add_argument("--min-balance", type=Decimal, default=Decimal(0), help="最低余额（元），低于该余额收取管理费")
+    parser.add_argument("--fee", type=Decimal, default=Decimal(0), help="管理费（元）")
+    parser.add_argument("--days", type=int, default=1, help="计息天数")
+    parser.add_argument("--include-frozen", action="store_true", help="冻结的账户照常计息和收费")
+    parser.add_argument("--dry-run", action="store_true", help="只计算不入账")
+    parser.add_argument("--storage", help="存储后端（json / binary / sqlite / mmap），默认读取环境变量 BANK_STORAGE")
+    parser.add_argument("--data-file", help="数据文件路径")
+    args = parser.parse_args()
+
+    rules = InterestRules(_parse_tiers(args.tiers), to_cents(args.min_balance), to_cents(args.fee),
+                          args.days, exclude_frozen=not args.include_frozen)
+    data_manager = DataManager(args.data_file, storage=args.storage)
+    try:
+        success, message, summary = InterestService(data_manager).run_end_of_day(rules, args.dry_run)
+    finally:
+        data_manager.close()
+    print(message)
+    if summary:
+        print(f"账户 {summary['accounts']}，计息 {summary['interest_accounts']} 户共 "
+              f"{Decimal(summary['interest_cents']).scaleb(-2)} 元，收取管理费 {summary['fee_accounts']} 户共 "
+              f"{Decimal(summary['fee_cents']).scaleb(-2)} 元")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+管理报表：存款总额、余额分布和账户状态统计
+
+数据来自 DataManager 增量维护的汇总，第一次查询时扫描一遍账户建立，之后的查询不再扫描。
+
+用法: python -m services.report_service [--json] [--storage json|binary|sqlite|mmap] [--data-file PATH]
+"""
+import argparse
+import json
+from typing import Optional
+from utils.aggregates import BUCKET_BOUNDS
+from utils.data_manager import DataManager
+from utils.money import from_cents
+
+
+class ReportService:
+    def __init__(self, data_manager: Optional[DataManager] = None):
+        self.data_manager = data_manager if data_manager is not None else DataManager()
+
+    def summary(self) -> dict:
+        """
+        账户总览（金额单位为元）：accounts, total_balance, average_balance, frozen, lost,
+        active_sessions, p50/p90/p99（按余额分布直方图估算）
+        """
+        data = self.data_manager.aggregates.summary()
+        accounts = data["accounts"]
+        return {
+            "accounts": accounts,
+            "total_balance": from_cents(data["total_balance_cents"]),
+            "average_balance": from_cents(data["total_balance_cents"] // accounts) if accounts else 0.0,
+            "frozen": data["frozen"],
+            "lost": data["lost"],
+            "active_sessions": data["active_sessions"],
+            "p50": round(from_cents(data["p50_cents"]), 2),
+            "p90": round(from_cents(data["p90_cents"]), 2),
+            "p99": round(from_cents(data["p99_cents"]), 2),
+        }
+
+    def balance_distribution(self) -> list:
+        """余额分布：[(区间下界（元）, 区间上界（元，最后一档为 None）, 账户数)]，只列出非空的区间"""
+        upper = dict(zip(BUCKET_BOUNDS, BUCKET_BOUNDS[1:]))
+        return [(from_cents(low), from_cents(upper[low]) if low in upper else None, count)
+                for low, count in self.data_manager.aggregates.summary()["histogram"]]
+
+    def percentile(self, q: float) -> float:
+        """余额的第 q 百分位数（元，按直方图估算）"""
+        if not 0 <= q <= 100:
+            raise ValueError("百分位数必须在 0 到 100 之间")
+        return round(from_cents(self.data_manager.aggregates.percentile(q)), 2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="管理报表")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+    parser.add_argument("--storage", help="存储后端（json / binary / sqlite / mmap），默认读取环境变量 BANK_STORAGE")
+    parser.add_argument("--data-file", help="数据文件路径")
+    args = parser.parse_args()
+
+    data_manager = DataManager(args.data_file, storage=args.storage)
+    service = ReportService(data_manager)
+    summary, distribution = service.summary(), service.balance_distribution()
+    data_manager.close()
+    if args.json:
+        print(json.dumps({"summary": summary, "distribution": distribution}, ensure_ascii=False, indent=2))
+        return
+    print(f"账户数: {summary['accounts']}  存款总额: {summary['total_balance']:.2f} 元  "
+          f"平均余额: {summary['average_balance']:.2f} 元")
+    print(f"冻结: {summary['frozen']}  挂失: {summary['lost']}  在线: {summary['active_sessions']}")
+    print(f"余额中位数: {summary['p50']:.2f} 元  P90: {summary['p90']:.2f} 元  P99: {summary['p99']:.2f} 元")
+    print("余额分布:")
+    for low, high, count in distribution:
+        label = f"{low:.2f} 元以上" if high is None else f"{low:.2f} - {high:.2f} 元"
+        print(f"  {label:>28}  {count}")
+
+
+if __name__ == "__main__":
+    main()
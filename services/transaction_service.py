@@ -1,21 +1,67 @@
-from typing import Optional
+from typing import Dict, Iterable, List, Optional
+from models.transaction import Transaction
 from models.user import User
 from utils.data_manager import DataManager
+from utils.metrics import instrument_methods
+from utils.money import to_cents
+from utils.storage.base import ConcurrentModificationError
 
+# 交易类型
+DEPOSIT = "deposit"
+WITHDRAW = "withdraw"
+TRANSFER = "transfer"
+# 转账在流水账中记为付款方的转出和收款方的转入
+TRANSFER_OUT = "transfer_out"
+TRANSFER_IN = "transfer_in"
+# 批量交易遇到并发修改时，基于最新数据重新执行整批的最多次数
+BATCH_MAX_ATTEMPTS = 3
 
+
+@instrument_methods("transaction_service")
 class TransactionService:
-    def __init__(self):
-        self.data_manager = DataManager()
+    def __init__(self, data_manager: Optional[DataManager] = None):
+        self.data_manager = data_manager if data_manager is not None else DataManager()
 
-    def deposit(self, user: User, amount: float) -> tuple[bool, str, float]:
-        """存款"""
+    def _check_account(self, user: User) -> Optional[str]:
+        """检查账户能否交易，不能交易时返回原因"""
         if user.is_lost:
-            return False, "账户已挂失，无法进行交易", user.balance
+            return "账户已挂失，无法进行交易"
         if user.is_frozen:
-            return False, "账户已冻结，无法进行交易", user.balance
+            return "账户已冻结，无法进行交易"
+        return None
+
+    @staticmethod
+    def _ledger_entries(operation: str, users: List[User], amount: float) -> List[tuple]:
+        """一笔已执行的交易对应的流水记录 (user_id, 类型, 金额（分）, 交易后余额（分）)"""
+        cents = to_cents(amount)
+        if operation == TRANSFER:
+            payer, payee = users
+            return [(payer.user_id, TRANSFER_OUT, cents, payer.balance_cents),
+                    (payee.user_id, TRANSFER_IN, cents, payee.balance_cents)]
+        return [(users[0].user_id, operation, cents, users[0].balance_cents)]
+
+    def _record(self, entries: List[tuple]) -> None:
+        """把已持久化的交易写入流水账"""
+        try:
+            self.data_manager.ledger.append_many(entries)
+        except OSError as e:
+            print(f"写入交易流水时出错: {e}")
+
+    def deposit(self, user: User, amount: float) -> tuple[bool, str, float]:
+        """存款"""
+        error = self._check_account(user)
+        if error:
+            return False, error, user.balance
 
         if user.deposit(amount):
-            if self.data_manager.update_user(user):
+            try:
+                saved = self.data_manager.update_user(user)
+            except ConcurrentModificationError:
+                # 账户已被其他终端修改：载入最新数据，由调用方重试
+                self.data_manager.refresh_user(user)
+                return False, "账户信息已被其他终端修改，请重试", user.balance
+            if saved:
+                self._record(self._ledger_entries(DEPOSIT, [user], amount))
                 return True, f"存款成功，存入金额: {amount}", user.balance
             else:
                 # 回滚操作
@@ -26,19 +72,24 @@ class TransactionService:
 
     def withdraw(self, user: User, amount: float) -> tuple[bool, str, float]:
         """取款"""
-        if user.is_lost:
-            return False, "账户已挂失，无法进行交易", user.balance
-        if user.is_frozen:
-            return False, "账户已冻结，无法进行交易", user.balance
+        error = self._check_account(user)
+        if error:
+            return False, error, user.balance
 
         if amount <= 0:
             return False, "取款金额必须大于0", user.balance
 
-        if amount > user.balance:
+        if to_cents(amount) > user.balance_cents:
             return False, "余额不足", user.balance
 
         if user.withdraw(amount):
-            if self.data_manager.update_user(user):
+            try:
+                saved = self.data_manager.update_user(user)
+            except ConcurrentModificationError:
+                self.data_manager.refresh_user(user)
+                return False, "账户信息已被其他终端修改，请重试", user.balance
+            if saved:
+                self._record(self._ledger_entries(WITHDRAW, [user], amount))
                 return True, f"取款成功，取出金额: {amount}", user.balance
             else:
                 # 回滚操作
@@ -49,4 +100,165 @@ class TransactionService:
 
     def check_balance(self, user: User) -> tuple[bool, str, float]:
         """查询余额"""
-        return True, "查询成功", user.check_balance()
\ No newline at end of file
+        return True, "查询成功", user.check_balance()
+
+    def get_history(self, user: User, limit: int = 50,
+                    cursor: Optional[int] = None) -> tuple[bool, str, List[Transaction], Optional[int]]:
+        """
+        按时间倒序查询交易记录
+        cursor: 上一页返回的游标，None 表示从最新一条开始
+        返回 (success, message, 记录列表, 下一页游标)，没有更早的记录时游标为 None
+        """
+        records, next_cursor = self.data_manager.ledger.history(user.user_id, limit, cursor)
+        return True, "查询成功", records, next_cursor
+
+    def _apply_operation(self, operation: str, users: List[User], amount: float) -> tuple[bool, str, float]:
+        """
+        在内存中执行一笔交易，不持久化
+        users: 存取款为 [账户]，转账为 [付款账户, 收款账户]
+        """
+        user = users[0]
+        error = self._check_account(user)
+        if error:
+            return False, error, user.balance
+        if operation == DEPOSIT:
+            if not user.deposit(amount):
+                return False, "存款金额必须大于0", user.balance
+            return True, f"存款成功，存入金额: {amount}", user.balance
+        if operation == WITHDRAW:
+            if amount <= 0:
+                return False, "取款金额必须大于0", user.balance
+            if not user.withdraw(amount):
+                return False, "余额不足", user.balance
+            return True, f"取款成功，取出金额: {amount}", user.balance
+        if operation == TRANSFER:
+            payee = users[1]
+            if payee.user_id == user.user_id:
+                return False, "不能向自己转账", user.balance
+            error = self._check_account(payee)
+            if error:
+                return False, f"收款{error}", user.balance
+            if amount <= 0:
+                return False, "转账金额必须大于0", user.balance
+            if not user.withdraw(amount):
+                return False, "余额不足", user.balance
+            payee.deposit(amount)
+            return True, f"转账成功，转出金额: {amount}", user.balance
+        return False, f"未知的交易类型: {operation}", user.balance
+
+    def _plan_batch(self, steps: List[tuple]) -> tuple[Dict[str, User], Dict[str, float], list, list]:
+        """
+        在最新的账户副本上依次执行整批交易，返回 (涉及的账户, 原始余额, 逐笔结果, 流水记录)
+        steps: (交易类型, 涉及的 user_id 元组, 金额) 的列表
+        """
+        accounts: Dict[str, User] = {}
+        initial_balances: Dict[str, float] = {}
+        results = []
+        entries = []
+
+        def load(user_id: str) -> Optional[User]:
+            if user_id not in accounts:
+                user = self.data_manager.find_user_by_id(user_id)
+                if user is None:
+                    return None
+                accounts[user_id] = user
+                initial_balances[user_id] = user.balance
+            return accounts[user_id]
+
+        for operation, user_ids, amount in steps:
+            users = [load(user_id) for user_id in user_ids]
+            if None in users:
+                results.append((False, "用户不存在", initial_balances.get(user_ids[0], 0.0)))
+                continue
+            balances = [user.balance_cents for user in users]
+            try:
+                result = self._apply_operation(operation, users, amount)
+            except (TypeError, ValueError) as e:
+                # 单笔金额不合法只让这一笔失败；转账可能已扣款，恢复涉及账户的余额
+                for user, balance in zip(users, balances):
+                    user.balance_cents = balance
+                message = str(e) if isinstance(e, ValueError) and str(e) else "金额格式错误"
+                result = (False, message, users[0].balance)
+            if result[0]:
+                entries.extend(self._ledger_entries(operation, users, amount))
+            results.append(result)
+        return accounts, initial_balances, results, entries
+
+    @staticmethod
+    def _reject_batch(steps: List[tuple], initial_balances: Dict[str, float],
+                      results: list, message: str) -> list:
+        """整批未生效：成功项改为失败，余额都恢复为交易前的值"""
+        rejected = []
+        for (_, user_ids, _), (success, item_message, balance) in zip(steps, results):
+            balance = initial_balances.get(user_ids[0], balance)
+            rejected.append((False, message if success else item_message, balance))
+        return rejected
+
+    def _run_batch(self, steps: List[tuple], atomic: bool) -> List[tuple[bool, str, float]]:
+        """执行一批交易，所有涉及的账户只持久化一次"""
+        for _ in range(BATCH_MAX_ATTEMPTS):
+            accounts, initial_balances, results, entries = self._plan_batch(steps)
+            if atomic and not all(result[0] for result in results):
+                return self._reject_batch(steps, initial_balances, results, "批量交易中有失败项，整批未执行")
+            changed = list(dict.fromkeys(user_id for (_, user_ids, _), result in zip(steps, results)
+                                         if result[0] for user_id in user_ids))
+            if not changed:
+                return results
+            try:
+                saved = self.data_manager.update_users([accounts[user_id] for user_id in changed])
+            except ConcurrentModificationError:
+                # 批内账户被其他终端修改，基于最新数据重新执行整批
+                continue
+            if saved:
+                self._record(entries)
+                return results
+            return self._reject_batch(steps, initial_balances, results, "交易失败，请稍后重试")
+        return self._reject_batch(steps, initial_balances, results, "账户信息已被其他终端修改，请重试")
+
+    def apply_batch(self, operations: Iterable[tuple[str, str, float]],
+                    atomic: bool = False) -> List[tuple[bool, str, float]]:
+        """
+        批量存取款，整批只持久化一次
+        operations: (交易类型 DEPOSIT/WITHDRAW, user_id, 金额) 的序列
+        atomic: True 时任一笔失败则整批不生效；False 时跳过失败的笔，其余照常入账
+        返回与 operations 一一对应的 (success, message, balance)
+        """
+        return self._run_batch([(operation, (user_id,), amount) for operation, user_id, amount in operations],
+                               atomic)
+
+    def deposit_many(self, items: Iterable[tuple[str, float]], atomic: bool = False) -> List[tuple[bool, str, float]]:
+        """批量存款，items 为 (user_id, 金额) 的序列"""
+        return self.apply_batch(((DEPOSIT, user_id, amount) for user_id, amount in items), atomic)
+
+    def withdraw_many(self, items: Iterable[tuple[str, float]], atomic: bool = False) -> List[tuple[bool, str, float]]:
+        """批量取款，items 为 (user_id, 金额) 的序列"""
+        return self.apply_batch(((WITHDRAW, user_id, amount) for user_id, amount in items), atomic)
+
+    def transfer(self, from_user: User, to_user: User, amount: float) -> tuple[bool, str, float]:
+        """转账：两个账户的变更在同一次写入中生效，返回付款账户的余额"""
+        balances = (from_user.balance_cents, to_user.balance_cents)
+        success, message, balance = self._apply_operation(TRANSFER, [from_user, to_user], amount)
+        if not success:
+            return success, message, balance
+        try:
+            saved = self.data_manager.update_users([from_user, to_user])
+        except ConcurrentModificationError:
+            self.data_manager.refresh_user(from_user)
+            self.data_manager.refresh_user(to_user)
+            return False, "账户信息已被其他终端修改，请重试", from_user.balance
+        if saved:
+            self._record(self._ledger_entries(TRANSFER, [from_user, to_user], amount))
+            return True, message, from_user.balance
+        # 回滚操作
+        from_user.balance_cents, to_user.balance_cents = balances
+        return False, "转账失败，请稍后重试", from_user.balance
+
+    def transfer_many(self, transfers: Iterable[tuple[str, str, float]],
+                      atomic: bool = False) -> List[tuple[bool, str, float]]:
+        """
+        批量转账，transfers 为 (付款 user_id, 收款 user_id, 金额) 的序列
+        共用账户的多笔转账在同一组账户副本上依次记账，整批只持久化一次
+        返回与 transfers 一一对应的 (success, message, 付款账户余额)
+        """
+        return self._run_batch([(TRANSFER, (from_id, to_id), amount) for from_id, to_id, amount in transfers],
+                               atomic)
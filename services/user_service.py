@@ -1,17 +1,55 @@
-import hashlib
 import uuid
-from typing import Optional
+from datetime import datetime, timedelta
+from typing import List, Optional
 from models.user import User
 from utils.data_manager import DataManager
+from utils.metrics import instrument_methods
+from utils.password_hasher import PasswordHasher, get_default_hasher
+from utils.session_store import SessionStore
+from utils.storage.base import ConcurrentModificationError
 
 
+@instrument_methods("user_service")
 class UserService:
-    def __init__(self):
-        self.data_manager = DataManager()
+    def __init__(self, data_manager: Optional[DataManager] = None, sessions: Optional[SessionStore] = None,
+                 hasher: Optional[PasswordHasher] = None):
+        """
+        sessions: 会话表，默认每个服务实例一个只在内存中的会话表
+        hasher: 密码哈希器，默认使用进程内共用的哈希器
+        """
+        self.data_manager = data_manager if data_manager is not None else DataManager()
+        self.sessions = sessions if sessions is not None else SessionStore()
+        self.hasher = hasher if hasher is not None else get_default_hasher()
 
     def _hash_password(self, password: str) -> str:
         """对密码进行哈希处理"""
-        return hashlib.sha256(password.encode()).hexdigest()
+        return self.hasher.hash(password)
+
+    def verify_password(self, user: User, password: str) -> bool:
+        """验证密码（用于登录后再次确认身份，如修改密码、销户）"""
+        return self.hasher.verify(password, user.password)
+
+    def check_login(self, username: str, password: str) -> Optional[str]:
+        """
+        只做登录前的检查（含密码验证），不修改任何数据；可以登录时返回 None，否则返回与 login 相同的失败原因
+        异步服务在读线程中先调用它完成耗时的哈希计算：失败时不必进入写线程，成功时随后的登录直接命中验证缓存
+        """
+        return self._login_error(self.data_manager.find_user_by_username(username), password)
+
+    def _login_error(self, user: Optional[User], password: str) -> Optional[str]:
+        """登录前的检查，不能登录时返回原因"""
+        if not user:
+            return "用户不存在"
+        # 检查是否已登录
+        if self.sessions.active_token(user.user_id) or self._logged_in_elsewhere(user):
+            return "该账户已在其他设备登录"
+        if not self.verify_password(user, password):
+            return "密码错误"
+        if user.is_lost:
+            return "账户已挂失，请联系银行"
+        if user.is_frozen:
+            return "账户已冻结，请联系银行"
+        return None
 
     def register(self, username: str, password: str) -> tuple[bool, str]:
         """用户注册"""
@@ -36,37 +74,79 @@ class UserService:
         返回: (success, message, user, session_token)
         """
         user = self.data_manager.find_user_by_username(username)
-        if not user:
-            return False, "用户不存在", None, None
-
-        # 检查是否已登录
-        if user.is_using and user.session_token:
-            return False, "该账户已在其他设备登录", None, None
-
-        hashed_password = self._hash_password(password)
-        if user.password != hashed_password:
-            return False, "密码错误", None, None
-
-        if user.is_lost:
-            return False, "账户已挂失，请联系银行", None, None
+        error = self._login_error(user, password)
+        if error:
+            return False, error, None, None
 
-        if user.is_frozen:
-            return False, "账户已冻结，请联系银行", None, None
+        # 旧格式或参数已调整的密码哈希随登录一起按当前参数重新计算
+        if self.hasher.needs_rehash(user.password):
+            user.password = self._hash_password(password)
 
         # 生成新的会话令牌
         session_token = user.generate_session_token()
-        if not self.data_manager.update_user(user):
+        try:
+            saved = self.data_manager.update_user(user)
+        except ConcurrentModificationError:
+            return False, "账户信息已被其他终端修改，请重试", None, None
+        if not saved:
             return False, "登录失败，请稍后重试", None, None
-            
+        self.sessions.create(user.user_id, session_token)
         return True, "登录成功", user, session_token
 
+    def _logged_in_elsewhere(self, user: User) -> bool:
+        """
+        存储中记录的登录状态是否仍然有效（可能来自其他终端）
+        登录时间超过会话有效期的视为残留状态（如终端崩溃后未登出），允许重新登录
+        """
+        if not (user.is_using and user.session_token):
+            return False
+        try:
+            last_login = datetime.fromisoformat(user.last_login)
+        except (TypeError, ValueError):
+            return True
+        return datetime.now() - last_login < timedelta(seconds=self.sessions.ttl)
+
+    def change_password(self, user: User, old_password: str, new_password: str) -> tuple[bool, str]:
+        """修改密码"""
+        if not self.verify_password(user, old_password):
+            return False, "原密码错误"
+        previous = user.password
+        user.password = self._hash_password(new_password)
+        try:
+            saved = self.data_manager.update_user(user)
+        except ConcurrentModificationError:
+            self.data_manager.refresh_user(user)
+            return False, "账户信息已被其他终端修改，请重试"
+        if saved:
+            return True, "密码修改成功"
+        user.password = previous
+        return False, "密码修改失败"
+
     def get_user_info(self, user_id: str) -> Optional[User]:
         """获取用户信息"""
         return self.data_manager.find_user_by_id(user_id)
 
+    def search_users(self, prefix: str, page: int = 1, page_size: int = 20,
+                     ignore_case: bool = True) -> tuple[bool, str, int, List[User]]:
+        """
+        按用户名前缀分页查找客户（柜员查询）
+        返回 (success, message, 匹配总数, 当前页的用户列表)
+        """
+        if not prefix:
+            return False, "请输入用户名或其开头部分", 0, []
+        if page < 1 or page_size < 1:
+            return False, "页码和每页数量必须大于0", 0, []
+        total, users = self.data_manager.search_users(prefix, ignore_case, (page - 1) * page_size, page_size)
+        return True, "查询成功", total, users
+
     def update_user_info(self, user: User) -> tuple[bool, str]:
         """更新用户信息"""
-        if self.data_manager.update_user(user):
+        try:
+            saved = self.data_manager.update_user(user)
+        except ConcurrentModificationError:
+            self.data_manager.refresh_user(user)
+            return False, "账户信息已被其他终端修改，请重试"
+        if saved:
             return True, "信息更新成功"
         else:
             return False, "信息更新失败"
@@ -76,14 +156,28 @@ class UserService:
         if not user or not user.is_using:
             return False, "用户未登录"
             
+        self.sessions.revoke_user(user.user_id)
         user.clear_session()
-        if self.data_manager.update_user(user):
+        try:
+            saved = self.data_manager.update_user(user)
+        except ConcurrentModificationError:
+            self.data_manager.refresh_user(user)
+            return False, "账户信息已被其他终端修改，请重试"
+        if saved:
             return True, "登出成功"
         return False, "登出失败，请稍后重试"
         
+    def check_session(self, user_id: str, session_token: str) -> bool:
+        """只查会话表验证会话是否有效（不读取存储），有效时顺延有效期"""
+        return self.sessions.validate(user_id, session_token)
+
     def validate_session(self, user_id: str, session_token: str) -> tuple[bool, Optional[User]]:
-        """验证用户会话是否有效"""
+        """验证用户会话是否有效，有效时同时返回最新的用户信息"""
+        if not self.sessions.validate(user_id, session_token):
+            return False, None
         user = self.data_manager.find_user_by_id(user_id)
-        if not user or not user.is_session_valid(session_token):
+        if not user:
+            # 用户已被删除
+            self.sessions.revoke_user(user_id)
             return False, None
         return True, user
\ No newline at end of file
@@ -0,0 +1,100 @@
+import asyncio
+import json
+import pytest
+from api_server import BankApiServer
+from services.async_service import StorageExecutor
+from utils.data_manager import DataManager
+
+
+class TestBankApiServer:
+    """HTTP/JSON 接口服务的测试"""
+
+    @pytest.fixture
+    def server(self, tmp_path):
+        data_manager = DataManager(str(tmp_path / "users.json"), storage="json")
+        executor = StorageExecutor(read_workers=2)
+        yield BankApiServer(data_manager, executor)
+        executor.shutdown()
+        data_manager.close()
+
+    @staticmethod
+    def call(server, path, **params):
+        body = json.dumps(params).encode("utf-8")
+        return asyncio.run(server.handle_request("POST", path, body))
+
+    def login(self, server):
+        self.call(server, "/register", username="alice", password="pwd")
+        status, result = self.call(server, "/login", username="alice", password="pwd")
+        assert status == 200 and result["success"] is True
+        return {"user_id": result["user_id"], "session_token": result["session_token"]}
+
+    def test_deposit_withdraw_and_balance(self, server):
+        """测试登录后存取款并查询余额"""
+        session = self.login(server)
+        assert self.call(server, "/deposit", amount=100, **session)[1]["balance"] == 100.0
+        assert self.call(server, "/withdraw", amount=30.5, **session)[1]["balance"] == 69.5
+        status, result = self.call(server, "/balance", **session)
+        assert status == 200 and result["balance"] == 69.5
+
+    def test_freeze_blocks_transactions(self, server):
+        """测试冻结后无法交易，解冻后恢复"""
+        session = self.login(server)
+        assert self.call(server, "/freeze", **session)[1]["success"] is True
+        assert self.call(server, "/deposit", amount=1, **session)[1]["success"] is False
+        assert self.call(server, "/unfreeze", **session)[1]["success"] is True
+        assert self.call(server, "/deposit", amount=1, **session)[1]["success"] is True
+
+    def test_rejects_invalid_requests(self, server):
+        """测试会话无效、参数错误和未知接口"""
+        session = self.login(server)
+        assert self.call(server, "/balance", user_id=session["user_id"], session_token="bad")[0] == 401
+        assert self.call(server, "/deposit", amount="100", **session)[0] == 400
+        assert self.call(server, "/deposit", amount=True, **session)[0] == 400
+        assert self.call(server, "/nothing")[0] == 404
+        assert asyncio.run(server.handle_request("GET", "/balance", b""))[0] == 405
+        assert asyncio.run(server.handle_request("POST", "/login", b"[1]"))[0] == 400
+        for amount in (b"Infinity", b"-Infinity", b"NaN", b"1e400"):
+            body = b'{"user_id": "%s", "session_token": "%s", "amount": %s}' % (
+                session["user_id"].encode(), session["session_token"].encode(), amount)
+            assert asyncio.run(server.handle_request("POST", "/deposit", body))[0] == 400
+
+    def test_unexpected_error_returns_500(self, server, monkeypatch):
+        """测试处理函数抛出意外异常时回复 500，而不是断开连接"""
+        session = self.login(server)
+
+        async def broken(params, user):
+            raise RuntimeError("boom")
+
+        monkeypatch.setitem(server._routes, "/balance", (broken, True))
+        status, result = self.call(server, "/balance", **session)
+        assert status == 500 and result == {"success": False, "message": "服务器内部错误"}
+
+    def test_keep_alive_over_socket(self, server):
+        """测试同一连接上依次处理多个请求"""
+        async def scenario():
+            listener = await server.start("127.0.0.1", 0)
+            port = listener.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            responses = []
+            for path, params in (("/register", {"username": "bob", "password": "pwd"}),
+                                 ("/login", {"username": "bob", "password": "pwd"})):
+                body = json.dumps(params).encode("utf-8")
+                writer.write(f"POST {path} HTTP/1.1\r\nHost: localhost\r\n"
+                             f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+                await writer.drain()
+                status_line = await reader.readline()
+                headers = {}
+                while (line := await reader.readline()) != b"\r\n":
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.lower()] = value.strip()
+                payload = json.loads(await reader.readexactly(int(headers["content-length"])))
+                responses.append((status_line.split()[1], headers["connection"], payload))
+            writer.close()
+            listener.close()
+            await listener.wait_closed()
+            return responses
+
+        responses = asyncio.run(scenario())
+        assert [r[0] for r in responses] == [b"200", b"200"]
+        assert all(r[1] == "keep-alive" for r in responses)
+        assert responses[1][2]["session_token"]
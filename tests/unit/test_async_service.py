@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import time
+import pytest
+from models.user import User
+from services.account_service import AccountService
+from services.async_service import (AsyncAccountService, AsyncTransactionService, AsyncUserService,
+                                    StorageExecutor)
+from services.transaction_service import TransactionService
+from services.user_service import UserService
+from utils.data_manager import DataManager
+
+
+class TestAsyncServices:
+    """异步服务层的测试"""
+
+    @pytest.fixture
+    def data_manager(self, tmp_path):
+        manager = DataManager(str(tmp_path / "users.json"), storage="json")
+        yield manager
+        manager.close()
+
+    @pytest.fixture
+    def executor(self):
+        executor = StorageExecutor(read_workers=4)
+        yield executor
+        executor.shutdown()
+
+    def test_register_login_and_transact(self, data_manager, executor):
+        """测试通过异步服务完成注册、登录、存款和查询流水"""
+        user_service = AsyncUserService(UserService(data_manager), executor)
+        transaction_service = AsyncTransactionService(TransactionService(data_manager), executor)
+        account_service = AsyncAccountService(AccountService(data_manager), executor)
+
+        async def scenario():
+            assert (await user_service.register("alice", "pwd"))[0] is True
+            success, _, user, token = await user_service.login("alice", "pwd")
+            assert success is True
+            assert (await user_service.validate_session(user.user_id, token))[0] is True
+            assert (await transaction_service.deposit(user, 50.0))[2] == 50.0
+            _, _, records, _ = await transaction_service.get_history(user)
+            assert [r.amount for r in records] == [50.0]
+            assert (await account_service.freeze_account(user))[0] is True
+
+        asyncio.run(scenario())
+        assert data_manager.find_user_by_username("alice").is_frozen is True
+
+    def test_failed_login_does_not_enter_writer(self, data_manager, executor):
+        """测试密码错误、用户不存在的登录在读线程中返回，不进入写线程"""
+        user_service = AsyncUserService(UserService(data_manager), executor)
+        user_service.service.register("alice", "pwd")
+        writes = []
+        executor.write = lambda *args: writes.append(args)
+
+        async def scenario():
+            return (await user_service.login("alice", "wrong"), await user_service.login("bob", "pwd"))
+
+        wrong_password, missing = asyncio.run(scenario())
+        assert wrong_password == (False, "密码错误", None, None)
+        assert missing == (False, "用户不存在", None, None)
+        assert writes == []
+
+    def test_concurrent_writes_are_serialized(self, data_manager, executor):
+        """测试同一数据文件的并发写入在写线程中排队执行，不会互相冲突"""
+        user_service = UserService(data_manager)
+        user_service.register("bob", "pwd")
+        user = data_manager.find_user_by_username("bob")
+        service = AsyncTransactionService(TransactionService(data_manager), executor)
+
+        async def scenario():
+            return await asyncio.gather(*(service.deposit(user, 1.0) for _ in range(200)))
+
+        results = asyncio.run(scenario())
+        assert all(success for success, _, _ in results)
+        assert data_manager.find_user_by_id(user.user_id).balance == 200.0
+
+    def test_concurrent_transactions_are_coalesced(self, data_manager, executor):
+        """测试并发的存取款合并成少数几批写入，每笔的结果和调用方的账户对象都正确"""
+        data_manager.save_users([User(f"id{i}", f"user{i}", "pwd", balance=100.0) for i in range(20)])
+        service = AsyncTransactionService(TransactionService(data_manager), executor)
+        users = [data_manager.find_user_by_id(f"id{i}") for i in range(20)]
+        calls = []
+        update_users = data_manager.update_users
+        data_manager.update_users = lambda batch: calls.append(len(batch)) or update_users(batch)
+
+        async def scenario():
+            deposits = [service.deposit(user, 10.0) for user in users]
+            withdrawals = [service.withdraw(user, 500.0) for user in users[:5]]
+            return await asyncio.gather(*deposits, *withdrawals)
+
+        results = asyncio.run(scenario())
+        assert [r[0] for r in results] == [True] * 20 + [False] * 5
+        assert all(r[2] == 110.0 for r in results)
+        assert "余额不足" in results[-1][1]
+        assert sum(calls) == 20 and len(calls) <= 3
+        assert [u.balance for u in users] == [110.0] * 20
+        assert [u.balance for u in data_manager.load_users()] == [110.0] * 20
+        # 调用方的账户对象已刷新版本号，可以继续用于同步操作
+        assert TransactionService(data_manager).deposit(users[0], 1.0)[0] is True
+
+    def test_event_loop_is_not_blocked(self, data_manager, executor):
+        """测试慢速存储操作执行期间事件循环仍能处理其他任务"""
+        service = AsyncUserService(UserService(data_manager), executor)
+        writer_threads = []
+
+        def slow_register(username, password):
+            writer_threads.append(threading.current_thread())
+            time.sleep(0.2)
+            return True, "注册成功"
+
+        service.service.register = slow_register
+
+        async def scenario():
+            ticks = 0
+            task = asyncio.ensure_future(service.register("carol", "pwd"))
+            while not task.done():
+                ticks += 1
+                await asyncio.sleep(0.01)
+            return ticks
+
+        assert asyncio.run(scenario()) > 5
+        assert writer_threads[0] is not threading.main_thread()
+
+    def test_group_commit_shared_by_concurrent_writes(self, tmp_path, executor):
+        """测试组提交时并发的异步写入共用刷盘，而不是逐笔阻塞写线程"""
+        data_manager = DataManager(str(tmp_path / "journal.json"), storage="json",
+                                   journal=True, group_commit_ms=50)
+        data_manager.save_users([User(f"id{i}", f"user{i}", "pwd") for i in range(20)])
+        service = AsyncTransactionService(TransactionService(data_manager), executor)
+        users = [data_manager.find_user_by_id(f"id{i}") for i in range(20)]
+        commits = data_manager.storage.group_commit.commits
+
+        async def scenario():
+            return await asyncio.gather(*(service.deposit(user, 10.0) for user in users))
+
+        try:
+            assert all(success for success, _, _ in asyncio.run(scenario()))
+            assert data_manager.storage.group_commit.commits - commits <= 3
+        finally:
+            data_manager.close()
+        reloaded = DataManager(str(tmp_path / "journal.json"), storage="json", journal=True)
+        assert all(user.balance == 10.0 for user in reloaded.load_users())
+        reloaded.close()
@@ -0,0 +1,66 @@
+import io
+import json
+import pytest
+from models.user import User
+from utils.data_manager import DataManager
+from utils.storage.base import StorageError
+from utils.storage.binary_snapshot import (SnapshotFormatError, binary_to_json, json_to_binary,
+                                           read_snapshot, write_snapshot)
+
+
+def _users():
+    return [
+        User("id1", "张三", "hash1", balance_cents=-5, is_frozen=True, version=3,
+             last_login="2025-01-01T00:00:00", created_at="2024-01-01T00:00:00"),
+        User("id2", "user2", "hash2", balance_cents=2 ** 40, is_lost=True, is_using=True,
+             session_token="token", last_login="2025-01-02T00:00:00", created_at="2024-01-02T00:00:00"),
+    ]
+
+
+class TestBinarySnapshot:
+    """二进制快照格式的测试"""
+
+    def test_round_trip(self, tmp_path):
+        """测试写入后读出的用户与原数据一致，包括 None 和中文"""
+        path = tmp_path / "users.bin"
+        buffer = io.BytesIO()
+        write_snapshot(buffer, _users())
+        path.write_bytes(buffer.getvalue())
+
+        assert [u.to_dict() for u in read_snapshot(str(path))] == [u.to_dict() for u in _users()]
+
+    @pytest.mark.parametrize("damage", [
+        lambda data: data[:-1],                      # 截断
+        lambda data: data[:-1] + b"x",               # 字符串表被改写
+        lambda data: b"XXXX" + data[4:],             # magic 错误
+        lambda data: b"",                            # 空文件
+    ])
+    def test_damaged_file_is_rejected(self, tmp_path, damage):
+        """测试截断、改写或格式不符的文件被拒绝"""
+        buffer = io.BytesIO()
+        write_snapshot(buffer, _users())
+        path = tmp_path / "users.bin"
+        path.write_bytes(damage(buffer.getvalue()))
+
+        with pytest.raises(SnapshotFormatError):
+            read_snapshot(str(path))
+
+    def test_convert_json_and_back(self, tmp_path):
+        """测试与 JSON 数据文件互相转换"""
+        json_file, binary_file, back_file = (str(tmp_path / n) for n in ("a.json", "a.bin", "b.json"))
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump([u.to_dict() for u in _users()], f)
+
+        assert json_to_binary(json_file, binary_file) == 2
+        assert binary_to_json(binary_file, back_file) == 2
+        with open(back_file, encoding='utf-8') as f:
+            assert json.load(f) == [u.to_dict() for u in _users()]
+
+    def test_corrupted_binary_storage_is_not_treated_as_empty(self, tmp_path):
+        """测试二进制存储的数据文件损坏时报错"""
+        data_file = str(tmp_path / "users.bin")
+        DataManager(data_file, storage="binary").save_users(_users())
+        with open(data_file, 'r+b') as f:
+            f.truncate(40)
+        with pytest.raises(StorageError):
+            DataManager(data_file, storage="binary")
@@ -0,0 +1,105 @@
+import json
+import os
+import pytest
+from models.user import User
+from services.bulk_service import BulkService
+from utils.data_manager import DataManager
+from utils.password_hasher import PasswordHasher
+
+
+class TestBulkService:
+    """批量导入导出的测试"""
+
+    @pytest.fixture
+    def data_manager(self, tmp_path):
+        manager = DataManager(str(tmp_path / "users.json"), storage="json")
+        yield manager
+        manager.close()
+
+    @pytest.fixture
+    def service(self, data_manager):
+        return BulkService(data_manager, PasswordHasher(log2_n=4, workers=0))
+
+    def test_import_csv(self, tmp_path, service, data_manager):
+        """测试导入 CSV：计算密码哈希、换算余额，跳过重复和不合法的行"""
+        data_manager.add_user(User("id0", "taken", "pwd"))
+        source = tmp_path / "users.csv"
+        source.write_text("username,password,balance\n"
+                          "alice,pw1,10.5\n"
+                          "bob,pw2,\n"
+                          "alice,pw3,1\n"
+                          "taken,pw4,1\n"
+                          ",pw5,1\n"
+                          "carol,pw6,abc\n", encoding="utf-8")
+
+        stats = service.import_users(str(source), batch_size=2)
+
+        assert (stats["rows"], stats["imported"], stats["duplicates"], stats["errors"]) == (6, 2, 2, 2)
+        assert stats["error_samples"][0].startswith("第 6 行")
+        alice = data_manager.find_user_by_username("alice")
+        assert alice.balance_cents == 1050
+        assert service.hasher.verify("pw1", alice.password) is True
+        assert not os.path.exists(str(source) + ".progress")
+
+    def test_resume_after_interruption(self, tmp_path, service, data_manager):
+        """测试中断后从上次提交的位置继续导入"""
+        source = tmp_path / "users.jsonl"
+        source.write_text("".join(json.dumps({"username": f"user{i}", "password": "pw"}) + "\n"
+                                  for i in range(10)), encoding="utf-8")
+
+        def interrupt(stats):
+            if stats["rows"] >= 4:
+                raise KeyboardInterrupt
+
+        with pytest.raises(KeyboardInterrupt):
+            service.import_users(str(source), batch_size=2, progress=interrupt)
+        assert len(data_manager.load_users()) == 4
+
+        stats = service.import_users(str(source), batch_size=2)
+        assert (stats["rows"], stats["imported"], stats["duplicates"]) == (10, 10, 0)
+        assert len(data_manager.load_users()) == 10
+
+    def test_export_and_reimport(self, tmp_path, service, data_manager):
+        """测试导出的文件可以原样导入到另一个数据文件，中断的导出可以继续"""
+        source = tmp_path / "users.jsonl"
+        source.write_text("".join(json.dumps({"username": f"user{i}", "password": f"pw{i}", "balance": i})
+                                  + "\n" for i in range(7)), encoding="utf-8")
+        service.import_users(str(source))
+
+        target = str(tmp_path / "export.csv")
+
+        def interrupt(stats):
+            raise KeyboardInterrupt
+
+        with pytest.raises(KeyboardInterrupt):
+            service.export_users(target, progress=interrupt, checkpoint_every=3)
+        assert service.export_users(target, checkpoint_every=3) == {"rows": 7}
+
+        other = DataManager(str(tmp_path / "other.json"), storage="json")
+        stats = BulkService(other, service.hasher).import_users(target)
+        assert stats["imported"] == 7
+        for user in data_manager.load_users():
+            copy = other.find_user_by_id(user.user_id)
+            assert (copy.username, copy.password, copy.balance_cents) == (user.username, user.password,
+                                                                          user.balance_cents)
+        other.close()
+
+    def test_unsaveable_rows_are_errors_not_duplicates(self, tmp_path):
+        """测试后端无法保存的行记为错误而不是重复，超出存储范围的余额在解析时拒绝"""
+        manager = DataManager(str(tmp_path / "users.dat"), storage="mmap")
+        service = BulkService(manager, PasswordHasher(log2_n=4, workers=0))
+        manager.add_user(User("id0", "taken", "pwd"))
+        source = tmp_path / "users.csv"
+        source.write_text("username,password,balance\n"
+                          "alice,pw1,1\n"
+                          f"{'x' * 100},pw2,1\n"
+                          "taken,pw3,1\n"
+                          "bob,pw4,1e20\n", encoding="utf-8")
+
+        stats = service.import_users(str(source))
+
+        assert (stats["rows"], stats["imported"], stats["duplicates"], stats["errors"]) == (4, 1, 1, 2)
+        assert stats["error_samples"][0] == "第 5 行: 余额超出范围: 1e20"
+        assert stats["error_samples"][1].startswith("第 3 行: 保存失败")
+        assert manager.find_user_by_username("alice") is not None
+        manager.close()
@@ -0,0 +1,466 @@
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import pytest
+from models.user import User
+from utils.data_manager import DataManager
+from utils.storage.base import ConcurrentModificationError, StorageError
+from utils.storage.migrations import migrate_balances_to_cents
+from utils.storage.sqlite_storage import SqliteStorage
+
+DATA_FILES = {"json": "users.json", "binary": "users.bin", "sqlite": "users.db", "mmap": "users.dat"}
+
+
+class TestDataManager:
+    """DataManager 在各存储后端上的通用行为测试"""
+
+    @pytest.fixture(params=["json", "binary", "sqlite", "mmap"])
+    def storage(self, request):
+        return request.param
+
+    @pytest.fixture
+    def data_file(self, tmp_path, storage):
+        return str(tmp_path / "data" / DATA_FILES[storage])
+
+    @pytest.fixture
+    def data_manager(self, data_file, storage):
+        manager = DataManager(data_file, storage=storage)
+        yield manager
+        manager.close()
+
+    @pytest.fixture
+    def test_user(self):
+        return User(user_id="test_user_id", username="testuser", password="hashed_password")
+
+    def test_create_empty_file(self, data_file, data_manager):
+        """测试数据文件不存在时自动创建"""
+        assert os.path.exists(data_file)
+        assert data_manager.load_users() == []
+
+    def test_add_and_find_user(self, data_manager, test_user):
+        """测试添加用户后可按ID和用户名查找"""
+        assert data_manager.add_user(test_user) is True
+        assert data_manager.find_user_by_id("test_user_id").username == "testuser"
+        assert data_manager.find_user_by_username("testuser").user_id == "test_user_id"
+        assert data_manager.find_user_by_username("nobody") is None
+
+    def test_add_duplicate_username(self, data_manager, test_user):
+        """测试重复用户名无法添加"""
+        data_manager.add_user(test_user)
+        duplicate = User(user_id="other_id", username="testuser", password="pwd")
+        assert data_manager.add_user(duplicate) is False
+
+    def test_find_returns_copy(self, data_manager, test_user):
+        """测试查找返回副本，未调用 update_user 的修改不影响存储"""
+        data_manager.add_user(test_user)
+        user = data_manager.find_user_by_id("test_user_id")
+        user.deposit(100.0)
+        assert data_manager.find_user_by_id("test_user_id").balance == 0.0
+
+    def test_update_user_persists(self, data_file, storage, data_manager, test_user):
+        """测试更新用户写回文件"""
+        data_manager.add_user(test_user)
+        test_user.deposit(100.0)
+        assert data_manager.update_user(test_user) is True
+        assert DataManager(data_file, storage=storage).find_user_by_id("test_user_id").balance == 100.0
+
+    def test_save_and_load_users(self, data_manager):
+        """测试整体保存后按原顺序加载"""
+        users = [User(f"id{i}", f"user{i}", "pwd", balance=float(i)) for i in range(3)]
+        assert data_manager.save_users(users) is True
+        assert [u.user_id for u in data_manager.load_users()] == ["id0", "id1", "id2"]
+        assert data_manager.find_user_by_username("user2").balance == 2.0
+
+    def test_iter_users(self, data_manager):
+        """测试逐个遍历用户，可以提前结束"""
+        users = [User(f"id{i}", f"user{i}", "pwd") for i in range(5)]
+        data_manager.save_users(users)
+        assert [u.user_id for u in data_manager.iter_users()] == [u.user_id for u in users]
+        found = next(u for u in data_manager.iter_users() if u.username == "user1")
+        assert found.user_id == "id1"
+
+    def test_add_users(self, data_manager, data_file, storage):
+        """测试批量添加，用户名冲突时整批不添加"""
+        users = [User(f"id{i}", f"user{i}", "pwd", balance=i) for i in range(3)]
+        assert data_manager.add_users(users) is True
+        assert data_manager.add_users([User("id7", "user7", "pwd"), User("id8", "user1", "pwd")]) is False
+        assert data_manager.find_user_by_id("id7") is None
+        assert data_manager.add_users([User("id7", "same", "pwd"), User("id8", "same", "pwd")]) is False
+        assert data_manager.find_user_by_id("id7") is None
+
+        reloaded = DataManager(data_file, storage=storage)
+        assert sorted(u.username for u in reloaded.load_users()) == ["user0", "user1", "user2"]
+        assert reloaded.find_user_by_username("user2").balance == 2.0
+        reloaded.close()
+
+    def test_search_users(self, data_manager):
+        """测试按用户名前缀分页查找，维护增删改后的索引"""
+        names = ["alice", "Alicia", "alfred", "bob", "ALICE2"]
+        data_manager.save_users([User(f"id{i}", name, "pwd") for i, name in enumerate(names)])
+        data_manager.add_user(User("id9", "alina", "pwd"))
+
+        total, users = data_manager.search_users("ali")
+        assert total == 4
+        assert [u.username for u in users] == ["alice", "ALICE2", "Alicia", "alina"]
+        total, users = data_manager.search_users("ALI", offset=1, limit=2)
+        assert total == 4
+        assert [u.username for u in users] == ["ALICE2", "Alicia"]
+        total, users = data_manager.search_users("Ali", ignore_case=False)
+        assert (total, [u.username for u in users]) == (1, ["Alicia"])
+
+        data_manager.delete_user("id0")
+        bob = data_manager.find_user_by_username("bob")
+        bob.username = "alistair"
+        data_manager.update_user(bob)
+        total, users = data_manager.search_users("ali", limit=10)
+        assert [u.username for u in users] == ["ALICE2", "Alicia", "alina", "alistair"]
+        assert data_manager.search_users("zzz") == (0, [])
+
+    def test_update_renamed_user(self, data_manager, test_user):
+        """测试修改用户名时同步维护用户名索引"""
+        data_manager.add_user(test_user)
+        test_user.username = "renamed"
+        assert data_manager.update_user(test_user) is True
+        assert data_manager.find_user_by_username("testuser") is None
+        assert data_manager.find_user_by_username("renamed").user_id == "test_user_id"
+
+    def test_update_increments_version(self, data_manager, test_user):
+        """测试每次成功更新后版本号加 1"""
+        data_manager.add_user(test_user)
+        user = data_manager.find_user_by_id("test_user_id")
+        assert data_manager.update_user(user) is True
+        assert user.version == 1
+        assert data_manager.find_user_by_id("test_user_id").version == 1
+
+    def test_stale_update_conflicts(self, data_manager, test_user):
+        """测试基于过期版本的更新被拒绝，刷新后可以重试"""
+        data_manager.add_user(test_user)
+        first = data_manager.find_user_by_id("test_user_id")
+        second = data_manager.find_user_by_id("test_user_id")
+        first.deposit(100.0)
+        data_manager.update_user(first)
+
+        second.deposit(50.0)
+        with pytest.raises(ConcurrentModificationError):
+            data_manager.update_user(second)
+        assert data_manager.refresh_user(second) is True
+        second.deposit(50.0)
+        assert data_manager.update_user(second) is True
+        assert data_manager.find_user_by_id("test_user_id").balance == 150.0
+
+    def test_update_users_is_all_or_nothing(self, data_manager):
+        """测试批量更新中任一用户冲突时整批不生效"""
+        data_manager.save_users([User("id1", "user1", "pwd"), User("id2", "user2", "pwd")])
+        first, second = data_manager.find_user_by_id("id1"), data_manager.find_user_by_id("id2")
+        stale = data_manager.find_user_by_id("id2")
+        data_manager.update_user(stale)
+
+        first.deposit(10.0)
+        second.deposit(20.0)
+        with pytest.raises(ConcurrentModificationError) as exc_info:
+            data_manager.update_users([first, second])
+        assert exc_info.value.user_ids == ["id2"]
+        assert data_manager.find_user_by_id("id1").balance == 0.0
+
+        data_manager.refresh_user(second)
+        second.deposit(20.0)
+        assert data_manager.update_users([first, second]) is True
+        assert (first.version, second.version) == (1, 2)
+        assert data_manager.find_user_by_id("id2").balance == 20.0
+
+    def test_update_missing_user(self, data_manager, test_user):
+        """测试更新不存在的用户"""
+        assert data_manager.update_user(test_user) is False
+
+    def test_delete_user(self, data_manager, test_user):
+        """测试删除用户"""
+        data_manager.add_user(test_user)
+        assert data_manager.delete_user("test_user_id") is True
+        assert data_manager.find_user_by_username("testuser") is None
+        assert data_manager.delete_user("test_user_id") is False
+
+
+class TestJsonStorage:
+    """JSON 存储后端的测试"""
+
+    @pytest.fixture
+    def data_file(self, tmp_path):
+        return str(tmp_path / "users.json")
+
+    def test_picks_up_external_edit(self, data_file):
+        """测试数据文件被外部修改后自动重新加载"""
+        data_manager = DataManager(data_file, storage="json")
+        test_user = User(user_id="test_user_id", username="testuser", password="hashed_password")
+        data_manager.add_user(test_user)
+        other = User(user_id="other_id", username="other", password="pwd")
+        with open(data_file, 'w', encoding='utf-8') as f:
+            json.dump([test_user.to_dict(), other.to_dict()], f)
+        assert data_manager.find_user_by_username("other").user_id == "other_id"
+
+    def test_corrupted_file_is_not_treated_as_empty(self, data_file):
+        """测试数据文件损坏时报错，而不是当作没有任何用户"""
+        with open(data_file, 'w', encoding='utf-8') as f:
+            f.write('[{"user_id": "id1", "usern')
+        with pytest.raises(StorageError):
+            DataManager(data_file, storage="json")
+
+    def test_recover_from_backup(self, data_file):
+        """测试数据文件损坏时从最近的备份恢复"""
+        data_manager = DataManager(data_file, storage="json", backups=2)
+        data_manager.add_user(User("id1", "user1", "pwd"))
+        data_manager.add_user(User("id2", "user2", "pwd"))
+        assert os.path.exists(data_file + ".1")
+        assert os.path.exists(data_file + ".2")
+        with open(data_file, 'w', encoding='utf-8') as f:
+            f.write('[{"user_id": "id1", "usern')
+
+        recovered = DataManager(data_file, storage="json", backups=2)
+        assert [u.user_id for u in recovered.load_users()] == ["id1"]
+
+    def test_atomic_write_leaves_no_temp_files(self, data_file):
+        """测试原子写入后目录中不残留临时文件"""
+        data_manager = DataManager(data_file, storage="json")
+        data_manager.add_user(User("id1", "user1", "pwd"))
+        assert not [name for name in os.listdir(os.path.dirname(data_file)) if name.endswith(".tmp")]
+
+    def _snapshot(self, data_file):
+        with open(data_file, encoding='utf-8') as f:
+            return json.load(f)
+
+    def test_journal_update_appends_instead_of_rewriting(self, data_file):
+        """测试日志模式下更新只追加日志，不重写快照"""
+        data_manager = DataManager(data_file, storage="json", journal=True)
+        data_manager.add_user(User("id1", "user1", "pwd"))
+        user = data_manager.find_user_by_id("id1")
+        user.deposit(100.0)
+        assert data_manager.update_user(user) is True
+
+        assert self._snapshot(data_file) == []
+        with open(data_file + ".journal", encoding='utf-8') as f:
+            assert len(f.readlines()) == 2
+
+    def test_journal_recovery_replays_journal(self, data_file):
+        """测试重新启动时重放日志"""
+        data_manager = DataManager(data_file, storage="json", journal=True)
+        data_manager.add_user(User("id1", "user1", "pwd"))
+        data_manager.add_user(User("id2", "user2", "pwd"))
+        user = data_manager.find_user_by_id("id1")
+        user.deposit(100.0)
+        data_manager.update_user(user)
+        data_manager.delete_user("id2")
+        data_manager.close()
+
+        recovered = DataManager(data_file, storage="json", journal=True)
+        assert recovered.find_user_by_id("id1").balance == 100.0
+        assert recovered.find_user_by_username("user2") is None
+
+    def test_journal_recovery_drops_torn_record(self, data_file):
+        """测试崩溃留下的半条日志记录被丢弃"""
+        data_manager = DataManager(data_file, storage="json", journal=True)
+        data_manager.add_user(User("id1", "user1", "pwd"))
+        data_manager.close()
+        with open(data_file + ".journal", 'a', encoding='utf-8') as f:
+            f.write('{"op":"put","user":{"user_id"')
+
+        recovered = DataManager(data_file, storage="json", journal=True)
+        assert [u.user_id for u in recovered.load_users()] == ["id1"]
+        assert recovered.add_user(User("id2", "user2", "pwd")) is True
+        assert DataManager(data_file, storage="json", journal=True).find_user_by_id("id2") is not None
+
+    def test_failed_journal_append_is_not_replayed(self, data_file, monkeypatch):
+        """测试日志 fsync 失败时截掉这条记录，之后的读取和重启都不会重放它"""
+        data_manager = DataManager(data_file, storage="json", journal=True)
+        data_manager.add_user(User("id1", "user1", "pwd"))
+        size = os.path.getsize(data_file + ".journal")
+        user = data_manager.find_user_by_id("id1")
+        user.deposit(50.0)
+
+        def failing_fsync(fd):
+            raise OSError("磁盘错误")
+
+        monkeypatch.setattr(os, "fsync", failing_fsync)
+        assert data_manager.update_user(user) is False
+        monkeypatch.undo()
+
+        assert os.path.getsize(data_file + ".journal") == size
+        assert data_manager.find_user_by_id("id1").balance == 0.0
+        assert DataManager(data_file, storage="json", journal=True).find_user_by_id("id1").balance == 0.0
+        user = data_manager.find_user_by_id("id1")
+        user.deposit(20.0)
+        assert data_manager.update_user(user) is True
+        data_manager.close()
+        assert DataManager(data_file, storage="json", journal=True).find_user_by_id("id1").balance == 20.0
+
+    def test_journal_compaction(self, data_file):
+        """测试日志达到阈值后合并回快照"""
+        data_manager = DataManager(data_file, storage="json", journal=True, compact_threshold=3)
+        for i in range(3):
+            data_manager.add_user(User(f"id{i}", f"user{i}", "pwd"))
+
+        assert len(self._snapshot(data_file)) == 3
+        assert os.path.getsize(data_file + ".journal") == 0
+        assert len(DataManager(data_file, storage="json", journal=True).load_users()) == 3
+
+    def test_journal_picks_up_other_writer(self, data_file):
+        """测试感知同一数据文件上另一个实例追加的日志"""
+        first = DataManager(data_file, storage="json", journal=True)
+        second = DataManager(data_file, storage="json", journal=True)
+        first.add_user(User("id1", "user1", "pwd"))
+        assert second.find_user_by_username("user1") is not None
+
+    def test_group_commit_coalesces_concurrent_writes(self, data_file):
+        """测试组提交把多个线程的写入合并为少数几次刷盘，且返回时已持久化"""
+        data_manager = DataManager(data_file, storage="json", journal=True, group_commit_ms=20)
+        users = [User(f"id{i}", f"user{i}", "pwd") for i in range(8)]
+        for user in users:
+            assert data_manager.add_user(user) is True
+
+        def deposit(user):
+            for _ in range(10):
+                user.deposit(1.0)
+                assert data_manager.update_user(user) is True
+
+        threads = [threading.Thread(target=deposit, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = data_manager.storage.group_commit.stats()
+        assert stats["records"] == 88
+        assert stats["commits"] < stats["records"]
+        data_manager.close()
+        reopened = DataManager(data_file, storage="json", journal=True)
+        assert [u.balance for u in reopened.load_users()] == [10.0] * 8
+
+    def test_failed_group_commit_is_rolled_back(self, data_file):
+        """测试组提交刷盘失败时写入方得知失败，变更不留在内存也不会被合并进快照，之后拒绝写入"""
+        data_manager = DataManager(data_file, storage="json", journal=True, group_commit_ms=5)
+        data_manager.add_user(User("id1", "user1", "pwd"))
+        group_commit = data_manager.storage.group_commit
+
+        def failing_sync():
+            raise OSError("磁盘错误")
+
+        group_commit._sync = failing_sync
+        user = data_manager.find_user_by_id("id1")
+        user.deposit(50.0)
+        assert data_manager.update_user(user) is False
+
+        assert data_manager.find_user_by_id("id1").balance == 0.0
+        assert data_manager.add_user(User("id2", "user2", "pwd")) is False
+        assert data_manager.compact() is False
+        data_manager.close()
+        reopened = DataManager(data_file, storage="json", journal=True)
+        assert [(u.user_id, u.balance) for u in reopened.load_users()] == [("id1", 0.0)]
+        reopened.close()
+
+    def test_group_commit_requires_journal(self, data_file):
+        """测试未启用日志模式时不能启用组提交"""
+        with pytest.raises(ValueError):
+            DataManager(data_file, storage="json", group_commit_ms=5)
+
+
+def _deposit_with_retry(data_file, storage, times):
+    """子进程：对同一账户反复存款，遇到冲突时刷新重试"""
+    data_manager = DataManager(data_file, storage=storage)
+    for _ in range(times):
+        user = data_manager.find_user_by_id("id1")
+        while True:
+            user.deposit(1.0)
+            try:
+                data_manager.update_user(user)
+                break
+            except ConcurrentModificationError:
+                data_manager.refresh_user(user)
+    data_manager.close()
+
+
+@pytest.mark.parametrize("storage", ["json", "binary", "sqlite", "mmap"])
+def test_no_lost_updates_across_processes(tmp_path, storage):
+    """测试多个进程同时存款时不会丢失更新"""
+    data_file = str(tmp_path / DATA_FILES[storage])
+    data_manager = DataManager(data_file, storage=storage)
+    data_manager.add_user(User("id1", "user1", "pwd"))
+
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_deposit_with_retry, args=(data_file, storage, 20)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert data_manager.find_user_by_id("id1").balance == 60.0
+
+
+def test_migrate_balances_to_cents(tmp_path):
+    """测试把旧格式的浮点数余额迁移为整数分"""
+    data_file = str(tmp_path / "users.json")
+    legacy = User("id1", "user1", "pwd").to_dict()
+    del legacy["balance_cents"]
+    legacy["balance"] = 0.1 + 0.2
+    with open(data_file, 'w', encoding='utf-8') as f:
+        json.dump([legacy], f)
+
+    data_manager = DataManager(data_file, storage="json")
+    assert migrate_balances_to_cents(data_manager) == 1
+    with open(data_file, encoding='utf-8') as f:
+        assert json.load(f)[0]["balance_cents"] == 30
+
+
+def test_sqlite_migrates_legacy_balance_column(tmp_path):
+    """测试旧版 SQLite 表的 REAL 余额列换算为整数分"""
+    data_file = str(tmp_path / "users.db")
+    conn = sqlite3.connect(data_file)
+    conn.execute("CREATE TABLE users (user_id TEXT PRIMARY KEY, username TEXT NOT NULL, password TEXT NOT NULL, "
+                 "balance REAL NOT NULL DEFAULT 0, is_frozen INTEGER NOT NULL DEFAULT 0, "
+                 "is_lost INTEGER NOT NULL DEFAULT 0, is_using INTEGER NOT NULL DEFAULT 0, "
+                 "session_token TEXT, last_login TEXT, created_at TEXT)")
+    conn.execute("INSERT INTO users (user_id, username, password, balance) VALUES ('id1', 'user1', 'pwd', 10061.07)")
+    conn.commit()
+    conn.close()
+
+    data_manager = DataManager(data_file, storage="sqlite")
+    assert data_manager.find_user_by_id("id1").balance_cents == 1006107
+    data_manager.close()
+
+
+
+def test_sqlite_batch_error_rolls_back(tmp_path):
+    """测试批量写入中出现非 sqlite3 异常（整数溢出）时回滚事务，之后的写入不受影响"""
+    storage = SqliteStorage(str(tmp_path / "users.db"))
+    assert storage.add_users([User("id1", "user1", "pwd")]) is True
+    with pytest.raises(OverflowError):
+        storage.add_users([User("id2", "user2", "pwd", balance_cents=10 ** 20)])
+    user = storage.find_user_by_id("id1")
+    user.balance_cents = 10 ** 20
+    with pytest.raises(OverflowError):
+        storage.update_users([user])
+    with pytest.raises(OverflowError):
+        storage.save_users([user])
+
+    user = storage.find_user_by_id("id1")
+    user.balance_cents = 500
+    assert storage.update_users([user]) is True
+    assert storage.add_users([User("id2", "user2", "pwd")]) is True
+    assert [u.balance_cents for u in storage.load_users()] == [500, 0]
+    storage.close()
+
+class TestStorageSelection:
+    """存储后端选择的测试"""
+
+    def test_select_by_environment(self, tmp_path, monkeypatch):
+        """测试通过环境变量选择 SQLite 后端"""
+        monkeypatch.setenv("BANK_STORAGE", "sqlite")
+        monkeypatch.setenv("BANK_DATA_FILE", str(tmp_path / "bank.db"))
+        data_manager = DataManager()
+        assert isinstance(data_manager.storage, SqliteStorage)
+        assert data_manager.storage.data_file == str(tmp_path / "bank.db")
+        data_manager.close()
+
+    def test_unknown_storage(self, tmp_path):
+        """测试未知的后端名称"""
+        with pytest.raises(ValueError):
+            DataManager(str(tmp_path / "users.json"), storage="csv")
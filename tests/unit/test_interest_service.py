@@ -0,0 +1,101 @@
+import random
+import pytest
+from unittest.mock import patch
+from models.user import User
+from services.interest_service import FEE, INTEREST, InterestRules, InterestService, compute_postings
+from utils.account_columns import AccountColumns
+from utils.data_manager import DataManager
+from utils.storage.base import ConcurrentModificationError
+
+
+class TestInterestService:
+    """日终计息与收费的测试"""
+
+    @pytest.fixture
+    def data_manager(self, tmp_path):
+        manager = DataManager(str(tmp_path / "users.json"), storage="json")
+        manager.save_users([
+            User("rich", "rich", "pwd", balance_cents=500000),
+            User("small", "small", "pwd", balance_cents=10000),
+            User("tiny", "tiny", "pwd", balance_cents=300),
+            User("frozen", "frozen", "pwd", balance_cents=500000, is_frozen=True),
+        ])
+        yield manager
+        manager.close()
+
+    @pytest.fixture
+    def rules(self):
+        # 1000 元以内年利率 3.65%，超出部分 7.3%；余额低于 200 元收取 5 元管理费
+        return InterestRules([(0, 0.0365), (100000, 0.073)], min_balance_cents=20000, fee_cents=500)
+
+    def test_compute_postings(self, data_manager, rules):
+        """测试分段计息、管理费不超过余额、冻结账户不计息不收费"""
+        columns = AccountColumns.from_data_manager(data_manager)
+        interest, fee = compute_postings(columns, rules)
+        assert [int(x) for x in interest] == [90, 1, 0, 0]
+        assert [int(x) for x in fee] == [0, 500, 300, 0]
+
+    def test_run_end_of_day(self, data_manager, rules):
+        """测试整批入账并记录流水"""
+        success, _, summary = InterestService(data_manager).run_end_of_day(rules)
+
+        assert success is True
+        assert summary == {"accounts": 4, "interest_accounts": 2, "interest_cents": 91,
+                           "fee_accounts": 2, "fee_cents": 800}
+        balances = {u.user_id: u.balance_cents for u in data_manager.load_users()}
+        assert balances == {"rich": 500090, "small": 9501, "tiny": 0, "frozen": 500000}
+        records, _ = data_manager.ledger.history("small")
+        assert [(r.type, r.amount_cents, r.balance_after_cents) for r in records] == [
+            (INTEREST, 1, 9501), (FEE, 500, 9500)]
+
+    def test_dry_run(self, data_manager, rules):
+        """测试只计算不入账"""
+        success, _, summary = InterestService(data_manager).run_end_of_day(rules, dry_run=True)
+        assert success is True and summary["interest_cents"] == 91
+        assert data_manager.find_user_by_id("rich").balance_cents == 500000
+
+    def test_retry_after_conflict(self, data_manager, rules):
+        """测试写回时发生并发修改则重新生成快照计算，不会重复入账"""
+        update_users = data_manager.update_users
+        calls = []
+
+        def conflict_once(users):
+            calls.append(len(users))
+            if len(calls) == 1:
+                raise ConcurrentModificationError([users[0].user_id])
+            return update_users(users)
+
+        with patch.object(data_manager, "update_users", side_effect=conflict_once):
+            success, _, _ = InterestService(data_manager).run_end_of_day(rules)
+        assert success is True and len(calls) == 2
+        assert data_manager.find_user_by_id("rich").balance_cents == 500090
+
+    @pytest.mark.parametrize("kwargs", [
+        {"tiers": [(100, 0.01)]},
+        {"tiers": [(0, -0.01)]},
+        {"tiers": [(0, 0.01), (100000, -0.02)]},
+        {"tiers": [(0, float("nan"))]},
+        {"fee_cents": -1},
+        {"min_balance_cents": -1},
+    ])
+    def test_invalid_rules(self, kwargs):
+        """测试计息区间必须从 0 开始，利率、管理费和最低余额不能为负数"""
+        with pytest.raises(ValueError):
+            InterestRules(**kwargs)
+
+    def test_numpy_matches_fallback(self, tmp_path):
+        """测试 NumPy 向量化计算与逐个账户计算得到完全相同的分"""
+        pytest.importorskip("numpy")
+        rng = random.Random(0)
+        manager = DataManager(str(tmp_path / "many.json"), storage="json")
+        manager.save_users([User(f"id{i}", f"user{i}", "pwd", balance_cents=rng.randrange(0, 10 ** 9),
+                                 is_frozen=rng.random() < 0.1, is_lost=rng.random() < 0.1)
+                            for i in range(2000)])
+        rules = InterestRules([(0, 0.0035), (5000000, 0.0123), (50000000, 0.0275)],
+                              min_balance_cents=100000000, fee_cents=500, days=3)
+        interest, fee = compute_postings(AccountColumns.from_data_manager(manager), rules)
+        with patch("services.interest_service.np", None), patch("utils.account_columns.np", None):
+            expected_interest, expected_fee = compute_postings(AccountColumns.from_data_manager(manager), rules)
+        manager.close()
+        assert interest.tolist() == list(expected_interest)
+        assert fee.tolist() == list(expected_fee)
@@ -0,0 +1,36 @@
+import io
+import json
+import pytest
+from models.user import User
+from utils.storage.json_stream import iter_json_array, iter_user_file
+
+
+class TestJsonStream:
+    """JSON 数组流式读取的测试"""
+
+    @pytest.mark.parametrize("chunk_size", [1, 3, 7, 64 * 1024])
+    def test_matches_json_load(self, chunk_size):
+        """测试任意分块大小下与 json.load 的结果一致"""
+        data = [{"a": 1, "s": "x],[y"}, 12345, "中文", [1, [2]], None, -1.5e3, {}]
+        text = json.dumps(data, ensure_ascii=False, indent=2)
+        assert list(iter_json_array(io.StringIO(text), chunk_size)) == data
+
+    def test_empty_array(self):
+        """测试空数组"""
+        assert list(iter_json_array(io.StringIO(" [ ] \n"), 2)) == []
+
+    @pytest.mark.parametrize("text", ['[{"a": 1}', '[1, 2,]', '{"a": 1}', '[1 2]', '[1] x', ''])
+    def test_malformed_raises(self, text):
+        """测试截断或格式错误时抛出 JSONDecodeError"""
+        with pytest.raises(json.JSONDecodeError):
+            list(iter_json_array(io.StringIO(text), 2))
+
+    def test_iter_user_file_stops_early(self, tmp_path):
+        """测试逐个读取用户文件，找到目标后不再解析后面的内容"""
+        path = tmp_path / "users.json"
+        users = [User(f"id{i}", f"user{i}", "pwd").to_dict() for i in range(3)]
+        # 目标之后的内容已损坏，提前结束时不应报错
+        path.write_text(json.dumps(users)[:-1] + ', {"broken', encoding="utf-8")
+
+        found = next(u for u in iter_user_file(str(path), chunk_size=16) if u.username == "user1")
+        assert found.user_id == "id1"
@@ -0,0 +1,68 @@
+import pytest
+from utils.storage.ledger import Ledger
+
+
+class TestLedger:
+    """交易流水账的测试"""
+
+    @pytest.fixture
+    def ledger_file(self, tmp_path):
+        return str(tmp_path / "users.ledger")
+
+    def test_append_assigns_increasing_ids(self, ledger_file):
+        """测试流水号全局递增"""
+        ledger = Ledger(ledger_file)
+        first = ledger.append("id1", "deposit", 10000, 10000)
+        second, third = ledger.append_many([("id2", "deposit", 500, 500), ("id1", "withdraw", 3000, 7000)])
+        assert (first.transaction_id, second.transaction_id, third.transaction_id) == (1, 2, 3)
+
+    def test_history_is_newest_first_and_per_user(self, ledger_file):
+        """测试只返回该用户的记录，且按时间倒序"""
+        ledger = Ledger(ledger_file)
+        ledger.append("id1", "deposit", 10000, 10000)
+        ledger.append("id2", "deposit", 500, 500)
+        ledger.append("id1", "withdraw", 3000, 7000)
+
+        records, cursor = ledger.history("id1")
+        assert [(r.type, r.balance_after_cents) for r in records] == [("withdraw", 7000), ("deposit", 10000)]
+        assert cursor is None
+        assert ledger.history("nobody") == ([], None)
+
+    def test_history_pagination(self, ledger_file):
+        """测试按游标翻页"""
+        ledger = Ledger(ledger_file)
+        for i in range(5):
+            ledger.append("id1", "deposit", 100, (i + 1) * 100)
+
+        page, cursor = ledger.history("id1", limit=2)
+        assert [r.balance_after_cents for r in page] == [500, 400]
+        page, cursor = ledger.history("id1", limit=2, cursor=cursor)
+        assert [r.balance_after_cents for r in page] == [300, 200]
+        page, cursor = ledger.history("id1", limit=2, cursor=cursor)
+        assert [r.balance_after_cents for r in page] == [100]
+        assert cursor is None
+
+    def test_reopen_rebuilds_index(self, ledger_file):
+        """测试重新打开后重建索引并继续编号"""
+        Ledger(ledger_file).append("id1", "deposit", 10000, 10000)
+        ledger = Ledger(ledger_file)
+        assert ledger.append("id1", "deposit", 100, 10100).transaction_id == 2
+        assert len(ledger.history("id1")[0]) == 2
+
+    def test_sees_other_writer(self, ledger_file):
+        """测试感知另一个实例追加的记录"""
+        reader = Ledger(ledger_file)
+        Ledger(ledger_file).append("id1", "deposit", 10000, 10000)
+        assert len(reader.history("id1")[0]) == 1
+        assert reader.append("id1", "deposit", 100, 10100).transaction_id == 2
+
+    def test_append_after_torn_tail(self, ledger_file):
+        """测试崩溃留下半行记录后，追加会先截掉半行，之后的读取和重新打开都正常"""
+        Ledger(ledger_file).append("id1", "deposit", 10000, 10000)
+        with open(ledger_file, 'ab') as f:
+            f.write(b'{"id": 2, "user_id": "id1", "ty')
+        ledger = Ledger(ledger_file)
+        assert ledger.append("id1", "withdraw", 3000, 7000).transaction_id == 2
+        assert [r.balance_after_cents for r in ledger.history("id1")[0]] == [7000, 10000]
+        reopened = Ledger(ledger_file)
+        assert [r.balance_after_cents for r in reopened.history("id1")[0]] == [7000, 10000]
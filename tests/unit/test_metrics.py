@@ -0,0 +1,121 @@
+import json
+import signal
+import pytest
+from models.user import User
+from services.transaction_service import TransactionService
+from utils import metrics
+from utils.data_manager import DataManager
+
+
+class TestMetrics:
+    """操作耗时统计的测试"""
+
+    @pytest.fixture(autouse=True)
+    def registry(self):
+        metrics.REGISTRY.reset()
+        yield metrics.REGISTRY
+        metrics.enable(False)
+        metrics.REGISTRY.reset()
+
+    def test_disabled_records_nothing(self, registry):
+        """测试关闭时不记录"""
+        metrics.enable(False)
+        assert metrics.instrument("op")(lambda x: x + 1)(1) == 2
+        assert registry.snapshot() == {}
+
+    def test_counts_calls_and_errors(self, registry):
+        """测试记录调用次数、异常次数，异常照常抛出"""
+        metrics.enable()
+
+        @metrics.instrument("op")
+        def op(fail=False):
+            if fail:
+                raise ValueError("失败")
+            return "ok"
+
+        assert op() == "ok"
+        with pytest.raises(ValueError):
+            op(fail=True)
+        data = registry.snapshot()["op"]
+        assert (data["count"], data["errors"]) == (2, 1)
+        assert sum(data["buckets"]) == 2
+        assert 0 <= data["p50_seconds"] <= data["p99_seconds"] <= data["max_seconds"]
+
+    def test_percentile(self):
+        """测试百分位数落在对应的桶内"""
+        histogram = metrics.Histogram()
+        for _ in range(98):
+            histogram.observe(0.0005, False)
+        histogram.observe(0.05, False)
+        histogram.observe(0.05, False)
+        assert 0.00025 <= histogram.percentile(50) <= 0.0006
+        assert 0.03 <= histogram.percentile(99) <= 0.05
+
+    def test_instrument_methods(self):
+        """测试只包装公开的普通方法"""
+        @metrics.instrument_methods("demo")
+        class Demo:
+            def run(self):
+                return 1
+
+            def _private(self):
+                return 2
+
+            @staticmethod
+            def helper():
+                return 3
+
+            def items(self):
+                yield 4
+
+        metrics.enable()
+        demo = Demo()
+        assert (demo.run(), demo._private(), Demo.helper(), list(demo.items())) == (1, 2, 3, [4])
+        assert list(metrics.REGISTRY.snapshot()) == ["demo.run"]
+
+    def test_services_and_storage(self, tmp_path, registry):
+        """测试服务方法、DataManager 和存储 I/O 的统计"""
+        metrics.enable()
+        data_manager = DataManager(str(tmp_path / "users.json"), storage="json")
+        data_manager.save_users([User("id1", "alice", "pwd", balance=100)])
+        user = data_manager.find_user_by_id("id1")
+        assert TransactionService(data_manager).deposit(user, 50)[0]
+        data_manager.close()
+
+        snapshot = registry.snapshot()
+        for name in ("transaction_service.deposit", "data_manager.save_users", "storage.save_users",
+                     "storage.update_user", "storage.write_snapshot", "ledger.append_many"):
+            assert snapshot[name]["count"] >= 1, name
+
+    def test_write_metrics(self, tmp_path, registry):
+        """测试导出 JSON 和 Prometheus 文本格式"""
+        registry.observe("user_service.login", 0.003)
+        registry.observe("user_service.login", 0.2, error=True)
+
+        json_file = tmp_path / "metrics.json"
+        metrics.write_metrics(str(json_file))
+        assert json.loads(json_file.read_text(encoding="utf-8"))["user_service.login"]["count"] == 2
+
+        prom_file = tmp_path / "metrics.prom"
+        metrics.write_metrics(str(prom_file))
+        text = prom_file.read_text(encoding="utf-8")
+        assert 'bank_operation_duration_seconds_bucket{op="user_service.login",le="+Inf"} 2' in text
+        assert 'bank_operation_duration_seconds_count{op="user_service.login"} 2' in text
+        assert 'bank_operation_errors_total{op="user_service.login"} 1' in text
+
+    @pytest.mark.skipif(not hasattr(signal, "SIGUSR1"), reason="平台不支持 SIGUSR1")
+    def test_signal_handler_does_not_deadlock(self, tmp_path, registry):
+        """测试信号在持有统计锁时到达，处理函数不阻塞，锁释放后写出统计"""
+        path = tmp_path / "metrics.json"
+        previous = signal.getsignal(signal.SIGUSR1)
+        try:
+            assert metrics.install_signal_handler(str(path))
+            registry.observe("op", 0.001)
+            with registry._lock:
+                # 模拟信号打断了正在 observe 中的线程
+                thread = signal.getsignal(signal.SIGUSR1)(signal.SIGUSR1, None)
+                assert thread.is_alive()
+            thread.join(5)
+        finally:
+            signal.signal(signal.SIGUSR1, previous)
+        assert json.loads(path.read_text(encoding="utf-8"))["op"]["count"] == 1
@@ -0,0 +1,88 @@
+import os
+import pytest
+from models.user import User
+from utils.storage.journal import Journal
+from utils.storage.mmap_storage import MmapStorage
+
+
+class TestMmapStorage:
+    """内存映射槽位存储的测试"""
+
+    @pytest.fixture
+    def data_file(self, tmp_path):
+        return str(tmp_path / "users.dat")
+
+    @pytest.fixture
+    def storage(self, data_file):
+        storage = MmapStorage(data_file)
+        for i in range(3):
+            storage.add_user(User(f"id{i}", f"user{i}", "pwd"))
+        yield storage
+        storage.close()
+
+    def test_update_patches_slot_in_place(self, data_file, storage):
+        """测试存款只原地改写槽位开头的几个字节，文件不被重写"""
+        with open(data_file, 'rb') as f:
+            before = f.read()
+        inode = os.stat(data_file).st_ino
+
+        user = storage.find_user_by_id("id1")
+        user.deposit(100.0)
+        assert storage.update_user(user) is True
+
+        with open(data_file, 'rb') as f:
+            after = f.read()
+        changed = [i for i in range(len(before)) if before[i] != after[i]]
+        assert os.stat(data_file).st_ino == inode
+        assert len(after) == len(before)
+        assert changed and changed[-1] - changed[0] < 17
+
+    def test_other_instance_sees_changes(self, data_file, storage):
+        """测试另一个实例立即看到原地更新和新增的用户"""
+        other = MmapStorage(data_file)
+        user = storage.find_user_by_id("id0")
+        user.deposit(5.0)
+        storage.update_user(user)
+        storage.add_user(User("id9", "user9", "pwd"))
+
+        assert other.find_user_by_id("id0").balance == 5.0
+        assert other.find_user_by_username("user9").user_id == "id9"
+        other.close()
+
+    def test_deleted_slot_is_reused(self, data_file, storage):
+        """测试删除用户后新用户复用其槽位"""
+        size = os.path.getsize(data_file)
+        assert storage.delete_user("id1") is True
+        assert storage.add_user(User("id3", "user3", "pwd")) is True
+
+        assert os.path.getsize(data_file) == size
+        assert [u.user_id for u in storage.load_users()] == ["id0", "id3", "id2"]
+        assert storage.find_user_by_username("user1") is None
+
+    def test_replays_interrupted_batch(self, data_file, storage):
+        """测试批量更新写完重做日志后崩溃，重新打开时整批生效"""
+        users = [storage.find_user_by_id("id0"), storage.find_user_by_id("id2")]
+        records = []
+        for user in users:
+            user.deposit(10.0)
+            user.version += 1
+            records.append({"op": "put", "user": user.to_dict()})
+        Journal(data_file + ".journal").append({"op": "batch", "records": records})
+
+        reopened = MmapStorage(data_file)
+        assert reopened.find_user_by_id("id0").balance == 10.0
+        assert reopened.find_user_by_id("id2").balance == 10.0
+        assert os.path.getsize(data_file + ".journal") == 0
+        reopened.close()
+
+    def test_rejects_oversized_field(self, storage):
+        """测试超过槽位字段长度的用户名无法保存"""
+        assert storage.add_user(User("id9", "x" * 65, "pwd")) is False
+
+    def test_rejects_out_of_range_balance(self, storage):
+        """测试超出 64 位整数范围的余额无法保存（按字段不合法处理，而不是抛出 struct.error）"""
+        assert storage.add_user(User("id9", "user9", "pwd", balance_cents=2 ** 63)) is False
+        user = storage.find_user_by_id("id1")
+        user.balance_cents = 2 ** 63
+        assert storage.update_user(user) is False
+        assert storage.find_user_by_id("id1").balance_cents == 0
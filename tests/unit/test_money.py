@@ -0,0 +1,26 @@
+import pytest
+from decimal import Decimal
+from utils.money import MAX_CENTS, from_cents, to_cents
+
+
+class TestMoney:
+    """金额换算的测试"""
+
+    @pytest.mark.parametrize("amount, cents", [(12, 1200), (0.1, 10), ("2.345", 235), (Decimal("-1.005"), -101)])
+    def test_to_cents(self, amount, cents):
+        """测试换算为整数分并四舍五入"""
+        assert to_cents(amount) == cents
+        assert from_cents(1234) == 12.34
+
+    @pytest.mark.parametrize("amount", [float("inf"), float("-inf"), float("nan"), "1e400", "Infinity", "abc"])
+    def test_invalid_amount(self, amount):
+        """测试无穷大、NaN、超出精度和无法解析的金额抛出 ValueError"""
+        with pytest.raises(ValueError, match="金额格式错误"):
+            to_cents(amount)
+
+    @pytest.mark.parametrize("amount", [1e17, -1e17, 10 ** 17, "92233720368547758.08"])
+    def test_amount_out_of_range(self, amount):
+        """测试换算后超出 64 位整数范围的金额抛出 ValueError"""
+        with pytest.raises(ValueError, match="金额超出范围"):
+            to_cents(amount)
+        assert to_cents(Decimal(MAX_CENTS) / 100) == MAX_CENTS
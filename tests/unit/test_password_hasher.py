@@ -0,0 +1,69 @@
+import hashlib
+import pytest
+from unittest.mock import patch
+from utils import password_hasher
+from utils.password_hasher import PasswordHasher
+
+
+@pytest.fixture
+def hasher():
+    # 测试中使用很小的参数并在当前线程中计算
+    return PasswordHasher(log2_n=4, workers=0)
+
+
+class TestPasswordHasher:
+    def test_hash_and_verify(self, hasher):
+        """测试哈希加盐且可以验证"""
+        hashed = hasher.hash("secret")
+        assert hashed.startswith("scrypt$4$8$1$")
+        assert hashed != hasher.hash("secret")
+        assert hasher.verify("secret", hashed) is True
+        assert hasher.verify("wrong", hashed) is False
+        assert hasher.needs_rehash(hashed) is False
+
+    def test_legacy_sha256(self, hasher):
+        """测试旧版无盐 SHA-256 摘要仍可验证，并需要重新计算"""
+        legacy = hashlib.sha256(b"secret").hexdigest()
+        assert hasher.verify("secret", legacy) is True
+        assert hasher.verify("wrong", legacy) is False
+        assert hasher.needs_rehash(legacy) is True
+
+    def test_parameters_stored_per_hash(self, hasher):
+        """测试调整参数后旧哈希仍按其自身参数验证"""
+        hashed = hasher.hash("secret")
+        stronger = PasswordHasher(log2_n=5, workers=0)
+        assert stronger.verify("secret", hashed) is True
+        assert stronger.needs_rehash(hashed) is True
+
+    def test_malformed_hash(self, hasher):
+        """测试格式错误的哈希验证失败"""
+        for hashed in ("", "hashed_password", "scrypt$x$8$1$AA$AA", "bcrypt$4$8$1$AA$AA"):
+            assert hasher.verify("secret", hashed) is False
+
+    def test_verified_credentials_cached(self, hasher):
+        """测试验证通过后再次验证不重新计算，密码错误不命中缓存"""
+        hashed = hasher.hash("secret")
+        with patch.object(password_hasher, "_scrypt", wraps=password_hasher._scrypt) as scrypt:
+            assert hasher.verify("secret", hashed) is True
+            assert hasher.verify("secret", hashed) is True
+            assert scrypt.call_count == 1
+            assert hasher.verify("wrong", hashed) is False
+            assert scrypt.call_count == 2
+
+    def test_cache_expires(self, hasher):
+        """测试缓存过期后重新计算"""
+        hasher.cache_ttl = 0
+        hashed = hasher.hash("secret")
+        with patch.object(password_hasher, "_scrypt", wraps=password_hasher._scrypt) as scrypt:
+            hasher.verify("secret", hashed)
+            hasher.verify("secret", hashed)
+            assert scrypt.call_count == 2
+
+    def test_process_pool(self):
+        """测试在进程池中计算的结果与直接计算一致"""
+        pooled = PasswordHasher(log2_n=4, workers=1)
+        try:
+            hashed = pooled.hash("secret")
+        finally:
+            pooled.close()
+        assert PasswordHasher(log2_n=4, workers=0).verify("secret", hashed) is True
@@ -0,0 +1,68 @@
+import copy
+import pytest
+from unittest.mock import patch
+from models.user import User
+from services.account_service import AccountService
+from services.report_service import ReportService
+from services.transaction_service import TransactionService
+from utils.aggregates import BookAggregates
+from utils.data_manager import DataManager
+
+
+class TestReportService:
+    """管理报表和增量汇总的测试"""
+
+    @pytest.fixture
+    def data_manager(self, tmp_path):
+        manager = DataManager(str(tmp_path / "users.json"), storage="json")
+        manager.save_users([User(f"id{i}", f"user{i}", "pwd", balance=i * 100) for i in range(10)])
+        yield manager
+        manager.close()
+
+    def test_summary(self, data_manager):
+        """测试总额、平均余额、状态计数和百分位数"""
+        summary = ReportService(data_manager).summary()
+        assert summary["accounts"] == 10
+        assert summary["total_balance"] == 4500.0
+        assert summary["average_balance"] == 450.0
+        assert (summary["frozen"], summary["lost"], summary["active_sessions"]) == (0, 0, 0)
+        # 100 - 900 元落在 [100, 200)、[200, 500)、[500, 1000) 三档，中位数在 [200, 500) 内
+        assert 200 <= summary["p50"] <= 500
+        assert ReportService(data_manager).balance_distribution() == [
+            (0.0, 0.01, 1), (100.0, 200.0, 1), (200.0, 500.0, 3), (500.0, 1000.0, 5)]
+
+    def test_updates_without_rescanning(self, data_manager):
+        """测试存取款、冻结、挂失、销户后汇总随之更新，不再扫描账户"""
+        report = ReportService(data_manager)
+        report.summary()
+        transactions, accounts = TransactionService(data_manager), AccountService(data_manager)
+
+        with patch.object(data_manager.storage, "iter_users", side_effect=AssertionError("不应重新扫描")):
+            transactions.deposit(data_manager.find_user_by_id("id0"), 50)
+            transactions.withdraw(data_manager.find_user_by_id("id9"), 100)
+            accounts.freeze_account(data_manager.find_user_by_id("id1"))
+            accounts.report_loss(data_manager.find_user_by_id("id2"))
+            accounts.close_account(data_manager.find_user_by_id("id3"))
+            summary = report.summary()
+
+        assert summary["accounts"] == 9
+        assert summary["total_balance"] == 4500.0 + 50 - 100 - 300
+        assert (summary["frozen"], summary["lost"]) == (1, 1)
+
+    def test_stale_write_does_not_overwrite_newer(self):
+        """测试同一账户的旧版本晚于新版本记入时被忽略"""
+        user = User("id", "user", "pwd", balance=1)
+        aggregates = BookAggregates([user])
+        newer = copy.copy(user)
+        newer.balance_cents, newer.version = 500, 2
+        older = copy.copy(user)
+        older.balance_cents, older.version = 300, 1
+
+        aggregates.put([newer])
+        aggregates.put([older])
+
+        assert aggregates.total_balance_cents == 500
+
+    def test_invalid_percentile(self, data_manager):
+        with pytest.raises(ValueError):
+            ReportService(data_manager).percentile(101)
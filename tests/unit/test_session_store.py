@@ -0,0 +1,65 @@
+import pytest
+from utils.session_store import SessionStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSessionStore:
+    """会话表的测试"""
+
+    @pytest.fixture
+    def clock(self):
+        return FakeClock()
+
+    @pytest.fixture
+    def store(self, clock):
+        return SessionStore(ttl=60, clock=clock)
+
+    def test_validate_and_expire(self, store, clock):
+        """测试会话在有效期内有效，过期后被清理"""
+        store.create("u1", "t1")
+        assert store.validate("u1", "t1") is True
+        assert store.validate("u2", "t1") is False
+        clock.now += 61
+        assert store.validate("u1", "t1") is False
+        assert store.active_token("u1") is None
+        assert len(store) == 0
+
+    def test_validate_extends_expiry(self, store, clock):
+        """测试验证成功后有效期顺延"""
+        store.create("u1", "t1")
+        clock.now += 50
+        assert store.validate("u1", "t1") is True
+        clock.now += 50
+        assert store.reap() == []
+        assert store.validate("u1", "t1") is True
+        clock.now += 61
+        assert store.reap() == ["u1"]
+
+    def test_new_login_replaces_old_session(self, store):
+        """测试同一用户重新创建会话后旧令牌失效"""
+        store.create("u1", "t1")
+        store.create("u1", "t2")
+        assert store.validate("u1", "t1") is False
+        assert store.active_token("u1") == "t2"
+        assert store.revoke_user("u1") is True
+        assert store.active_token("u1") is None
+
+    def test_persistence(self, tmp_path, clock):
+        """测试会话落盘后重新加载，只恢复未过期的会话"""
+        path = str(tmp_path / "sessions.json")
+        store = SessionStore(ttl=60, persist_file=path, clock=clock)
+        store.create("u1", "t1")
+        clock.now += 30
+        store.create("u2", "t2")
+
+        clock.now += 40
+        reloaded = SessionStore(ttl=60, persist_file=path, clock=clock)
+        assert reloaded.validate("u1", "t1") is False
+        assert reloaded.validate("u2", "t2") is True
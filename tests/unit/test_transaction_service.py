@@ -1,6 +1,9 @@
 import pytest
 from unittest.mock import MagicMock, patch
 from models.user import User
+from utils.data_manager import DataManager
+from utils.money import MAX_CENTS
+from utils.storage.base import ConcurrentModificationError
 
 class TestTransactionService:
     """Test cases for TransactionService class."""
@@ -147,3 +150,180 @@ class TestTransactionService:
         assert "冻结" in message
         assert balance == initial_balance
         transaction_service.data_manager.update_user.assert_not_called()
+
+    def test_deposit_conflict_refreshes_user(self, transaction_service, active_user):
+        """Test deposit when the account was modified by another terminal."""
+        # Setup
+        transaction_service.data_manager.update_user.side_effect = ConcurrentModificationError([active_user.user_id])
+
+        # Execute
+        success, message, balance = transaction_service.deposit(active_user, 100.0)
+
+        # Verify
+        assert success is False
+        assert "其他终端" in message
+        transaction_service.data_manager.refresh_user.assert_called_once_with(active_user)
+
+
+class TestBatchTransactions:
+    """Test cases for the batch API against a real JSON store."""
+
+    @pytest.fixture
+    def data_manager(self, tmp_path):
+        manager = DataManager(str(tmp_path / "users.json"), storage="json")
+        manager.add_user(User("id1", "user1", "pwd", balance=100.0))
+        manager.add_user(User("id2", "user2", "pwd", balance=50.0))
+        manager.add_user(User("frozen", "user3", "pwd", balance=10.0, is_frozen=True))
+        return manager
+
+    @pytest.fixture
+    def transaction_service(self, data_manager):
+        from services.transaction_service import TransactionService
+        return TransactionService(data_manager)
+
+    def test_deposit_many_persists_once(self, transaction_service, data_manager):
+        """Test a batch of deposits is written with a single update_users call."""
+        with patch.object(data_manager, "update_users", wraps=data_manager.update_users) as spy:
+            results = transaction_service.deposit_many([("id1", 10.0), ("id2", 5.0), ("id1", 1.0)])
+
+        assert [r[0] for r in results] == [True, True, True]
+        assert [r[2] for r in results] == [110.0, 55.0, 111.0]
+        spy.assert_called_once()
+        assert data_manager.find_user_by_id("id1").balance == 111.0
+        assert data_manager.find_user_by_id("id2").balance == 55.0
+
+    def test_best_effort_skips_failures(self, transaction_service, data_manager):
+        """Test best-effort mode applies valid items and reports the others."""
+        results = transaction_service.apply_batch([
+            ("withdraw", "id1", 30.0),
+            ("withdraw", "id2", 80.0),
+            ("deposit", "frozen", 1.0),
+            ("deposit", "missing", 1.0),
+        ])
+
+        assert results[0] == (True, "取款成功，取出金额: 30.0", 70.0)
+        assert results[1][0] is False and "余额不足" in results[1][1]
+        assert results[2][0] is False and "冻结" in results[2][1]
+        assert results[3][0] is False and "不存在" in results[3][1]
+        assert data_manager.find_user_by_id("id1").balance == 70.0
+        assert data_manager.find_user_by_id("id2").balance == 50.0
+
+    def test_malformed_amounts_fail_per_item(self, transaction_service, data_manager):
+        """Test NaN, infinite, unparsable and out-of-range amounts fail only their own item."""
+        results = transaction_service.apply_batch([
+            ("deposit", "id1", float("nan")),
+            ("deposit", "id1", 10.0),
+            ("withdraw", "id2", "abc"),
+            ("deposit", "id2", float("inf")),
+            ("deposit", "id2", 1e17),
+        ])
+
+        assert results[1] == (True, "存款成功，存入金额: 10.0", 110.0)
+        assert [r[0] for r in results] == [False, True, False, False, False]
+        assert results[0][1] == "金额格式错误" and results[2][1] == "金额格式错误"
+        assert results[4][1] == "金额超出范围" and results[4][2] == 50.0
+        assert data_manager.find_user_by_id("id1").balance == 110.0
+        assert data_manager.find_user_by_id("id2").balance == 50.0
+
+    def test_failed_transfer_credit_restores_payer(self, transaction_service, data_manager):
+        """Test a transfer whose credit would overflow the payee leaves both balances unchanged."""
+        payee = data_manager.find_user_by_id("id2")
+        payee.balance_cents = MAX_CENTS
+        data_manager.update_user(payee)
+
+        results = transaction_service.transfer_many([("id1", "id2", 10.0)])
+
+        assert results == [(False, "余额超出上限", 100.0)]
+        assert data_manager.find_user_by_id("id1").balance == 100.0
+
+    def test_atomic_batch_rolls_back(self, transaction_service, data_manager):
+        """Test all-or-nothing mode writes nothing when one item fails."""
+        results = transaction_service.withdraw_many([("id1", 30.0), ("id2", 80.0)], atomic=True)
+
+        assert [r[0] for r in results] == [False, False]
+        assert "整批未执行" in results[0][1]
+        assert results[0][2] == 100.0
+        assert data_manager.find_user_by_id("id1").balance == 100.0
+
+    def test_batch_retries_after_conflict(self, transaction_service, data_manager):
+        """Test the batch is re-planned on fresh data after a concurrent update."""
+        original = data_manager.update_users
+        calls = []
+
+        def concurrent_update(users):
+            if not calls:
+                # 模拟另一个终端在本批提交前存入了一笔
+                other = data_manager.find_user_by_id("id1")
+                other.deposit(1.0)
+                data_manager.update_user(other)
+            calls.append(users)
+            return original(users)
+
+        with patch.object(data_manager, "update_users", side_effect=concurrent_update):
+            results = transaction_service.deposit_many([("id1", 10.0)])
+
+        assert results[0][0] is True
+        assert len(calls) == 2
+        assert data_manager.find_user_by_id("id1").balance == 111.0
+
+    def test_transfer(self, transaction_service, data_manager):
+        """Test a transfer debits and credits both accounts in one write."""
+        payer, payee = data_manager.find_user_by_id("id1"), data_manager.find_user_by_id("id2")
+        with patch.object(data_manager, "update_users", wraps=data_manager.update_users) as spy:
+            success, message, balance = transaction_service.transfer(payer, payee, 40.0)
+
+        assert success is True
+        assert balance == 60.0
+        assert payee.balance == 90.0
+        spy.assert_called_once()
+        assert data_manager.find_user_by_id("id1").balance == 60.0
+        assert data_manager.find_user_by_id("id2").balance == 90.0
+
+    def test_transfer_to_frozen_account(self, transaction_service, data_manager):
+        """Test a transfer to a frozen account is rejected without side effects."""
+        payer, payee = data_manager.find_user_by_id("id1"), data_manager.find_user_by_id("frozen")
+
+        success, message, balance = transaction_service.transfer(payer, payee, 40.0)
+
+        assert success is False
+        assert "收款账户已冻结" in message
+        assert balance == 100.0
+        assert data_manager.find_user_by_id("frozen").balance == 10.0
+
+    def test_transfer_insufficient_balance(self, transaction_service, data_manager):
+        """Test a transfer larger than the payer's balance."""
+        payer, payee = data_manager.find_user_by_id("id2"), data_manager.find_user_by_id("id1")
+
+        success, message, balance = transaction_service.transfer(payer, payee, 80.0)
+
+        assert success is False
+        assert "余额不足" in message
+        assert payee.balance == 100.0
+
+    def test_transfer_many_shares_accounts(self, transaction_service, data_manager):
+        """Test chained transfers through a shared account settle in order."""
+        results = transaction_service.transfer_many([
+            ("id2", "id1", 50.0),
+            ("id1", "id2", 150.0),
+            ("id2", "id2", 1.0),
+        ])
+
+        assert [r[0] for r in results] == [True, True, False]
+        assert "自己" in results[2][1]
+        assert data_manager.find_user_by_id("id1").balance == 0.0
+        assert data_manager.find_user_by_id("id2").balance == 150.0
+
+    def test_history_records_transactions(self, transaction_service, data_manager):
+        """Test deposits, batches and transfers are written to the ledger."""
+        payer, payee = data_manager.find_user_by_id("id1"), data_manager.find_user_by_id("id2")
+        transaction_service.deposit(payer, 10.0)
+        transaction_service.transfer(payer, payee, 20.0)
+        transaction_service.withdraw_many([("id1", 5.0), ("id1", 1000.0)])
+
+        success, message, records, cursor = transaction_service.get_history(payer)
+        assert success is True
+        assert [(r.type, r.amount, r.balance_after) for r in records] == [
+            ("withdraw", 5.0, 85.0), ("transfer_out", 20.0, 90.0), ("deposit", 10.0, 110.0)]
+        assert cursor is None
+        _, _, records, _ = transaction_service.get_history(payee)
+        assert [(r.type, r.balance_after) for r in records] == [("transfer_in", 70.0)]
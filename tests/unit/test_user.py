@@ -1,6 +1,8 @@
+import copy
 import pytest
 from datetime import datetime
 from models.user import User
+from utils.money import MAX_CENTS
 
 
 class TestUserModel:
@@ -149,4 +151,54 @@ class TestUserModel:
 
         # 测试解冻
         user.unfreeze_account()
-        assert user.is_frozen is False
\ No newline at end of file
+        assert user.is_frozen is False
+
+    def test_balance_is_exact_in_cents(self):
+        """测试余额以整数分累加，不产生浮点误差"""
+        user = User("id", "user", "pwd")
+        for _ in range(10):
+            user.deposit(0.1)
+        assert user.balance_cents == 100
+        assert user.balance == 1.0
+
+        assert user.withdraw(0.3) is True
+        assert user.balance_cents == 70
+
+    def test_deposit_beyond_max_balance(self):
+        """测试存入后余额超出 64 位整数范围时抛出 ValueError，余额不变"""
+        user = User("id", "user", "pwd", balance_cents=MAX_CENTS - 50)
+        with pytest.raises(ValueError):
+            user.deposit(1.0)
+        assert user.balance_cents == MAX_CENTS - 50
+
+    def test_from_legacy_float_balance(self):
+        """测试旧格式的浮点数余额读入时换算为分"""
+        data = User("id", "user", "pwd").to_dict()
+        del data["balance_cents"]
+        data["balance"] = 10061.07
+
+        user = User.from_dict(data)
+
+        assert user.balance_cents == 1006107
+        assert "balance" not in user.to_dict()
+
+    def test_from_dict_keeps_timestamps_and_uses_slots(self):
+        """测试从字典恢复时保留原有时间戳，且对象不带 __dict__"""
+        data = User("id", "user", "pwd").to_dict()
+        data["created_at"] = "2020-01-01T00:00:00"
+        data["last_login"] = "2020-01-02T00:00:00"
+
+        user = User.from_dict(data)
+
+        assert user.created_at == "2020-01-01T00:00:00"
+        assert user.last_login == "2020-01-02T00:00:00"
+        assert not hasattr(user, "__dict__")
+
+    def test_copy_copies_every_field(self):
+        """测试浅拷贝复制所有字段（新增字段时需同步修改 __copy__）"""
+        user = User("id", "user", "pwd", balance=1.5, is_frozen=True, session_token="t", version=3)
+
+        clone = copy.copy(user)
+
+        assert clone is not user
+        assert all(getattr(clone, name) == getattr(user, name) for name in User.__slots__)
@@ -0,0 +1,105 @@
+import hashlib
+import time
+import pytest
+from datetime import datetime, timedelta
+from services.user_service import UserService
+from utils.data_manager import DataManager
+from utils.password_hasher import PasswordHasher
+from utils.session_store import SessionStore
+
+
+@pytest.fixture
+def user_service(user_service):
+    user_service.hasher = PasswordHasher(log2_n=4, workers=0)
+    return user_service
+
+
+class TestUserServiceSessions:
+    """UserService 与会话表配合的测试"""
+
+    def test_login_registers_session(self, user_service, test_user):
+        """测试登录后会话可以不经存储直接验证，登出后失效"""
+        test_user.password = user_service._hash_password("password")
+        user_service.data_manager.find_user_by_username.return_value = test_user
+        user_service.data_manager.update_user.return_value = True
+
+        success, _, user, token = user_service.login("testuser", "password")
+        assert success is True
+        assert user_service.check_session(user.user_id, token) is True
+        user_service.logout(user)
+        assert user_service.check_session(user.user_id, token) is False
+
+    def test_recent_login_elsewhere_blocks_login(self, user_service, test_user):
+        """测试其他终端刚登录的账户不能重复登录"""
+        test_user.password = user_service._hash_password("password")
+        test_user.generate_session_token()
+        user_service.data_manager.find_user_by_username.return_value = test_user
+
+        success, message, _, _ = user_service.login("testuser", "password")
+
+        assert success is False
+        assert "其他设备" in message
+
+    def test_stale_login_does_not_lock_account(self, user_service, test_user):
+        """测试终端崩溃留下的过期登录状态不会永久锁住账户"""
+        test_user.password = user_service._hash_password("password")
+        test_user.generate_session_token()
+        test_user.last_login = (datetime.now() - timedelta(seconds=user_service.sessions.ttl + 1)).isoformat()
+        user_service.data_manager.find_user_by_username.return_value = test_user
+        user_service.data_manager.update_user.return_value = True
+
+        success, _, _, _ = user_service.login("testuser", "password")
+
+        assert success is True
+
+    def test_login_on_other_terminal_blocks_until_ttl(self, tmp_path):
+        """测试另一终端（各自的会话表、共用存储）上的登录阻止重复登录，崩溃留下的登录状态过期后不再阻止"""
+        data_file = str(tmp_path / "users.json")
+        hasher = PasswordHasher(log2_n=4, workers=0)
+        first = UserService(DataManager(data_file, storage="json"), hasher=hasher)
+        first.register("alice", "password")
+        assert first.login("alice", "password")[0] is True
+        first.data_manager.close()
+
+        second = UserService(DataManager(data_file, storage="json"), sessions=SessionStore(ttl=0.2), hasher=hasher)
+        assert "其他设备" in second.login("alice", "password")[1]
+        time.sleep(0.3)
+        assert second.login("alice", "password")[0] is True
+        second.data_manager.close()
+
+
+class TestUserServicePasswords:
+    """密码哈希相关的测试"""
+
+    def test_login_rehashes_legacy_password(self, user_service, test_user):
+        """测试旧版 SHA-256 密码登录成功后改存为新格式"""
+        test_user.password = hashlib.sha256(b"password").hexdigest()
+        user_service.data_manager.find_user_by_username.return_value = test_user
+        user_service.data_manager.update_user.return_value = True
+
+        success, _, user, _ = user_service.login("testuser", "password")
+
+        assert success is True
+        assert user.password.startswith("scrypt$")
+        assert user_service.verify_password(user, "password") is True
+
+    def test_change_password(self, user_service, test_user):
+        """测试修改密码需要原密码正确"""
+        test_user.password = user_service._hash_password("old")
+        user_service.data_manager.update_user.return_value = True
+
+        assert user_service.change_password(test_user, "wrong", "new") == (False, "原密码错误")
+        assert user_service.change_password(test_user, "old", "new") == (True, "密码修改成功")
+        assert user_service.verify_password(test_user, "new") is True
+        assert user_service.verify_password(test_user, "old") is False
+
+
+class TestUserServiceSearch:
+    def test_search_users_pages(self, user_service):
+        """测试按页码换算偏移量，并拒绝空前缀和非法页码"""
+        user_service.data_manager.search_users.return_value = (25, [])
+
+        assert user_service.search_users("al", page=3, page_size=10) == (True, "查询成功", 25, [])
+        user_service.data_manager.search_users.assert_called_once_with("al", True, 20, 10)
+        assert user_service.search_users("")[0] is False
+        assert user_service.search_users("al", page=0)[0] is False
@@ -0,0 +1,47 @@
+from array import array
+from typing import List
+from utils.data_manager import DataManager
+
+try:
+    import numpy as np
+except ImportError:
+    # NumPy 为可选依赖，未安装时各列使用标准库 array
+    np = None
+
+
+class AccountColumns:
+    """
+    账户的列式快照：每个字段一列，第 i 行对应 user_ids[i]
+    已安装 NumPy 时各列为 numpy 数组，否则为 array.array（均为连续内存，不为每个账户保留 User 对象）
+    versions 记录生成快照时的版本号，写回时据此检测并发修改
+    """
+
+    def __init__(self, user_ids: List[str], balance_cents, versions, is_frozen, is_lost):
+        self.user_ids = user_ids
+        self.balance_cents = balance_cents
+        self.versions = versions
+        self.is_frozen = is_frozen
+        self.is_lost = is_lost
+
+    @classmethod
+    def from_data_manager(cls, data_manager: DataManager) -> 'AccountColumns':
+        """遍历一次存储生成快照"""
+        user_ids: List[str] = []
+        balance_cents, versions = array('q'), array('q')
+        is_frozen, is_lost = array('b'), array('b')
+        for user in data_manager.iter_users():
+            user_ids.append(user.user_id)
+            balance_cents.append(user.balance_cents)
+            versions.append(user.version)
+            is_frozen.append(user.is_frozen)
+            is_lost.append(user.is_lost)
+        if np is not None:
+            # 从 array 的缓冲区直接构造，不逐个转换
+            return cls(user_ids, np.frombuffer(balance_cents, dtype=np.int64).copy(),
+                       np.frombuffer(versions, dtype=np.int64).copy(),
+                       np.frombuffer(is_frozen, dtype=np.int8).astype(bool),
+                       np.frombuffer(is_lost, dtype=np.int8).astype(bool))
+        return cls(user_ids, balance_cents, versions, is_frozen, is_lost)
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
@@ -0,0 +1,106 @@
+import bisect
+import threading
+from typing import Dict, Iterable, List, Tuple
+from models.user import User
+
+# 余额分布的桶下界（分）：0 元单独一档，之后按 1、2、5 元 ×10^n 递增，最后一档没有上限
+BUCKET_BOUNDS = [0, 1] + [m * 10 ** e * 100 for e in range(10) for m in (1, 2, 5)]
+
+FLAG_FROZEN = 1
+FLAG_LOST = 2
+FLAG_USING = 4
+
+
+def _flags(user: User) -> int:
+    return (FLAG_FROZEN if user.is_frozen else 0) | (FLAG_LOST if user.is_lost else 0) | \
+           (FLAG_USING if user.is_using else 0)
+
+
+class BookAggregates:
+    """
+    账户总表的汇总：账户数、余额合计、冻结/挂失/在线账户数和余额分布直方图
+    每个账户只记录 (版本号, 余额, 状态)，写入成功后按新旧状态的差值更新，读取汇总为 O(1)
+    （百分位数在直方图上插值，为 O(桶数)）
+    """
+
+    def __init__(self, users: Iterable[User] = ()):
+        self._lock = threading.Lock()
+        # user_id -> (version, balance_cents, flags)
+        self._accounts: Dict[str, Tuple[int, int, int]] = {}
+        self.count = 0
+        self.total_balance_cents = 0
+        self.frozen_count = 0
+        self.lost_count = 0
+        self.active_sessions = 0
+        self.buckets: List[int] = [0] * len(BUCKET_BOUNDS)
+        for user in users:
+            self._put(user)
+
+    def _apply(self, balance_cents: int, flags: int, sign: int) -> None:
+        self.count += sign
+        self.total_balance_cents += sign * balance_cents
+        if flags & FLAG_FROZEN:
+            self.frozen_count += sign
+        if flags & FLAG_LOST:
+            self.lost_count += sign
+        if flags & FLAG_USING:
+            self.active_sessions += sign
+        self.buckets[max(bisect.bisect_right(BUCKET_BOUNDS, balance_cents) - 1, 0)] += sign
+
+    def _put(self, user: User) -> None:
+        old = self._accounts.get(user.user_id)
+        if old is not None:
+            if old[0] > user.version:
+                # 更新的写入已先一步记入（多个线程同时写同一账户时的先后顺序）
+                return
+            self._apply(old[1], old[2], -1)
+        state = (user.version, user.balance_cents, _flags(user))
+        self._accounts[user.user_id] = state
+        self._apply(state[1], state[2], 1)
+
+    def put(self, users: Iterable[User]) -> None:
+        """记入新增或已更新的账户"""
+        with self._lock:
+            for user in users:
+                self._put(user)
+
+    def remove(self, user_id: str) -> None:
+        """移除已删除的账户"""
+        with self._lock:
+            old = self._accounts.pop(user_id, None)
+            if old is not None:
+                self._apply(old[1], old[2], -1)
+
+    def percentile(self, q: float) -> float:
+        """余额的第 q 百分位数（分，0 <= q <= 100），在所在的桶内线性插值"""
+        with self._lock:
+            return self._percentile(q)
+
+    def _percentile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            if count and seen + count >= rank:
+                low = BUCKET_BOUNDS[i]
+                if i + 1 == len(BUCKET_BOUNDS):
+                    return float(low)
+                return low + (BUCKET_BOUNDS[i + 1] - low) * max(rank - seen, 0) / count
+            seen += count
+        return float(BUCKET_BOUNDS[-1])
+
+    def summary(self) -> dict:
+        """当前汇总（一致的快照）"""
+        with self._lock:
+            return {
+                "accounts": self.count,
+                "total_balance_cents": self.total_balance_cents,
+                "frozen": self.frozen_count,
+                "lost": self.lost_count,
+                "active_sessions": self.active_sessions,
+                "histogram": [(BUCKET_BOUNDS[i], count) for i, count in enumerate(self.buckets) if count],
+                "p50_cents": self._percentile(50),
+                "p90_cents": self._percentile(90),
+                "p99_cents": self._percentile(99),
+            }
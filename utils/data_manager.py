@@ -1,83 +1,184 @@
-import json
 import os
-from typing import List, Dict, Optional
+import threading
+from typing import Iterator, List, Optional, Tuple
 from models.user import User
+from utils.aggregates import BookAggregates
+from utils.metrics import instrument
+from utils.storage.base import StorageBackend
+from utils.storage.binary_storage import BinaryStorage
+from utils.storage.json_storage import JsonStorage
+from utils.storage.ledger import Ledger
+from utils.storage.mmap_storage import MmapStorage
+from utils.storage.sqlite_storage import SqliteStorage
+
+# 通过环境变量选择存储后端和数据文件，例如 BANK_STORAGE=sqlite
+STORAGE_ENV = "BANK_STORAGE"
+DATA_FILE_ENV = "BANK_DATA_FILE"
+JOURNAL_ENV = "BANK_JOURNAL"
+GROUP_COMMIT_ENV = "BANK_GROUP_COMMIT_MS"
+
+STORAGE_BACKENDS = {
+    "json": (JsonStorage, "data/users.json"),
+    "binary": (BinaryStorage, "data/users.bin"),
+    "sqlite": (SqliteStorage, "data/users.db"),
+    "mmap": (MmapStorage, "data/users.dat"),
+}
+
+
+def create_storage(storage: Optional[str] = None, data_file: Optional[str] = None,
+                   **options) -> StorageBackend:
+    """
+    按名称创建存储后端
+    未显式指定时依次读取环境变量 BANK_STORAGE、BANK_DATA_FILE，默认使用 JSON 文件；
+    JSON 系后端还读取 BANK_JOURNAL 和 BANK_GROUP_COMMIT_MS
+    """
+    storage = (storage or os.environ.get(STORAGE_ENV) or "json").lower()
+    if storage not in STORAGE_BACKENDS:
+        raise ValueError(f"未知的存储后端: {storage}，可选: {', '.join(STORAGE_BACKENDS)}")
+    backend_class, default_file = STORAGE_BACKENDS[storage]
+    data_file = data_file or os.environ.get(DATA_FILE_ENV) or default_file
+    if issubclass(backend_class, JsonStorage):
+        if "journal" not in options:
+            options["journal"] = os.environ.get(JOURNAL_ENV, "").lower() in ("1", "true", "yes")
+        if "group_commit_ms" not in options and os.environ.get(GROUP_COMMIT_ENV):
+            options["group_commit_ms"] = float(os.environ[GROUP_COMMIT_ENV])
+    return backend_class(data_file, **options)
 
 
 class DataManager:
-    def __init__(self, data_file: str = "data/users.json"):
-        self.data_file = data_file
-        # 确保数据目录存在
-        os.makedirs(os.path.dirname(data_file), exist_ok=True)
-        # 如果数据文件不存在，创建一个空的
-        if not os.path.exists(data_file):
-            self._create_empty_data_file()
-
-    def _create_empty_data_file(self) -> None:
-        """创建空的数据文件"""
-        with open(self.data_file, 'w', encoding='utf-8') as f:
-            json.dump([], f, ensure_ascii=False, indent=2)
+    def __init__(self, data_file: Optional[str] = None, storage: Optional[str] = None,
+                 backend: Optional[StorageBackend] = None, ledger: Optional[Ledger] = None, **options):
+        """
+        data_file: 数据文件路径，默认由所选后端决定
+        storage: 存储后端名称（json / binary / sqlite / mmap），默认读取环境变量 BANK_STORAGE
+        backend: 直接传入已创建的后端实例，优先于 storage
+        ledger: 交易流水账，默认与数据文件同目录同名、扩展名为 .ledger
+        options: 传给后端构造函数的其他参数，如 JSON 后端的 journal=True
+        """
+        self.storage = backend if backend is not None else create_storage(storage, data_file, **options)
+        if ledger is None:
+            ledger = Ledger(os.path.splitext(self.storage.data_file)[0] + ".ledger")
+        self.ledger = ledger
+        # 报表用的汇总，第一次读取时扫描一遍建立，之后随本实例的每次写入增量更新
+        self._aggregates: Optional[BookAggregates] = None
+        self._aggregates_lock = threading.Lock()
+
+    @property
+    def aggregates(self) -> BookAggregates:
+        """
+        账户总表的汇总（账户数、余额合计、状态计数、余额分布）
+        只跟踪经由本实例的写入；其他进程直接修改数据文件后可调用 rebuild_aggregates
+        """
+        with self._aggregates_lock:
+            if self._aggregates is None:
+                # 先挂上空的汇总再扫描：扫描期间完成的写入版本号更新，不会被扫描到的旧数据覆盖
+                self._aggregates = BookAggregates()
+                self._aggregates.put(self.storage.iter_users())
+            return self._aggregates
+
+    def rebuild_aggregates(self) -> BookAggregates:
+        """丢弃现有汇总，重新扫描建立"""
+        with self._aggregates_lock:
+            self._aggregates = None
+        return self.aggregates
+
+    def _track(self, users: List[User]) -> None:
+        """写入成功后更新汇总（尚未建立汇总时无需处理）"""
+        if self._aggregates is not None:
+            self._aggregates.put(users)
 
+    @instrument("data_manager.load_users")
     def load_users(self) -> List[User]:
         """从文件加载所有用户"""
-        try:
-            with open(self.data_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return [User.from_dict(user_data) for user_data in data]
-        except FileNotFoundError:
-            return []
-        except json.JSONDecodeError:
-            return []
+        return self.storage.load_users()
 
+    def iter_users(self) -> Iterator[User]:
+        """
+        逐个产出所有用户，适合报表、迁移等扫描，找到目标后可提前结束
+        例如: next((u for u in dm.iter_users() if u.is_frozen), None)
+        """
+        return self.storage.iter_users()
+
+    @instrument("data_manager.save_users")
     def save_users(self, users: List[User]) -> bool:
         """保存用户列表到文件"""
-        try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump([user.to_dict() for user in users], f, ensure_ascii=False, indent=2)
-            return True
-        except Exception as e:
-            print(f"保存用户数据时出错: {e}")
-            return False
+        saved = self.storage.save_users(users)
+        if saved and self._aggregates is not None:
+            self.rebuild_aggregates()
+        return saved
 
     def find_user_by_username(self, username: str) -> Optional[User]:
         """根据用户名查找用户"""
-        users = self.load_users()
-        for user in users:
-            if user.username == username:
-                return user
-        return None
+        return self.storage.find_user_by_username(username)
 
     def find_user_by_id(self, user_id: str) -> Optional[User]:
         """根据用户ID查找用户"""
-        users = self.load_users()
-        for user in users:
-            if user.user_id == user_id:
-                return user
-        return None
+        return self.storage.find_user_by_id(user_id)
+
+    def search_users(self, prefix: str, ignore_case: bool = True, offset: int = 0,
+                     limit: int = 20) -> Tuple[int, List[User]]:
+        """
+        按用户名前缀分页查找（柜员按部分用户名查客户）
+        返回 (匹配总数, 第 offset 条起最多 limit 个用户)，按忽略大小写的用户名排序
+        """
+        return self.storage.search_users(prefix, ignore_case, offset, limit)
 
     def add_user(self, user: User) -> bool:
         """添加新用户"""
-        users = self.load_users()
-        # 检查用户名是否已存在
-        if self.find_user_by_username(user.username):
-            return False
-        users.append(user)
-        return self.save_users(users)
+        if self.storage.add_user(user):
+            self._track([user])
+            return True
+        return False
+
+    def add_users(self, users: List[User]) -> bool:
+        """批量添加新用户（批量导入），整批只持久化一次"""
+        if self.storage.add_users(users):
+            self._track(users)
+            return True
+        return False
 
     def update_user(self, user: User) -> bool:
-        """更新用户信息"""
-        users = self.load_users()
-        for i, u in enumerate(users):
-            if u.user_id == user.user_id:
-                users[i] = user
-                return self.save_users(users)
+        """
+        更新用户信息
+        用户已被其他终端修改时抛出 ConcurrentModificationError
+        """
+        if self.storage.update_user(user):
+            self._track([user])
+            return True
+        return False
+
+    def update_users(self, users: List[User]) -> bool:
+        """
+        批量更新，整批只持久化一次
+        任一用户已被其他终端修改时整批不生效，并抛出 ConcurrentModificationError
+        """
+        if self.storage.update_users(users):
+            self._track(users)
+            return True
         return False
 
+    def refresh_user(self, user: User) -> bool:
+        """用存储中的最新数据覆盖 user（并发冲突后重试前调用）"""
+        latest = self.storage.find_user_by_id(user.user_id)
+        if latest is None:
+            return False
+        user.refresh_from(latest)
+        # 其他终端的修改顺带同步到汇总
+        self._track([latest])
+        return True
+
     def delete_user(self, user_id: str) -> bool:
         """删除用户"""
-        users = self.load_users()
-        updated_users = [u for u in users if u.user_id != user_id]
-        if len(updated_users) == len(users):
-            # 没有删除任何用户
-            return False
-        return self.save_users(updated_users)
\ No newline at end of file
+        if self.storage.delete_user(user_id):
+            if self._aggregates is not None:
+                self._aggregates.remove(user_id)
+            return True
+        return False
+
+    def compact(self) -> bool:
+        """整理存储（如把日志合并回快照）"""
+        return self.storage.compact()
+
+    def close(self) -> None:
+        """关闭存储"""
+        self.storage.close()
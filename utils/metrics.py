@@ -0,0 +1,214 @@
+"""
+操作计数与耗时统计
+
+用 @instrument("名称") 包装函数、用 @instrument_methods("前缀") 包装类的所有公开方法，
+启用后记录每个操作的调用次数、异常次数和耗时直方图（p50 / p99）。默认关闭，关闭时包装
+只多一次布尔判断；设置环境变量 BANK_METRICS=1 或调用 enable() 开启。
+
+导出为 Prometheus 文本格式（write_metrics("metrics.prom")）或 JSON（扩展名为 .json），
+也可以用 install_signal_handler 在收到 SIGUSR1 时写出；app.py 和 api_server.py 的 --metrics-file FILE
+参数会开启统计，并在收到 SIGUSR1 和退出时写入 FILE。
+
+用法: python -m utils.metrics FILE.json   把 JSON 格式的导出转换为 Prometheus 文本格式
+"""
+import argparse
+import atexit
+import bisect
+import functools
+import inspect
+import json
+import os
+import signal
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+from utils.storage.atomic_file import atomic_write
+
+METRICS_ENV = "BANK_METRICS"
+# 耗时直方图的桶上界（秒）：1 微秒起每档翻倍，约到 17 秒
+BUCKET_BOUNDS = [1e-6 * 2 ** i for i in range(25)]
+
+_enabled = os.environ.get(METRICS_ENV, "").lower() in ("1", "true", "yes")
+
+
+class Histogram:
+    """一个操作的调用次数、异常次数和耗时分布"""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        # 最后一档记录超过最大上界的耗时
+        self.buckets: List[int] = [0] * (len(BUCKET_BOUNDS) + 1)
+
+    def observe(self, seconds: float, error: bool) -> None:
+        self.count += 1
+        self.errors += error
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+
+    def percentile(self, q: float) -> float:
+        """第 q 百分位数（秒），在所在的桶内线性插值"""
+        if self.count == 0:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            if count and seen + count >= rank:
+                low = BUCKET_BOUNDS[i - 1] if i else 0.0
+                high = BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else self.max
+                return min(low + (high - low) * max(rank - seen, 0) / count, self.max)
+            seen += count
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_seconds": self.total,
+            "max_seconds": self.max,
+            "p50_seconds": self.percentile(50),
+            "p99_seconds": self.percentile(99),
+            "buckets": self.buckets,
+        }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float, error: bool = False) -> None:
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(seconds, error)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+    def snapshot(self) -> Dict[str, dict]:
+        """{操作名: 统计}，按操作名排序"""
+        with self._lock:
+            return {name: self._histograms[name].to_dict() for name in sorted(self._histograms)}
+
+
+REGISTRY = MetricsRegistry()
+
+
+def enable(enabled: bool = True) -> None:
+    """开启或关闭统计（已记录的数据保留）"""
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def instrument(name: str) -> Callable:
+    """记录被包装函数每次调用的耗时，抛出异常的调用计入 errors"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                REGISTRY.observe(name, time.perf_counter() - start, True)
+                raise
+            REGISTRY.observe(name, time.perf_counter() - start)
+            return result
+        return wrapper
+    return decorator
+
+
+def instrument_methods(prefix: str) -> Callable:
+    """
+    类装饰器：包装类中定义的所有公开方法，操作名为 前缀.方法名
+    静态方法、属性和生成器（调用时尚未执行，耗时没有意义）不包装
+    """
+    def decorator(cls):
+        for attr, value in list(vars(cls).items()):
+            if not attr.startswith("_") and inspect.isfunction(value) and not inspect.isgeneratorfunction(value):
+                setattr(cls, attr, instrument(f"{prefix}.{attr}")(value))
+        return cls
+    return decorator
+
+
+def format_prometheus(snapshot: Dict[str, dict]) -> str:
+    """转换为 Prometheus 文本格式"""
+    lines = ["# HELP bank_operation_duration_seconds 操作耗时",
+             "# TYPE bank_operation_duration_seconds histogram"]
+    for name, data in snapshot.items():
+        cumulative = 0
+        for bound, count in zip(BUCKET_BOUNDS + [float("inf")], data["buckets"]):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else f"{bound:.6g}"
+            lines.append(f'bank_operation_duration_seconds_bucket{{op="{name}",le="{le}"}} {cumulative}')
+        lines.append(f'bank_operation_duration_seconds_sum{{op="{name}"}} {data["total_seconds"]:.9f}')
+        lines.append(f'bank_operation_duration_seconds_count{{op="{name}"}} {data["count"]}')
+    lines += ["# HELP bank_operation_errors_total 抛出异常的调用次数",
+              "# TYPE bank_operation_errors_total counter"]
+    lines += [f'bank_operation_errors_total{{op="{name}"}} {data["errors"]}' for name, data in snapshot.items()]
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(path: str, fmt: Optional[str] = None) -> None:
+    """把当前统计写入文件；fmt 为 json 或 prometheus，默认按扩展名判断"""
+    fmt = fmt or ("json" if path.endswith(".json") else "prometheus")
+    snapshot = REGISTRY.snapshot()
+    if fmt == "json":
+        atomic_write(path, lambda f: json.dump(snapshot, f, ensure_ascii=False, indent=2))
+    else:
+        atomic_write(path, lambda f: f.write(format_prometheus(snapshot)))
+
+
+def write_metrics_in_background(path: str, fmt: Optional[str] = None) -> threading.Thread:
+    """
+    在新线程中写出统计，供信号处理函数调用：处理函数在被打断的线程上执行，
+    该线程可能正持有统计锁（observe 中），直接写出会在同一把锁上死锁
+    """
+    def write():
+        try:
+            write_metrics(path, fmt)
+        except OSError as e:
+            print(f"写入统计文件时出错: {e}")
+
+    thread = threading.Thread(target=write, name="metrics-export", daemon=True)
+    thread.start()
+    return thread
+
+
+def install_signal_handler(path: str, fmt: Optional[str] = None, signum: int = getattr(signal, "SIGUSR1", 0)) -> bool:
+    """收到信号（默认 SIGUSR1）时写出统计；平台不支持该信号时返回 False"""
+    if not signum:
+        return False
+    signal.signal(signum, lambda received, frame: write_metrics_in_background(path, fmt))
+    return True
+
+
+def export_to(path: str, fmt: Optional[str] = None) -> None:
+    """开启统计，收到 SIGUSR1 时和进程退出时把统计写入 path（各入口的 --metrics-file 参数）"""
+    enable()
+    install_signal_handler(path, fmt)
+    atexit.register(write_metrics, path, fmt)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="把 JSON 格式的统计转换为 Prometheus 文本格式")
+    parser.add_argument("file", help="write_metrics 写出的 JSON 文件")
+    args = parser.parse_args()
+    with open(args.file, 'r', encoding='utf-8') as f:
+        print(format_prometheus(json.load(f)), end="")
+
+
+if __name__ == "__main__":
+    main()
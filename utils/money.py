@@ -0,0 +1,33 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Union
+
+# 1 元 = 100 分，余额和交易金额在内部一律以整数分表示
+CENTS_PER_YUAN = 100
+# 金额和余额的上限（分）：各存储后端以 64 位有符号整数保存
+MAX_CENTS = 2 ** 63 - 1
+
+
+def to_cents(amount: Union[int, float, str, Decimal]) -> int:
+    """
+    把以元为单位的金额转换为整数分（四舍五入到分）
+    无穷大、NaN、超出精度范围或无法解析的金额抛出 ValueError，绝对值超过 MAX_CENTS 分的同样抛出
+    """
+    if isinstance(amount, int):
+        cents = amount * CENTS_PER_YUAN
+    else:
+        try:
+            # 经 str 转换，避免 0.1 这类浮点数的二进制误差被带入
+            value = Decimal(str(amount)) if isinstance(amount, float) else Decimal(amount)
+            if not value.is_finite():
+                raise ValueError("金额格式错误")
+            cents = int((value * CENTS_PER_YUAN).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+        except InvalidOperation:
+            raise ValueError("金额格式错误") from None
+    if abs(cents) > MAX_CENTS:
+        raise ValueError("金额超出范围")
+    return cents
+
+
+def from_cents(cents: int) -> float:
+    """把整数分转换为以元为单位的金额（用于显示和兼容旧接口）"""
+    return cents / CENTS_PER_YUAN
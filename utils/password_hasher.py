@@ -0,0 +1,166 @@
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from utils.metrics import instrument
+
+# scrypt 默认参数：N=2^14, r=8, p=1，约 16MB 内存
+DEFAULT_LOG2_N = 14
+DEFAULT_R = 8
+DEFAULT_P = 1
+SALT_SIZE = 16
+KEY_SIZE = 32
+# 计算哈希的进程数，0 表示在调用线程中直接计算
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+# 验证通过的密码缓存多久（秒）及最多缓存多少条
+DEFAULT_CACHE_TTL = 300
+DEFAULT_CACHE_SIZE = 10000
+
+SCHEME = "scrypt"
+# 旧版本保存的无盐 SHA-256 十六进制摘要
+_LEGACY_SHA256 = re.compile(r"[0-9a-f]{64}")
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def _scrypt(password: str, salt: bytes, log2_n: int, r: int, p: int, key_size: int) -> bytes:
+    """在工作进程中执行，必须是模块级函数"""
+    n = 1 << log2_n
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, dklen=key_size,
+                          maxmem=256 * n * r + (1 << 20))
+
+
+class PasswordHasher:
+    """
+    加盐的 scrypt 密码哈希，参数随哈希一起保存：scrypt$log2N$r$p$盐$摘要
+    调整默认参数后旧哈希仍可验证，登录时通过 needs_rehash 判断是否需要按新参数重新计算
+    scrypt 计算放在进程池中执行，多个登录可以同时计算；验证通过的结果短时间缓存，
+    同一会话中再次确认密码（修改密码、销户）不必重新计算
+    """
+
+    def __init__(self, log2_n: int = DEFAULT_LOG2_N, r: int = DEFAULT_R, p: int = DEFAULT_P,
+                 workers: int = DEFAULT_WORKERS, cache_ttl: float = DEFAULT_CACHE_TTL,
+                 cache_size: int = DEFAULT_CACHE_SIZE):
+        self.log2_n = log2_n
+        self.r = r
+        self.p = p
+        self.workers = workers
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        # 已保存的哈希 -> (密码的 HMAC, 到期时间)；哈希含随机盐，每个用户不同
+        self._cache: Dict[str, Tuple[bytes, float]] = {}
+        self._cache_lock = threading.Lock()
+        # 缓存中不保存明文密码，只保存以进程内随机密钥计算的 HMAC
+        self._cache_key = os.urandom(32)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # 用 spawn 启动工作进程，避免在已有线程的进程中 fork
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def _derive(self, password: str, salt: bytes, log2_n: int, r: int, p: int, key_size: int) -> bytes:
+        if self.workers <= 0:
+            return _scrypt(password, salt, log2_n, r, p, key_size)
+        return self._get_pool().submit(_scrypt, password, salt, log2_n, r, p, key_size).result()
+
+    def _format(self, salt: bytes, key: bytes) -> str:
+        return f"{SCHEME}${self.log2_n}${self.r}${self.p}${_b64encode(salt)}${_b64encode(key)}"
+
+    @instrument("password.hash")
+    def hash(self, password: str) -> str:
+        """按当前参数计算密码哈希"""
+        salt = os.urandom(SALT_SIZE)
+        return self._format(salt, self._derive(password, salt, self.log2_n, self.r, self.p, KEY_SIZE))
+
+    @instrument("password.hash_many")
+    def hash_many(self, passwords: List[str]) -> List[str]:
+        """批量计算密码哈希（批量导入时使用），各工作进程分块并行计算"""
+        salts = [os.urandom(SALT_SIZE) for _ in passwords]
+        args = (passwords, salts, [self.log2_n] * len(passwords), [self.r] * len(passwords),
+                [self.p] * len(passwords), [KEY_SIZE] * len(passwords))
+        if self.workers <= 0:
+            keys = list(map(_scrypt, *args))
+        else:
+            chunk_size = max(1, len(passwords) // (self.workers * 4))
+            keys = list(self._get_pool().map(_scrypt, *args, chunksize=chunk_size))
+        return [self._format(salt, key) for salt, key in zip(salts, keys)]
+
+    @instrument("password.verify")
+    def verify(self, password: str, hashed: str) -> bool:
+        """密码是否与保存的哈希（新格式或旧版 SHA-256 摘要）匹配"""
+        if not hashed:
+            return False
+        mac = hmac.new(self._cache_key, password.encode(), hashlib.sha256).digest()
+        now = time.monotonic()
+        with self._cache_lock:
+            cached = self._cache.get(hashed)
+        if cached is not None and cached[1] > now and hmac.compare_digest(cached[0], mac):
+            return True
+
+        if _LEGACY_SHA256.fullmatch(hashed):
+            valid = hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), hashed)
+        else:
+            try:
+                scheme, log2_n, r, p, salt, key = hashed.split("$")
+                if scheme != SCHEME:
+                    return False
+                expected = _b64decode(key)
+                derived = self._derive(password, _b64decode(salt), int(log2_n), int(r), int(p), len(expected))
+            except ValueError:
+                # 格式错误或参数不合法
+                return False
+            valid = hmac.compare_digest(derived, expected)
+
+        if valid:
+            with self._cache_lock:
+                if len(self._cache) >= self.cache_size:
+                    self._prune(now)
+                self._cache[hashed] = (mac, now + self.cache_ttl)
+        return valid
+
+    def _prune(self, now: float) -> None:
+        """清理过期的缓存，仍然太多时清空"""
+        for hashed in [h for h, (_, expires_at) in self._cache.items() if expires_at <= now]:
+            del self._cache[hashed]
+        if len(self._cache) >= self.cache_size:
+            self._cache.clear()
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """保存的哈希是否为旧格式或参数与当前设置不同"""
+        return not hashed.startswith(f"{SCHEME}${self.log2_n}${self.r}${self.p}$")
+
+    def close(self) -> None:
+        """关闭进程池"""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+
+
+_default_hasher: Optional[PasswordHasher] = None
+_default_hasher_lock = threading.Lock()
+
+
+def get_default_hasher() -> PasswordHasher:
+    """进程内共用的密码哈希器，多个服务实例共用同一个进程池和验证缓存"""
+    global _default_hasher
+    with _default_hasher_lock:
+        if _default_hasher is None:
+            _default_hasher = PasswordHasher()
+        return _default_hasher
@@ -0,0 +1,147 @@
+import heapq
+import json
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+from utils.storage.atomic_file import atomic_write
+
+# 会话默认有效期（秒），每次验证成功后顺延
+DEFAULT_TTL = 30 * 60
+
+
+class Session:
+    __slots__ = ("user_id", "token", "expires_at")
+
+    def __init__(self, user_id: str, token: str, expires_at: float):
+        self.user_id = user_id
+        self.token = token
+        self.expires_at = expires_at
+
+
+class SessionStore:
+    """
+    内存中的会话表：按令牌 O(1) 查找，每个用户最多一个会话
+    过期时间放在最小堆中，每次访问时顺带清理已过期的会话，验证会话不涉及任何 I/O
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL, persist_file: Optional[str] = None,
+                 clock: Callable[[], float] = time.time):
+        """
+        ttl: 会话有效期（秒），每次验证成功后从当前时间起重新计算
+        persist_file: 保存会话的文件，进程重启后恢复未过期的会话；None 表示只保存在内存中。
+                      只在创建、注销和清理会话时写入，验证时的顺延不落盘
+        clock: 时间来源（Unix 时间戳），测试时可替换
+        """
+        self.ttl = ttl
+        self.persist_file = persist_file
+        self._clock = clock
+        self._sessions: Dict[str, Session] = {}
+        self._tokens_by_user: Dict[str, str] = {}
+        # (到期时间, 令牌)，每个会话一项；会话被顺延后旧的到期时间在出堆时更正
+        self._expiry_heap: List[tuple] = []
+        self._lock = threading.Lock()
+        if persist_file:
+            self._load()
+
+    def _load(self) -> None:
+        """从文件恢复未过期的会话"""
+        now = self._clock()
+        try:
+            with open(self.persist_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            sessions = [Session(user_id, token, expires_at) for token, (user_id, expires_at) in data.items()]
+        except FileNotFoundError:
+            return
+        except (ValueError, TypeError, AttributeError, OSError) as e:
+            print(f"读取会话文件时出错，已忽略: {e}")
+            return
+        for session in sessions:
+            if session.expires_at > now:
+                self._add(session)
+
+    def _save(self) -> None:
+        if not self.persist_file:
+            return
+        data = {s.token: [s.user_id, s.expires_at] for s in self._sessions.values()}
+        try:
+            atomic_write(self.persist_file, lambda f: json.dump(data, f))
+        except OSError as e:
+            print(f"保存会话时出错: {e}")
+
+    def _add(self, session: Session) -> None:
+        self._sessions[session.token] = session
+        self._tokens_by_user[session.user_id] = session.token
+        heapq.heappush(self._expiry_heap, (session.expires_at, session.token))
+
+    def _remove(self, session: Session) -> None:
+        del self._sessions[session.token]
+        if self._tokens_by_user.get(session.user_id) == session.token:
+            del self._tokens_by_user[session.user_id]
+
+    def _reap(self, now: float) -> List[str]:
+        """清理已过期的会话，返回其 user_id"""
+        expired = []
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            _, token = heapq.heappop(heap)
+            session = self._sessions.get(token)
+            if session is None:
+                # 会话已被注销
+                continue
+            if session.expires_at > now:
+                # 会话期间被顺延过，按新的到期时间重新入堆
+                heapq.heappush(heap, (session.expires_at, token))
+                continue
+            self._remove(session)
+            expired.append(session.user_id)
+        return expired
+
+    def reap(self) -> List[str]:
+        """清理已过期的会话，返回其 user_id"""
+        with self._lock:
+            expired = self._reap(self._clock())
+            if expired:
+                self._save()
+            return expired
+
+    def create(self, user_id: str, token: str) -> None:
+        """登记新会话，同一用户之前的会话作废"""
+        with self._lock:
+            now = self._clock()
+            self._reap(now)
+            old_token = self._tokens_by_user.get(user_id)
+            if old_token is not None:
+                self._remove(self._sessions[old_token])
+            self._add(Session(user_id, token, now + self.ttl))
+            self._save()
+
+    def validate(self, user_id: str, token: str) -> bool:
+        """会话是否存在、属于该用户且未过期；有效时顺延有效期"""
+        with self._lock:
+            now = self._clock()
+            self._reap(now)
+            session = self._sessions.get(token)
+            if session is None or session.user_id != user_id:
+                return False
+            session.expires_at = now + self.ttl
+            return True
+
+    def active_token(self, user_id: str) -> Optional[str]:
+        """用户当前未过期会话的令牌，没有时返回 None"""
+        with self._lock:
+            self._reap(self._clock())
+            return self._tokens_by_user.get(user_id)
+
+    def revoke_user(self, user_id: str) -> bool:
+        """注销用户的会话"""
+        with self._lock:
+            token = self._tokens_by_user.get(user_id)
+            if token is None:
+                return False
+            self._remove(self._sessions[token])
+            self._save()
+            return True
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
@@ -0,0 +1,68 @@
+import os
+import stat
+import tempfile
+from typing import Callable, IO
+
+
+def backup_path(path: str, generation: int) -> str:
+    """第 generation 代备份文件的路径，1 为最近一代"""
+    return f"{path}.{generation}"
+
+
+def _fsync_dir(directory: str) -> None:
+    """fsync 目录，确保 rename 本身落盘"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory or ".", os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _rotate_backups(path: str, backups: int) -> None:
+    """把当前文件轮转为备份：path.1 -> path.2 ...，当前文件硬链接为 path.1"""
+    if not os.path.exists(path):
+        return
+    for generation in range(backups - 1, 0, -1):
+        if os.path.exists(backup_path(path, generation)):
+            os.replace(backup_path(path, generation), backup_path(path, generation + 1))
+    # 通过硬链接保留旧版本，原路径在任何时刻都指向一个完整的文件
+    link_tmp = backup_path(path, 1) + ".tmp"
+    if os.path.exists(link_tmp):
+        os.remove(link_tmp)
+    try:
+        os.link(path, link_tmp)
+    except OSError:
+        # 不支持硬链接的文件系统退化为复制
+        with open(path, 'rb') as src, open(link_tmp, 'wb') as dst:
+            dst.write(src.read())
+    os.replace(link_tmp, backup_path(path, 1))
+
+
+def atomic_write(path: str, write: Callable[[IO], None], backups: int = 0, binary: bool = False) -> None:
+    """
+    原子地写入文件：先写同目录下的临时文件并 fsync，再用 os.replace 覆盖原文件
+    读者只会看到完整的旧文件或完整的新文件
+    backups: 保留的历史版本数量（path.1 为最近一代）
+    binary: 以二进制模式打开临时文件，默认为 UTF-8 文本
+    """
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                    dir=directory or ".")
+    try:
+        if os.path.exists(path):
+            # mkstemp 创建的文件权限为 0600，沿用原文件的权限
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode))
+        with (os.fdopen(fd, 'wb') if binary else os.fdopen(fd, 'w', encoding='utf-8')) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        if backups:
+            _rotate_backups(path, backups)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _fsync_dir(directory)
@@ -0,0 +1,94 @@
+from abc import ABC, abstractmethod
+from typing import Iterator, List, Optional, Tuple
+from models.user import User
+
+
+class StorageError(Exception):
+    """存储层无法安全读写数据时抛出（如数据文件损坏且没有可用备份）"""
+
+
+class ConcurrentModificationError(StorageError):
+    """更新时发现用户已被其他终端修改（版本号不一致），调用方应刷新后重试"""
+
+    def __init__(self, user_ids):
+        self.user_ids = list(user_ids)
+        super().__init__(f"用户数据已被其他终端修改: {', '.join(self.user_ids)}")
+
+
+class StorageBackend(ABC):
+    """用户数据存储后端接口，DataManager 的所有读写都委托给具体实现"""
+
+    # 数据文件路径，由具体实现在构造时设置
+    data_file: str
+
+    @abstractmethod
+    def load_users(self) -> List[User]:
+        """加载所有用户"""
+
+    def iter_users(self) -> Iterator[User]:
+        """逐个产出所有用户，调用方可提前结束；默认实现基于 load_users"""
+        return iter(self.load_users())
+
+    @abstractmethod
+    def save_users(self, users: List[User]) -> bool:
+        """用给定的用户列表整体替换存储内容"""
+
+    @abstractmethod
+    def find_user_by_username(self, username: str) -> Optional[User]:
+        """根据用户名查找用户"""
+
+    @abstractmethod
+    def find_user_by_id(self, user_id: str) -> Optional[User]:
+        """根据用户ID查找用户"""
+
+    def search_users(self, prefix: str, ignore_case: bool = True, offset: int = 0,
+                     limit: int = 20) -> Tuple[int, List[User]]:
+        """
+        按用户名前缀分页查找，结果按忽略大小写的用户名排序
+        返回 (匹配总数, 第 offset 条起最多 limit 个用户)；默认实现扫描全部用户
+        """
+        if ignore_case:
+            folded = prefix.casefold()
+            matches = [user for user in self.iter_users() if user.username.casefold().startswith(folded)]
+        else:
+            matches = [user for user in self.iter_users() if user.username.startswith(prefix)]
+        matches.sort(key=lambda user: (user.username.casefold(), user.username))
+        return len(matches), matches[offset:offset + limit]
+
+    @abstractmethod
+    def add_user(self, user: User) -> bool:
+        """添加新用户，用户名或ID已存在时返回 False"""
+
+    def add_users(self, users: List[User]) -> bool:
+        """
+        批量添加，整批只持久化一次；任一用户名或ID已存在（或批内重复）时整批不添加
+        默认实现逐个添加，不保证原子性
+        """
+        return all([self.add_user(user) for user in users])
+
+    @abstractmethod
+    def update_user(self, user: User) -> bool:
+        """
+        更新用户信息，用户不存在时返回 False
+        user.version 与存储中的版本不一致时抛出 ConcurrentModificationError，
+        成功后 user.version 加 1
+        """
+
+    def update_users(self, users: List[User]) -> bool:
+        """
+        批量更新，整批只持久化一次；任一用户版本冲突时整批不生效并抛出
+        ConcurrentModificationError。默认实现逐个更新，不保证原子性
+        """
+        return all([self.update_user(user) for user in users])
+
+    @abstractmethod
+    def delete_user(self, user_id: str) -> bool:
+        """删除用户，用户不存在时返回 False"""
+
+    def compact(self) -> bool:
+        """整理存储（如合并日志），默认无需处理"""
+        return True
+
+    def close(self) -> None:
+        """释放文件句柄、连接等资源"""
+
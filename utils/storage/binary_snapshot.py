@@ -0,0 +1,152 @@
+"""
+紧凑的二进制快照格式（版本 1，小端序）
+
+文件布局:
+    文件头    magic "BNKS" | 格式版本 u16 | 保留 u16 | 记录数 u64 | 字符串表字节数 u64 | CRC32 u32
+    记录区    每个用户一条定长记录：余额（分）i64 | 版本号 i64 | 状态位 u8 |
+              6 个字符串字段各一个 (偏移 u32, 长度 u16)，长度为 0xFFFF 表示 None
+    字符串表  所有字符串的 UTF-8 字节依次拼接
+
+CRC32 覆盖记录区和字符串表。读取时通过 mmap 映射文件，按固定偏移批量解码，
+不需要逐字符解析文本
+
+用法: python -m utils.storage.binary_snapshot to-binary users.json users.bin
+      python -m utils.storage.binary_snapshot to-json users.bin users.json
+"""
+import argparse
+import json
+import mmap
+import struct
+import zlib
+from typing import BinaryIO, Iterable, Iterator, List, Optional
+from models.user import User
+from utils.storage.atomic_file import atomic_write
+from utils.storage.json_stream import iter_user_file
+
+MAGIC = b"BNKS"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHQQI")
+STRING_FIELDS = ("user_id", "username", "password", "session_token", "last_login", "created_at")
+RECORD = struct.Struct("<qqB" + "IH" * len(STRING_FIELDS))
+NULL_LENGTH = 0xFFFF
+MAX_STRINGS_SIZE = 0xFFFFFFFF
+
+# 状态位
+FLAG_FROZEN = 1
+FLAG_LOST = 2
+FLAG_USING = 4
+
+# 计算校验和时每次处理的字节数，避免一次性复制整个映射
+CRC_CHUNK_SIZE = 1 << 20
+
+
+class SnapshotFormatError(ValueError):
+    """二进制快照的格式错误、版本不支持或校验和不一致"""
+
+
+def write_snapshot(f: BinaryIO, users: Iterable[User]) -> None:
+    """把用户写入二进制快照"""
+    records, strings = bytearray(), bytearray()
+    count = 0
+    for user in users:
+        refs = []
+        for name in STRING_FIELDS:
+            value = getattr(user, name)
+            if value is None:
+                refs += (0, NULL_LENGTH)
+                continue
+            data = value.encode("utf-8")
+            if len(data) >= NULL_LENGTH:
+                raise SnapshotFormatError(f"字段 {name} 过长: {len(data)} 字节")
+            refs += (len(strings), len(data))
+            strings += data
+        flags = ((FLAG_FROZEN if user.is_frozen else 0) | (FLAG_LOST if user.is_lost else 0)
+                 | (FLAG_USING if user.is_using else 0))
+        records += RECORD.pack(user.balance_cents, user.version, flags, *refs)
+        count += 1
+    if len(strings) > MAX_STRINGS_SIZE:
+        raise SnapshotFormatError(f"字符串表超过 4GB: {len(strings)} 字节")
+    checksum = zlib.crc32(strings, zlib.crc32(records))
+    f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, count, len(strings), checksum))
+    f.write(records)
+    f.write(strings)
+
+
+def _checksum(view, start: int) -> int:
+    """分块计算 view[start:] 的 CRC32"""
+    checksum = 0
+    for offset in range(start, len(view), CRC_CHUNK_SIZE):
+        checksum = zlib.crc32(view[offset:offset + CRC_CHUNK_SIZE], checksum)
+    return checksum
+
+
+def _decode(view) -> Iterator[User]:
+    """从 bytes 或 mmap 中逐个解码用户"""
+    if len(view) < HEADER.size:
+        raise SnapshotFormatError("文件过短，缺少文件头")
+    magic, version, _, count, strings_size, checksum = HEADER.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise SnapshotFormatError("不是二进制快照文件")
+    if version != FORMAT_VERSION:
+        raise SnapshotFormatError(f"不支持的快照格式版本: {version}")
+    strings_start = HEADER.size + count * RECORD.size
+    if strings_start + strings_size != len(view):
+        raise SnapshotFormatError("文件长度与文件头不符，可能已被截断")
+    if _checksum(view, HEADER.size) != checksum:
+        raise SnapshotFormatError("校验和不一致，文件已损坏")
+    # 记录区和字符串表各复制一次再批量解码，比逐条从映射中取值快约一倍
+    strings = view[strings_start:]
+
+    def text(offset: int, length: int) -> Optional[str]:
+        return None if length == NULL_LENGTH else strings[offset:offset + length].decode("utf-8")
+
+    for (balance_cents, version, flags, *refs) in RECORD.iter_unpack(view[HEADER.size:strings_start]):
+        yield User(text(refs[0], refs[1]), text(refs[2], refs[3]), text(refs[4], refs[5]),
+                   is_frozen=bool(flags & FLAG_FROZEN), is_lost=bool(flags & FLAG_LOST),
+                   is_using=bool(flags & FLAG_USING), session_token=text(refs[6], refs[7]),
+                   last_login=text(refs[8], refs[9]), created_at=text(refs[10], refs[11]),
+                   balance_cents=balance_cents, version=version)
+
+
+def iter_snapshot(path: str) -> Iterator[User]:
+    """通过 mmap 逐个读取二进制快照中的用户"""
+    with open(path, 'rb') as f:
+        if f.seek(0, 2) == 0:
+            # 空文件无法映射
+            raise SnapshotFormatError("文件为空")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            yield from _decode(view)
+
+
+def read_snapshot(path: str) -> List[User]:
+    """读取二进制快照中的全部用户"""
+    return list(iter_snapshot(path))
+
+
+def json_to_binary(json_file: str, binary_file: str) -> int:
+    """把 JSON 数据文件转换为二进制快照，返回用户数"""
+    users = list(iter_user_file(json_file))
+    atomic_write(binary_file, lambda f: write_snapshot(f, users), binary=True)
+    return len(users)
+
+
+def binary_to_json(binary_file: str, json_file: str) -> int:
+    """把二进制快照转换为 JSON 数据文件（与 JSON 存储后端的格式一致），返回用户数"""
+    data = [user.to_dict() for user in iter_snapshot(binary_file)]
+    atomic_write(json_file, lambda f: json.dump(data, f, ensure_ascii=False, indent=2))
+    return len(data)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="在 JSON 数据文件和二进制快照之间转换")
+    parser.add_argument("direction", choices=("to-binary", "to-json"), help="转换方向")
+    parser.add_argument("source", help="源文件")
+    parser.add_argument("target", help="目标文件")
+    args = parser.parse_args()
+    convert = json_to_binary if args.direction == "to-binary" else binary_to_json
+    count = convert(args.source, args.target)
+    print(f"已转换 {count} 个账户")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+from typing import List
+from models.user import User
+from utils.metrics import instrument
+from utils.storage.atomic_file import atomic_write
+from utils.storage.binary_snapshot import read_snapshot, write_snapshot
+from utils.storage.json_storage import JsonStorage
+
+
+class BinaryStorage(JsonStorage):
+    """
+    二进制快照存储：与 JSON 存储共用常驻索引、日志、锁和备份机制，
+    只把快照文件换成紧凑的二进制格式（见 binary_snapshot）
+    """
+
+    def __init__(self, data_file: str = "data/users.bin", **options):
+        super().__init__(data_file, **options)
+
+    @staticmethod
+    @instrument("storage.read_snapshot")
+    def _parse_file(path: str) -> List[User]:
+        """解析一个二进制快照文件"""
+        return read_snapshot(path)
+
+    @instrument("storage.write_snapshot")
+    def _write_snapshot(self, users: List[User]) -> None:
+        """把用户列表原子地写成二进制快照"""
+        atomic_write(self.data_file, lambda f: write_snapshot(f, users), self.backups, binary=True)
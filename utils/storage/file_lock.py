@@ -0,0 +1,38 @@
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，只能依赖进程内的锁
+    fcntl = None
+
+
+class FileLock:
+    """
+    基于 fcntl.flock 的跨进程排他锁（建议锁），同一对象可重入
+    调用方需自行保证同一时刻只有一个线程使用该对象（JsonStorage 在线程锁内使用）
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._depth = 0
+
+    def acquire(self) -> None:
+        """获取锁，其他进程持有时阻塞等待"""
+        if self._depth == 0 and fcntl is not None:
+            self._file = open(self.path, 'a')
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        self._depth += 1
+
+    def release(self) -> None:
+        """释放锁"""
+        self._depth -= 1
+        if self._depth == 0 and self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.release()
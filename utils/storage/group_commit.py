@@ -0,0 +1,165 @@
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+# 默认每隔多少毫秒提交一组，以及一组最多累计多少条记录
+DEFAULT_INTERVAL_MS = 5.0
+DEFAULT_MAX_RECORDS = 256
+
+
+class GroupCommit:
+    """
+    组提交：写入者追加记录后领取一个序号，后台线程每隔 interval_ms 毫秒或累计
+    max_records 条记录后统一刷盘一次，写入者只等待覆盖自己序号的那次刷盘完成
+    interval_ms 越大、max_records 越大，单次刷盘分摊的记录越多，单笔等待也越长
+    """
+
+    def __init__(self, sync: Callable[[], None], interval_ms: float = DEFAULT_INTERVAL_MS,
+                 max_records: int = DEFAULT_MAX_RECORDS, on_error: Optional[Callable[[OSError], None]] = None):
+        """
+        sync: 把已追加的记录刷到磁盘，在后台线程中调用，失败时抛出 OSError
+        on_error: 刷盘失败时在后台线程中调用，在等待中的写入者得知失败之前完成（用于撤销未刷盘的变更）
+        """
+        self._sync = sync
+        self._on_error = on_error
+        self.interval = interval_ms / 1000
+        self.max_records = max_records
+        self._cond = threading.Condition()
+        # 已领取的最大序号和已刷盘的最大序号
+        self._submitted = 0
+        self._durable = 0
+        # 最近领取的序号和最近刷盘的序号对应的文件位置（由调用方在 submit 时给出）
+        self._position = 0
+        self.durable_position = 0
+        # 当前组第一条记录的领取时间
+        self._group_started: Optional[float] = None
+        self._error: Optional[OSError] = None
+        self._closed = False
+        # when_durable 登记的 (序号, 回调)，由后台线程在刷盘完成或失败后调用
+        self._callbacks: List[Tuple[int, Callable[[bool], None]]] = []
+        # 统计
+        self.commits = 0
+        self.records = 0
+        self.max_batch_size = 0
+        self._total_latency = 0.0
+        self.max_latency = 0.0
+        self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+        self._thread.start()
+
+    def submit(self, position: int = 0) -> int:
+        """登记一条已追加（尚未刷盘）的记录，position 为追加后的文件末尾，返回其序号"""
+        with self._cond:
+            self._submitted += 1
+            self._position = position
+            if self._group_started is None:
+                self._group_started = time.perf_counter()
+                self._cond.notify_all()
+            elif self._submitted - self._durable >= self.max_records:
+                self._cond.notify_all()
+            return self._submitted
+
+    def wait(self, ticket: int) -> bool:
+        """等待序号 ticket 的记录刷盘，刷盘失败时返回 False"""
+        with self._cond:
+            while self._durable < ticket and self._error is None:
+                self._cond.wait()
+            return self._durable >= ticket
+
+    def when_durable(self, ticket: int, callback: Callable[[bool], None]) -> None:
+        """
+        序号 ticket 的记录刷盘后调用 callback(True)，刷盘失败时调用 callback(False)，不阻塞调用线程
+        已经刷盘或已经失败时立即在当前线程调用；否则在后台线程中调用，callback 应尽快返回
+        """
+        with self._cond:
+            if self._durable < ticket and self._error is None:
+                self._callbacks.append((ticket, callback))
+                return
+            durable = self._durable >= ticket
+        callback(durable)
+
+    def _take_callbacks(self) -> List[Tuple[Callable[[bool], None], bool]]:
+        """取出已刷盘（或刷盘已失败）的回调及其结果，调用方持有条件锁"""
+        ready = [(callback, ticket <= self._durable) for ticket, callback in self._callbacks
+                 if ticket <= self._durable or self._error is not None]
+        self._callbacks = [(ticket, callback) for ticket, callback in self._callbacks
+                           if ticket > self._durable and self._error is None]
+        return ready
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._group_started is not None or self._closed)
+                if self._group_started is None:
+                    return
+                # 等到凑满一组或到达提交时间
+                deadline = self._group_started + self.interval
+                while not self._closed and self._submitted - self._durable < self.max_records:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                target, position, started = self._submitted, self._position, self._group_started
+                self._group_started = None
+            # 刷盘期间不持有条件锁，新的写入者可以继续追加并组成下一组
+            try:
+                self._sync()
+            except OSError as e:
+                if self._on_error is not None:
+                    self._on_error(e)
+                with self._cond:
+                    self._error = e
+                    self._cond.notify_all()
+                    ready = self._take_callbacks()
+                for callback, durable in ready:
+                    callback(durable)
+                print(f"日志刷盘时出错: {e}")
+                return
+            latency = time.perf_counter() - started
+            with self._cond:
+                # 刷盘期间 mark_durable 可能已经确认了这些记录
+                if target > self._durable:
+                    batch_size = target - self._durable
+                    self._durable = target
+                    self.durable_position = position
+                    self.commits += 1
+                    self.records += batch_size
+                    self.max_batch_size = max(self.max_batch_size, batch_size)
+                    self._total_latency += latency
+                    self.max_latency = max(self.max_latency, latency)
+                self._cond.notify_all()
+                ready = self._take_callbacks()
+            for callback, durable in ready:
+                callback(durable)
+
+    def mark_durable(self, position: int = 0) -> None:
+        """
+        已领取的记录都已通过其他途径落盘（如日志合并进快照后清空），全部视为已刷盘
+        position 为此时的文件末尾
+        """
+        with self._cond:
+            self._durable = self._submitted
+            self._position = self.durable_position = position
+            self._cond.notify_all()
+            ready = self._take_callbacks()
+        for callback, durable in ready:
+            callback(durable)
+
+    def stats(self) -> dict:
+        """组大小和提交延迟（组内第一条记录登记到刷盘完成）的统计"""
+        with self._cond:
+            commits = self.commits or 1
+            return {
+                "commits": self.commits,
+                "records": self.records,
+                "avg_batch_size": self.records / commits,
+                "max_batch_size": self.max_batch_size,
+                "avg_commit_ms": self._total_latency / commits * 1000,
+                "max_commit_ms": self.max_latency * 1000,
+            }
+
+    def close(self) -> None:
+        """提交剩余的记录并停止后台线程"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+from typing import Iterator
+from utils.metrics import instrument
+
+
+class Journal:
+    """追加写日志：每行一条紧凑的 JSON 变更记录"""
+
+    def __init__(self, path: str, fsync_every: int = 1):
+        self.path = path
+        # 每追加多少条记录执行一次 fsync，0 表示不主动 fsync
+        self.fsync_every = fsync_every
+        self._file = None
+        self._unsynced = 0
+        self.record_count = 0
+        # 最近一次 replay 读到的有效末尾偏移
+        self.replayed_offset = 0
+        # 保护文件对象的打开和关闭，组提交的后台线程会并发读取文件描述符
+        self._io_lock = threading.Lock()
+
+    def _open(self):
+        if self._file is None:
+            with self._io_lock:
+                self._file = open(self.path, 'a', encoding='utf-8')
+        return self._file
+
+    @instrument("journal.append")
+    def append(self, record: dict) -> None:
+        """
+        追加一条记录（调用方须持有文件锁）
+        写入或 fsync 失败时先把日志截回追加前的长度再抛出 OSError，失败的记录不会在之后被重放
+        """
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n"
+        offset, unsynced = self.size(), self._unsynced
+        try:
+            f = self._open()
+            f.write(line)
+            f.flush()
+            self._unsynced += 1
+            if self.fsync_every and self._unsynced >= self.fsync_every:
+                self.sync()
+        except OSError:
+            self._unsynced = unsynced
+            self.truncate_to(offset)
+            raise
+        self.record_count += 1
+
+    @instrument("journal.sync")
+    def sync(self) -> None:
+        """将已追加的记录刷到磁盘"""
+        if self._file is not None and self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    @instrument("journal.fsync_appended")
+    def fsync_appended(self) -> None:
+        """
+        fsync 已追加的记录，供组提交的后台线程调用
+        复制一份文件描述符再 fsync，刷盘期间其他线程可以继续追加
+        """
+        with self._io_lock:
+            if self._file is None:
+                return
+            fd = os.dup(self._file.fileno())
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def replay(self, offset: int = 0, repair: bool = False) -> Iterator[dict]:
+        """
+        从指定偏移开始依次读出记录
+        repair 为 True 时截掉末尾不完整的记录（写入时崩溃留下的半行）
+        """
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+        good_offset = offset
+        with f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                good_offset += len(line)
+                yield record
+        self.replayed_offset = good_offset
+        if repair and good_offset < self.size():
+            # 丢弃损坏的尾部，避免之后的追加写接在半条记录后面
+            os.truncate(self.path, good_offset)
+
+    def size(self) -> int:
+        """日志文件当前大小（字节）"""
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def truncate_to(self, offset: int) -> None:
+        """丢弃 offset 之后的内容（未确认的追加），调用方须持有文件锁"""
+        with self._io_lock:
+            f, self._file = self._file, None
+        if f is not None:
+            try:
+                # 缓冲区中写失败的内容可能在关闭时写出，随后一并截掉
+                f.close()
+            except OSError:
+                pass
+        os.truncate(self.path, offset)
+
+    def truncate(self) -> None:
+        """清空日志（快照已包含全部记录后调用）"""
+        self.close()
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.flush()
+            os.fsync(f.fileno())
+        self.record_count = 0
+
+    def close(self) -> None:
+        """关闭日志文件"""
+        if self._file is not None:
+            self.sync()
+            with self._io_lock:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,454 @@
+import copy
+import functools
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Dict, Optional, Tuple
+from models.user import User
+from utils.metrics import instrument, instrument_methods
+from utils.storage.atomic_file import atomic_write, backup_path
+from utils.storage.base import ConcurrentModificationError, StorageBackend, StorageError
+from utils.storage.file_lock import FileLock
+from utils.storage.group_commit import DEFAULT_MAX_RECORDS, GroupCommit
+from utils.storage.journal import Journal
+from utils.storage.json_stream import iter_user_file
+from utils.storage.username_index import UsernameIndex
+
+
+def _group_committed(method):
+    """
+    写方法返回前等待本次写入所在的组刷盘（未启用组提交时无需等待）
+    在 deferred_durability 范围内不等待，只记下序号，由调用方自行等待
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        deferred = getattr(self._tickets, "deferred", None)
+        if deferred is not None:
+            ticket = getattr(self._tickets, "value", None)
+            if ticket is not None:
+                self._tickets.value = None
+                deferred.append(ticket)
+            return result
+        durable = self._wait_durable()
+        return result and durable
+    return wrapper
+
+
+@instrument_methods("storage")
+class JsonStorage(StorageBackend):
+    """JSON 文件存储：常驻内存的索引用户表，可选追加写日志"""
+
+    def __init__(self, data_file: str = "data/users.json", journal: bool = False,
+                 fsync_every: int = 1, compact_threshold: int = 10000, backups: int = 0,
+                 group_commit_ms: float = 0, group_commit_size: int = DEFAULT_MAX_RECORDS):
+        """
+        journal: 启用日志模式，每次变更只向 <data_file>.journal 追加一条记录，
+                 不再重写整个数据文件
+        fsync_every: 日志模式下每追加多少条记录 fsync 一次，0 表示交给操作系统
+        compact_threshold: 日志累计多少条记录后自动合并回快照，0 表示不自动合并
+        backups: 写快照时保留的历史版本数量（users.json.1 为最近一代）
+        group_commit_ms: 大于 0 时启用组提交（需要日志模式）：写入只追加日志，由后台线程
+                         每隔这么多毫秒统一 fsync，写方法在所属的组刷盘后才返回；
+                         启用后 fsync_every 不再生效
+        group_commit_size: 组提交时一组累计多少条记录就立即刷盘，不必等到时间间隔
+        """
+        if group_commit_ms and not journal:
+            raise ValueError("组提交需要启用日志模式（journal=True）")
+        self.data_file = data_file
+        self.backups = backups
+        # 确保数据目录存在
+        data_dir = os.path.dirname(data_file)
+        if data_dir:
+            os.makedirs(data_dir, exist_ok=True)
+        # 如果数据文件不存在，创建一个空的
+        if not os.path.exists(data_file):
+            self._create_empty_data_file()
+        self.journal = Journal(data_file + ".journal", 0 if group_commit_ms else fsync_every) if journal else None
+        self.group_commit = (GroupCommit(self.journal.fsync_appended, group_commit_ms, group_commit_size,
+                                         on_error=self._durability_failed)
+                             if group_commit_ms else None)
+        # 组提交刷盘失败后拒绝写入，需要重新打开存储
+        self._failed: Optional[OSError] = None
+        # 当前线程最近一次写入领取的组提交序号
+        self._tickets = threading.local()
+        self.compact_threshold = compact_threshold
+        # 常驻内存的用户表（按 user_id 索引）和用户名索引
+        self._users: Dict[str, User] = {}
+        self._username_index = UsernameIndex()
+        # 最近一次加载时数据文件的 (inode, mtime, size)，用于感知外部修改
+        self._file_signature: Optional[Tuple[int, int, int]] = None
+        # 已经应用到内存的日志末尾偏移
+        self._journal_offset = 0
+        # 快照通过 rename 原子替换，读操作无需加锁；锁只用于串行化写入和重新加载
+        self._lock = threading.RLock()
+        # 跨进程的写锁：多个前端共用同一数据文件时串行化“读-改-写”
+        self._file_lock = FileLock(data_file + ".lock")
+        with self._lock, self._file_lock:
+            self._reload(repair=True)
+            if self.group_commit:
+                self.group_commit.mark_durable(self._journal_offset)
+
+    def _create_empty_data_file(self) -> None:
+        """创建空的数据文件"""
+        self._write_snapshot([])
+
+    def _get_file_signature(self) -> Optional[Tuple[int, int, int]]:
+        """获取数据文件的 (inode, mtime, size)，文件不存在时返回 None"""
+        try:
+            stat = os.stat(self.data_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    @instrument("storage.read_snapshot")
+    def _parse_file(path: str) -> List[User]:
+        """
+        解析一个快照文件，子类可替换快照格式
+        流式读取，不在内存中同时保留整个文件文本和全部字典
+        """
+        return list(iter_user_file(path))
+
+    def _read_file(self) -> List[User]:
+        """
+        从文件读取所有用户
+        文件损坏时依次尝试备份版本，都不可用则抛出 StorageError，而不是当作空文件
+        """
+        try:
+            return self._parse_file(self.data_file)
+        except FileNotFoundError:
+            return []
+        except (ValueError, KeyError, TypeError) as e:
+            # ValueError 包括 JSONDecodeError、UnicodeDecodeError 和二进制快照的格式错误
+            error = e
+        for generation in range(1, self.backups + 1):
+            path = backup_path(self.data_file, generation)
+            try:
+                users = self._parse_file(path)
+            except (OSError, ValueError, KeyError, TypeError):
+                continue
+            print(f"数据文件 {self.data_file} 已损坏，已从备份 {path} 恢复")
+            return users
+        raise StorageError(f"数据文件 {self.data_file} 已损坏: {error}")
+
+    def _reload(self, repair: bool = False) -> None:
+        """重新加载数据文件并重放日志，重建索引"""
+        # 先取签名再读文件：读取期间若文件被改写，下次检查仍会发现变化
+        signature = self._get_file_signature()
+        self._set_users(self._read_file())
+        self._file_signature = signature
+        self._journal_offset = 0
+        if self.journal:
+            self.journal.record_count = 0
+            self._replay_journal(repair)
+
+    def _replay_journal(self, repair: bool = False) -> None:
+        """把日志中 _journal_offset 之后的记录应用到内存"""
+        for record in self.journal.replay(self._journal_offset, repair):
+            self._apply_record(record)
+            self.journal.record_count += 1
+        self._journal_offset = self.journal.replayed_offset
+
+    def _apply_record(self, record: dict) -> None:
+        """应用一条日志记录"""
+        if record["op"] == "put":
+            user = User.from_dict(record["user"])
+            old_user = self._users.get(user.user_id)
+            if old_user is not None:
+                self._replace_user(old_user, user)
+            else:
+                self._users[user.user_id] = user
+                self._username_index[user.username] = user.user_id
+        elif record["op"] == "del":
+            user = self._users.pop(record["user_id"], None)
+            if user is not None:
+                del self._username_index[user.username]
+        elif record["op"] == "batch":
+            for sub_record in record["records"]:
+                self._apply_record(sub_record)
+
+    def _set_users(self, users: List[User]) -> None:
+        """用给定的用户列表替换内存中的用户表"""
+        self._users = {user.user_id: user for user in users}
+        self._username_index = UsernameIndex((user.username, user.user_id) for user in users)
+
+    def _is_stale(self) -> bool:
+        """数据文件或日志是否被外部修改过"""
+        if self._get_file_signature() != self._file_signature:
+            return True
+        return bool(self.journal) and self.journal.size() != self._journal_offset
+
+    def _ensure_fresh(self) -> None:
+        """数据文件或日志被外部修改时同步内存"""
+        if not self._is_stale():
+            return
+        with self._lock:
+            if self._get_file_signature() != self._file_signature:
+                self._reload()
+            elif self.journal:
+                journal_size = self.journal.size()
+                if journal_size > self._journal_offset:
+                    # 其他进程追加了日志，只重放新增部分
+                    self._replay_journal()
+                elif journal_size < self._journal_offset:
+                    self._reload()
+
+    @instrument("storage.write_snapshot")
+    def _write_snapshot(self, users: List[User]) -> None:
+        """把用户列表原子地写成快照文件，子类可替换快照格式"""
+        data = [user.to_dict() for user in users]
+        atomic_write(self.data_file, lambda f: json.dump(data, f, ensure_ascii=False, indent=2),
+                     self.backups)
+
+    def _write_file(self, users: List[User]) -> bool:
+        """将用户列表写入文件"""
+        try:
+            self._write_snapshot(users)
+            self._file_signature = self._get_file_signature()
+            return True
+        except Exception as e:
+            print(f"保存用户数据时出错: {e}")
+            return False
+
+    def _persist(self) -> bool:
+        """将内存中的用户表写回文件"""
+        if self._failed is not None:
+            print(f"日志刷盘失败，存储已停止写入: {self._failed}")
+            return False
+        if not self._write_file(list(self._users.values())):
+            return False
+        if self.journal:
+            # 快照已包含全部变更，日志可以清空
+            self.journal.truncate()
+            self._journal_offset = 0
+            if self.group_commit:
+                self.group_commit.mark_durable(0)
+        return True
+
+    def _log(self, record: dict) -> bool:
+        """持久化一次变更：日志模式下追加记录，否则重写整个文件"""
+        if not self.journal or self._failed is not None:
+            # 组提交失败后 _persist 拒绝写入
+            return self._persist()
+        try:
+            self.journal.append(record)
+        except OSError as e:
+            print(f"写入日志时出错: {e}")
+            return False
+        self._journal_offset = self.journal.size()
+        if self.group_commit:
+            self._tickets.value = self.group_commit.submit(self._journal_offset)
+        if self.compact_threshold and self.journal.record_count >= self.compact_threshold:
+            self._persist()
+        return True
+
+    def _durability_failed(self, error: OSError) -> None:
+        """
+        组提交刷盘失败（在后台线程中调用）：等待中的写入者将被告知失败，未刷盘的变更不能
+        留在内存中被读到或被合并进快照。把日志截回最近一次成功刷盘的位置并重新加载，此后拒绝写入
+        """
+        with self._lock, self._file_lock:
+            self._failed = error
+            try:
+                self.journal.truncate_to(self.group_commit.durable_position)
+            except OSError as e:
+                print(f"截断日志时出错: {e}")
+            self._reload()
+
+    def _wait_durable(self) -> bool:
+        """等待当前线程最近一次写入所在的组刷盘，刷盘失败时返回 False"""
+        ticket = getattr(self._tickets, "value", None)
+        if ticket is None:
+            return True
+        self._tickets.value = None
+        return self.group_commit.wait(ticket)
+
+    @contextmanager
+    def deferred_durability(self):
+        """
+        范围内当前线程的写方法不等待组提交刷盘就返回，产出的列表依次收集各次写入的序号
+        用于单个写线程连续提交多笔写入、刷盘等待交给其他线程（见异步服务层），
+        调用方须在确认成功前用 group_commit.wait / when_durable 等待最后一个序号
+        """
+        tickets: List[int] = []
+        self._tickets.deferred = tickets
+        try:
+            yield tickets
+        finally:
+            self._tickets.deferred = None
+
+    @contextmanager
+    def _exclusive(self):
+        """写操作的临界区：持有线程锁和文件锁，并先同步其他进程已提交的修改"""
+        with self._lock, self._file_lock:
+            self._ensure_fresh()
+            yield
+
+    def compact(self) -> bool:
+        """把日志合并回快照文件并清空日志"""
+        with self._exclusive():
+            return self._persist()
+
+    def load_users(self) -> List[User]:
+        """从文件加载所有用户"""
+        self._ensure_fresh()
+        return [copy.copy(user) for user in list(self._users.values())]
+
+    def iter_users(self) -> Iterator[User]:
+        """逐个产出用户副本，不复制整个用户列表"""
+        self._ensure_fresh()
+        for user in tuple(self._users.values()):
+            yield copy.copy(user)
+
+    def save_users(self, users: List[User]) -> bool:
+        """保存用户列表到文件"""
+        with self._lock, self._file_lock:
+            old_users = self._users
+            self._set_users([copy.copy(user) for user in users])
+            if self._persist():
+                return True
+            self._set_users(list(old_users.values()))
+            return False
+
+    def find_user_by_username(self, username: str) -> Optional[User]:
+        """根据用户名查找用户"""
+        self._ensure_fresh()
+        user_id = self._username_index.get(username)
+        user = self._users.get(user_id) if user_id is not None else None
+        return copy.copy(user) if user else None
+
+    def find_user_by_id(self, user_id: str) -> Optional[User]:
+        """根据用户ID查找用户"""
+        self._ensure_fresh()
+        user = self._users.get(user_id)
+        return copy.copy(user) if user else None
+
+    def search_users(self, prefix: str, ignore_case: bool = True, offset: int = 0,
+                     limit: int = 20) -> Tuple[int, List[User]]:
+        """按用户名前缀分页查找"""
+        self._ensure_fresh()
+        with self._lock:
+            total, user_ids = self._username_index.search(prefix, ignore_case, offset, limit)
+            return total, [copy.copy(self._users[user_id]) for user_id in user_ids]
+
+    @_group_committed
+    def add_user(self, user: User) -> bool:
+        """添加新用户"""
+        with self._exclusive():
+            # 检查用户名是否已存在
+            if user.username in self._username_index or user.user_id in self._users:
+                return False
+            self._users[user.user_id] = copy.copy(user)
+            self._username_index[user.username] = user.user_id
+            if self._log({"op": "put", "user": user.to_dict()}):
+                return True
+            # 写入失败，回滚内存
+            del self._users[user.user_id]
+            del self._username_index[user.username]
+            return False
+
+    @_group_committed
+    def add_users(self, users: List[User]) -> bool:
+        """批量添加（写成一条日志记录或一次快照），任一用户名或ID已存在时整批不添加"""
+        with self._exclusive():
+            usernames = {user.username for user in users}
+            user_ids = {user.user_id for user in users}
+            if (len(usernames) != len(users) or len(user_ids) != len(users)
+                    or any(name in self._username_index for name in usernames)
+                    or any(user_id in self._users for user_id in user_ids)):
+                return False
+            for user in users:
+                self._users[user.user_id] = copy.copy(user)
+                self._username_index[user.username] = user.user_id
+            record = {"op": "batch", "records": [{"op": "put", "user": user.to_dict()} for user in users]}
+            if self._log(record):
+                return True
+            # 写入失败，回滚内存
+            for user in users:
+                del self._users[user.user_id]
+                del self._username_index[user.username]
+            return False
+
+    @_group_committed
+    def update_user(self, user: User) -> bool:
+        """更新用户信息（按版本号比较并交换）"""
+        with self._exclusive():
+            old_user = self._users.get(user.user_id)
+            if old_user is None:
+                return False
+            if user.version != old_user.version:
+                raise ConcurrentModificationError([user.user_id])
+            if user.username != old_user.username and user.username in self._username_index:
+                return False
+            new_user = copy.copy(user)
+            new_user.version += 1
+            self._replace_user(old_user, new_user)
+            if self._log({"op": "put", "user": new_user.to_dict()}):
+                user.version = new_user.version
+                return True
+            # 写入失败，回滚内存
+            self._replace_user(new_user, old_user)
+            return False
+
+    @_group_committed
+    def update_users(self, users: List[User]) -> bool:
+        """批量更新（整批比较版本号，只持久化一次），同一用户在 users 中只能出现一次"""
+        with self._exclusive():
+            old_users = [self._users.get(user.user_id) for user in users]
+            if any(old_user is None for old_user in old_users):
+                return False
+            conflicts = [user.user_id for user, old_user in zip(users, old_users)
+                         if user.version != old_user.version]
+            if conflicts:
+                raise ConcurrentModificationError(conflicts)
+            if any(user.username != old_user.username and user.username in self._username_index
+                   for user, old_user in zip(users, old_users)):
+                return False
+            new_users = []
+            for user, old_user in zip(users, old_users):
+                new_user = copy.copy(user)
+                new_user.version += 1
+                self._replace_user(old_user, new_user)
+                new_users.append(new_user)
+            # 整批写成一条日志记录，崩溃时要么全部生效要么全部丢弃
+            record = {"op": "batch", "records": [{"op": "put", "user": u.to_dict()} for u in new_users]}
+            if self._log(record):
+                for user, new_user in zip(users, new_users):
+                    user.version = new_user.version
+                return True
+            # 写入失败，回滚内存
+            for old_user, new_user in zip(old_users, new_users):
+                self._replace_user(new_user, old_user)
+            return False
+
+    def _replace_user(self, old_user: User, new_user: User) -> None:
+        """在内存中替换用户，并维护用户名索引"""
+        if old_user.username != new_user.username:
+            del self._username_index[old_user.username]
+            self._username_index[new_user.username] = new_user.user_id
+        self._users[new_user.user_id] = new_user
+
+    @_group_committed
+    def delete_user(self, user_id: str) -> bool:
+        """删除用户"""
+        with self._exclusive():
+            user = self._users.pop(user_id, None)
+            if user is None:
+                # 没有删除任何用户
+                return False
+            del self._username_index[user.username]
+            if self._log({"op": "del", "user_id": user_id}):
+                return True
+            # 写入失败，回滚内存
+            self._users[user_id] = user
+            self._username_index[user.username] = user_id
+            return False
+
+    def close(self) -> None:
+        """提交剩余的组并关闭日志文件"""
+        if self.group_commit:
+            self.group_commit.close()
+        if self.journal:
+            self.journal.close()
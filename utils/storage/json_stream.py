@@ -0,0 +1,93 @@
+"""
+JSON 数组的流式读取
+
+按块读取文件，用 JSONDecoder.raw_decode 逐个解码数组元素，内存占用只与
+单个元素和读取块的大小有关，而与文件大小无关
+"""
+import json
+import re
+from typing import Iterator, TextIO
+from models.user import User
+
+# 每次从文件读取的字符数
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_NUMBER_START = "-0123456789"
+# 数字后面可以合法出现的字符
+_NUMBER_END = " \t\n\r,]"
+
+# 解析状态：等待 '['、等待第一个元素或 ']'、等待 ',' 或 ']'、等待下一个元素
+_START, _FIRST, _AFTER, _ELEMENT = range(4)
+
+
+def _refill(f: TextIO, buf: str, pos: int, chunk_size: int):
+    """丢弃已解析的部分并追加一块新数据，返回 (buf, pos, eof)"""
+    chunk = f.read(chunk_size)
+    return buf[pos:] + chunk, 0, not chunk
+
+
+def iter_json_array(f: TextIO, chunk_size: int = CHUNK_SIZE) -> Iterator:
+    """
+    逐个产出文件中顶层 JSON 数组的元素
+    格式错误或文件被截断时抛出 json.JSONDecodeError（与 json.load 一致）
+    """
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+    state = _START
+    while True:
+        pos = _WHITESPACE.match(buf, pos).end()
+        if pos == len(buf):
+            if eof:
+                raise json.JSONDecodeError("数组未结束", buf, pos)
+            buf, pos, eof = _refill(f, buf, pos, chunk_size)
+            continue
+        char = buf[pos]
+        if state == _START:
+            if char != "[":
+                raise json.JSONDecodeError("顶层不是数组", buf, pos)
+            pos += 1
+            state = _FIRST
+            continue
+        if char == "]" and state in (_FIRST, _AFTER):
+            break
+        if state == _AFTER:
+            if char != ",":
+                raise json.JSONDecodeError("数组元素之间缺少逗号", buf, pos)
+            pos += 1
+            state = _ELEMENT
+            continue
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # 元素跨越了块边界，读入更多数据后重试
+            buf, pos, eof = _refill(f, buf, pos, chunk_size)
+            continue
+        if not eof and char in _NUMBER_START and (end == len(buf) or buf[end] not in _NUMBER_END):
+            # 数字可能在块末尾被截断（如 "1.5e" 后面还有 "3"），读入更多数据后重新解码
+            buf, pos, eof = _refill(f, buf, pos, chunk_size)
+            continue
+        yield value
+        pos = end
+        state = _AFTER
+    # 数组结束后只允许空白
+    pos += 1
+    while True:
+        pos = _WHITESPACE.match(buf, pos).end()
+        if pos < len(buf):
+            raise json.JSONDecodeError("数组之后有多余的数据", buf, pos)
+        if eof:
+            return
+        buf, pos, eof = _refill(f, buf, pos, chunk_size)
+
+
+def iter_user_file(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[User]:
+    """
+    逐个读取快照文件中的用户，适合在超大文件上做扫描（找到目标后可提前结束）
+    只读取快照本身，不包含日志中尚未合并的变更
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for user_data in iter_json_array(f, chunk_size):
+            yield User.from_dict(user_data)
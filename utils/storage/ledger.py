@@ -0,0 +1,134 @@
+import json
+import os
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+from models.transaction import Transaction
+from utils.metrics import instrument
+from utils.storage.file_lock import FileLock
+
+# 复用同一个编码器：json.dumps 带非默认参数时每次调用都会新建编码器
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+class Ledger:
+    """
+    只追加的交易流水账：每行一条紧凑的 JSON 记录，流水号全局递增
+    内存中为每个用户维护 (流水号, 文件偏移) 索引，按游标翻页时只读取该页的记录
+    """
+
+    def __init__(self, path: str = "data/users.ledger"):
+        self.path = path
+        data_dir = os.path.dirname(path)
+        if data_dir:
+            os.makedirs(data_dir, exist_ok=True)
+        # user_id -> 按流水号升序排列的流水号、文件偏移
+        self._ids: Dict[str, array] = {}
+        self._offsets: Dict[str, array] = {}
+        self._last_id = 0
+        # 已建立索引的文件末尾偏移
+        self._indexed_offset = 0
+        self._lock = threading.RLock()
+        # 多个进程共用同一账本时串行化追加，保证流水号不重复
+        self._file_lock = FileLock(path + ".lock")
+        self._catch_up()
+
+    def _catch_up(self) -> None:
+        """为文件中尚未建立索引的记录（包括其他进程追加的）建立索引"""
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(self._indexed_offset)
+            offset = self._indexed_offset
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # 其他进程正在写入的半行，下次再读
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 写入时崩溃留下的残缺记录，追加前会被截掉
+                    break
+                self._index(record["user_id"], record["id"], offset)
+                offset += len(line)
+        self._indexed_offset = offset
+
+    def _index(self, user_id: str, transaction_id: int, offset: int) -> None:
+        """把一条记录加入索引"""
+        if user_id not in self._ids:
+            self._ids[user_id] = array('q')
+            self._offsets[user_id] = array('q')
+        self._ids[user_id].append(transaction_id)
+        self._offsets[user_id].append(offset)
+        self._last_id = max(self._last_id, transaction_id)
+
+    def _is_stale(self) -> bool:
+        """文件是否有尚未建立索引的记录"""
+        try:
+            return os.path.getsize(self.path) != self._indexed_offset
+        except FileNotFoundError:
+            return False
+
+    @instrument("ledger.append_many")
+    def append_many(self, entries: Iterable[Tuple[str, str, int, int]]) -> List[Transaction]:
+        """
+        追加多条记录，只写入一次
+        entries: (user_id, 交易类型, 金额（分）, 交易后余额（分）) 的序列
+        """
+        entries = list(entries)
+        if not entries:
+            return []
+        with self._lock, self._file_lock:
+            self._catch_up()
+            if self._is_stale():
+                # 持有文件锁时不会有其他进程正在写入，未能建立索引的尾部是崩溃留下的半行，
+                # 截掉后再追加，否则新记录接在半行后面，索引的偏移全部错位
+                os.truncate(self.path, self._indexed_offset)
+            transactions = []
+            for user_id, type, amount_cents, balance_after_cents in entries:
+                self._last_id += 1
+                transactions.append(Transaction(self._last_id, user_id, type, amount_cents, balance_after_cents))
+            lines = [_ENCODER.encode(t.to_dict()).encode('utf-8') + b"\n"
+                     for t in transactions]
+            with open(self.path, 'ab') as f:
+                f.write(b"".join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+            offset = self._indexed_offset
+            for transaction, line in zip(transactions, lines):
+                self._index(transaction.user_id, transaction.transaction_id, offset)
+                offset += len(line)
+            self._indexed_offset = offset
+        return transactions
+
+    def append(self, user_id: str, type: str, amount_cents: int, balance_after_cents: int) -> Transaction:
+        """追加一条记录（金额以分为单位）"""
+        return self.append_many([(user_id, type, amount_cents, balance_after_cents)])[0]
+
+    @instrument("ledger.history")
+    def history(self, user_id: str, limit: int = 50,
+                cursor: Optional[int] = None) -> Tuple[List[Transaction], Optional[int]]:
+        """
+        按时间倒序返回用户的一页交易记录
+        cursor: 上一页返回的游标（只返回流水号小于它的记录），None 表示从最新一条开始
+        返回 (记录列表, 下一页游标)，没有更早的记录时游标为 None
+        """
+        with self._lock:
+            if self._is_stale():
+                self._catch_up()
+            ids = self._ids.get(user_id)
+            if not ids or limit <= 0:
+                return [], None
+            end = bisect_left(ids, cursor) if cursor is not None else len(ids)
+            start = max(0, end - limit)
+            offsets = self._offsets[user_id][start:end]
+            next_cursor = ids[start] if start > 0 else None
+        transactions = []
+        with open(self.path, 'rb') as f:
+            for offset in reversed(offsets):
+                f.seek(offset)
+                transactions.append(Transaction.from_dict(json.loads(f.readline())))
+        return transactions, next_cursor
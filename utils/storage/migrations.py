@@ -0,0 +1,34 @@
+"""
+数据迁移工具
+
+用法: python -m utils.storage.migrations [--storage json|binary|sqlite|mmap] [--data-file PATH]
+"""
+import argparse
+from utils.data_manager import DataManager
+from utils.storage.base import StorageError
+
+
+def migrate_balances_to_cents(data_manager: DataManager) -> int:
+    """
+    把以元为单位的浮点数余额（旧格式的 balance 字段）整体改写为整数分 balance_cents
+    读取旧数据时已自动换算，这里把换算结果写回存储；返回迁移的用户数
+    """
+    users = data_manager.load_users()
+    if not data_manager.save_users(users):
+        raise StorageError("写回迁移后的数据失败")
+    return len(users)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="把账户余额迁移为整数分")
+    parser.add_argument("--storage", help="存储后端（json / binary / sqlite / mmap），默认读取环境变量 BANK_STORAGE")
+    parser.add_argument("--data-file", help="数据文件路径")
+    args = parser.parse_args()
+    data_manager = DataManager(args.data_file, storage=args.storage)
+    count = migrate_balances_to_cents(data_manager)
+    data_manager.close()
+    print(f"已迁移 {count} 个账户")
+
+
+if __name__ == "__main__":
+    main()
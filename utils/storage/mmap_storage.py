@@ -0,0 +1,436 @@
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from models.user import User
+from utils.metrics import instrument_methods
+from utils.storage.atomic_file import atomic_write
+from utils.storage.base import ConcurrentModificationError, StorageBackend, StorageError
+from utils.storage.file_lock import FileLock
+from utils.storage.journal import Journal
+from utils.storage.username_index import UsernameIndex
+
+MAGIC = b"BNKM"
+FORMAT_VERSION = 1
+# 槽位大小整除页大小，任何槽位都不跨页，原地更新一个账户只弄脏一页
+RECORD_SIZE = 512
+# 文件头占用第 0 个槽位的位置：magic | 格式版本 | 槽位大小 | 槽位数 | 结构版本号
+# 结构版本号在增删用户、修改用户名时加 1，其他进程据此重建索引
+HEADER = struct.Struct("<4sHHQQ")
+# 定长字符串字段及其最大字节数，每个字段前有 1 字节长度，0xFF 表示 None
+STRING_FIELDS = (("user_id", 64), ("username", 64), ("password", 160),
+                 ("session_token", 64), ("last_login", 32), ("created_at", 32))
+NULL_LENGTH = 0xFF
+_FIELDS_FORMAT = "<qqB" + "".join(f"B{size}s" for _, size in STRING_FIELDS)
+RECORD = struct.Struct(_FIELDS_FORMAT + f"{RECORD_SIZE - struct.calcsize(_FIELDS_FORMAT)}x")
+# 槽位开头的余额、版本号和状态位；存取款只改写这 17 字节
+FIXED = struct.Struct("<qqB")
+FLAGS_OFFSET = 16
+# 建立索引时只需解码到用户名为止
+PREFIX = struct.Struct(_FIELDS_FORMAT[:_FIELDS_FORMAT.index("B160s")])
+
+# 状态位
+FLAG_LIVE = 1
+FLAG_FROZEN = 2
+FLAG_LOST = 4
+FLAG_USING = 8
+
+INITIAL_CAPACITY = 64
+
+
+def _pack(user: User, version: int) -> bytes:
+    """把用户编码为一个槽位，字段超长或超出范围时抛出 ValueError"""
+    flags = (FLAG_LIVE | (FLAG_FROZEN if user.is_frozen else 0) | (FLAG_LOST if user.is_lost else 0)
+             | (FLAG_USING if user.is_using else 0))
+    values = [user.balance_cents, version, flags]
+    for name, size in STRING_FIELDS:
+        value = getattr(user, name)
+        if value is None:
+            values += (NULL_LENGTH, b"")
+            continue
+        data = value.encode("utf-8")
+        if len(data) > size:
+            raise ValueError(f"字段 {name} 超过 {size} 字节")
+        values += (len(data), data)
+    try:
+        return RECORD.pack(*values)
+    except struct.error as e:
+        # 余额或版本号超出 64 位整数范围
+        raise ValueError(f"字段超出范围: {e}") from None
+
+
+def _unpack(data: bytes) -> Optional[User]:
+    """解码一个槽位，空闲槽位返回 None"""
+    balance_cents, version, flags, *fields = RECORD.unpack(data)
+    if not flags & FLAG_LIVE:
+        return None
+    strings = [None if length == NULL_LENGTH else raw[:length].decode("utf-8")
+               for length, raw in zip(fields[::2], fields[1::2])]
+    return User(strings[0], strings[1], strings[2], is_frozen=bool(flags & FLAG_FROZEN),
+                is_lost=bool(flags & FLAG_LOST), is_using=bool(flags & FLAG_USING),
+                session_token=strings[3], last_login=strings[4], created_at=strings[5],
+                balance_cents=balance_cents, version=version)
+
+
+def _offset(slot: int) -> int:
+    """第 slot 个槽位在文件中的偏移"""
+    return RECORD_SIZE * (slot + 1)
+
+
+@instrument_methods("storage")
+class MmapStorage(StorageBackend):
+    """
+    内存映射的定长槽位存储：每个账户占据固定偏移的槽位，内存中只保留
+    user_id -> 槽位号和用户名索引。更新账户时原地改写槽位并只刷新所在的页，
+    每笔交易的 I/O 与账户总数无关
+    """
+
+    def __init__(self, data_file: str = "data/users.dat", flush: bool = True):
+        """
+        flush: 每次写入后把弄脏的页刷到磁盘（msync），False 表示交给操作系统
+        """
+        self.data_file = data_file
+        self.flush = flush
+        data_dir = os.path.dirname(data_file)
+        if data_dir:
+            os.makedirs(data_dir, exist_ok=True)
+        self._file = None
+        self._mm: Optional[mmap.mmap] = None
+        # 当前映射的文件 inode 和结构版本号，用于感知其他进程的修改
+        self._inode: Optional[int] = None
+        self._layout = 0
+        self._slots: Dict[str, int] = {}
+        self._username_index = UsernameIndex()
+        self._free: List[int] = []
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(data_file + ".lock")
+        # 批量更新的重做日志：先记录整批结果再原地改写，中途崩溃时重放
+        self._journal = Journal(data_file + ".journal")
+        with self._lock, self._file_lock:
+            if not os.path.exists(data_file):
+                self._write_file([])
+            self._open()
+            self._recover()
+
+    def _write_file(self, packed: List[bytes]) -> None:
+        """原子地写出一个包含给定槽位的新文件"""
+        def write(f):
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, RECORD_SIZE, len(packed), 0).ljust(RECORD_SIZE, b"\0"))
+            f.writelines(packed)
+        atomic_write(self.data_file, write, binary=True)
+
+    def _open(self) -> None:
+        """（重新）打开并映射数据文件，重建索引"""
+        self._close_file()
+        self._file = open(self.data_file, 'r+b')
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        if len(self._mm) < RECORD_SIZE:
+            raise StorageError(f"数据文件 {self.data_file} 已损坏: 缺少文件头")
+        magic, version, record_size, _, _ = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION or record_size != RECORD_SIZE:
+            raise StorageError(f"数据文件 {self.data_file} 不是受支持的账户文件")
+        self._rebuild_index()
+
+    def _close_file(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+            self._mm = self._file = None
+
+    def _header(self) -> Tuple[int, int]:
+        """返回 (槽位数, 结构版本号)"""
+        return HEADER.unpack_from(self._mm, 0)[3:]
+
+    def _set_header(self, slot_count: int, layout: int) -> None:
+        HEADER.pack_into(self._mm, 0, MAGIC, FORMAT_VERSION, RECORD_SIZE, slot_count, layout)
+        self._flush(0, HEADER.size)
+        self._layout = layout
+
+    def _remap(self) -> None:
+        """文件被其他进程扩容后重新映射"""
+        if os.fstat(self._file.fileno()).st_size != len(self._mm):
+            self._mm.close()
+            self._mm = mmap.mmap(self._file.fileno(), 0)
+
+    def _rebuild_index(self) -> None:
+        """扫描所有槽位，重建 user_id 和用户名索引"""
+        slot_count, self._layout = self._header()
+        self._remap()
+        slots, usernames, free = {}, [], []
+        for slot in range(slot_count):
+            _, _, flags, id_length, user_id, name_length, username = PREFIX.unpack_from(self._mm, _offset(slot))
+            if not flags & FLAG_LIVE:
+                free.append(slot)
+                continue
+            user_id = user_id[:id_length].decode("utf-8")
+            slots[user_id] = slot
+            usernames.append((username[:name_length].decode("utf-8"), user_id))
+        # 优先复用编号小的空闲槽位
+        free.reverse()
+        self._slots, self._username_index, self._free = slots, UsernameIndex(usernames), free
+
+    def _ensure_fresh(self) -> None:
+        """其他进程整体替换了文件或增删了用户时同步映射和索引"""
+        if os.stat(self.data_file).st_ino != self._inode:
+            self._open()
+        elif self._header()[1] != self._layout:
+            self._rebuild_index()
+
+    def _recover(self) -> None:
+        """重放上次批量更新中途崩溃留下的重做日志"""
+        if self._journal.size() == 0:
+            return
+        for record in self._journal.replay(repair=True):
+            for sub_record in record["records"]:
+                user = User.from_dict(sub_record["user"])
+                found = self._lookup(user.user_id)
+                if found is not None:
+                    self._write_user(found[0], found[1], _pack(user, user.version), user.username, flush=False)
+        if self.flush:
+            self._mm.flush()
+        self._journal.truncate()
+
+    def _flush(self, start: int, length: int) -> None:
+        """把 [start, start + length) 所在的页刷到磁盘"""
+        if self.flush:
+            page_start = start - start % mmap.PAGESIZE
+            self._mm.flush(page_start, start + length - page_start)
+
+    def _read_slot(self, slot: int) -> Optional[User]:
+        """读取一个槽位"""
+        start = _offset(slot)
+        if start + RECORD_SIZE > len(self._mm):
+            return None
+        data = self._mm[start:start + RECORD_SIZE]
+        # 其他进程可能正在原地改写该槽位，连续两次读到相同内容才采用
+        while True:
+            again = self._mm[start:start + RECORD_SIZE]
+            if again == data:
+                return _unpack(data)
+            data = again
+
+    def _lookup(self, user_id: str) -> Optional[Tuple[int, User]]:
+        """按 user_id 查找，返回 (槽位号, 用户)"""
+        slot = self._slots.get(user_id)
+        if slot is None:
+            return None
+        user = self._read_slot(slot)
+        if user is None or user.user_id != user_id:
+            # 槽位刚被其他进程删除或复用，重建索引后再找一次
+            self._rebuild_index()
+            slot = self._slots.get(user_id)
+            user = self._read_slot(slot) if slot is not None else None
+            if user is None:
+                return None
+        return slot, user
+
+    def _write_user(self, slot: int, old_user: User, packed: bytes, username: str, flush: bool = True) -> None:
+        """原地改写槽位；用户名变化时维护索引。flush 为 False 时由调用方统一刷盘"""
+        start = _offset(slot)
+        if self._mm[start + FIXED.size:start + RECORD_SIZE] == packed[FIXED.size:]:
+            # 只有余额、版本号或状态变化：只改写槽位开头的定长部分
+            self._mm[start:start + FIXED.size] = packed[:FIXED.size]
+        else:
+            self._mm[start:start + RECORD_SIZE] = packed
+        if flush:
+            self._flush(start, RECORD_SIZE)
+        if username != old_user.username:
+            del self._username_index[old_user.username]
+            self._username_index[username] = old_user.user_id
+            slot_count, layout = self._header()
+            self._set_header(slot_count, layout + 1)
+
+    def _reserve(self, slot_count: int) -> None:
+        """确保文件能容纳 slot_count 个槽位，不够时按倍数扩容"""
+        size = _offset(slot_count)
+        if size <= len(self._mm):
+            return
+        capacity = max(INITIAL_CAPACITY, 2 * (len(self._mm) // RECORD_SIZE - 1), slot_count)
+        os.ftruncate(self._file.fileno(), _offset(capacity))
+        self._mm.close()
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+
+    @contextmanager
+    def _exclusive(self):
+        """写操作的临界区：持有线程锁和文件锁，并先同步其他进程的修改"""
+        with self._lock, self._file_lock:
+            self._ensure_fresh()
+            # 日志非空说明有写入者在批量更新中途崩溃
+            self._recover()
+            yield
+
+    def iter_users(self) -> Iterator[User]:
+        """按槽位顺序逐个读取用户"""
+        with self._lock:
+            self._ensure_fresh()
+            slots = sorted(self._slots.values())
+        for slot in slots:
+            with self._lock:
+                user = self._read_slot(slot)
+            if user is not None:
+                yield user
+
+    def load_users(self) -> List[User]:
+        """加载所有用户"""
+        return list(self.iter_users())
+
+    def save_users(self, users: List[User]) -> bool:
+        """用给定的用户列表整体替换文件（写新文件后原子替换）"""
+        with self._lock, self._file_lock:
+            try:
+                self._write_file([_pack(user, user.version) for user in users])
+            except (OSError, ValueError) as e:
+                print(f"保存用户数据时出错: {e}")
+                return False
+            # 新文件已包含全部数据，未完成的批量更新作废
+            self._journal.truncate()
+            self._open()
+            return True
+
+    def find_user_by_username(self, username: str) -> Optional[User]:
+        """根据用户名查找用户"""
+        with self._lock:
+            self._ensure_fresh()
+            user_id = self._username_index.get(username)
+            found = self._lookup(user_id) if user_id is not None else None
+        return found[1] if found and found[1].username == username else None
+
+    def find_user_by_id(self, user_id: str) -> Optional[User]:
+        """根据用户ID查找用户"""
+        with self._lock:
+            self._ensure_fresh()
+            found = self._lookup(user_id)
+        return found[1] if found else None
+
+    def search_users(self, prefix: str, ignore_case: bool = True, offset: int = 0,
+                     limit: int = 20) -> Tuple[int, List[User]]:
+        """按用户名前缀分页查找"""
+        with self._lock:
+            self._ensure_fresh()
+            total, user_ids = self._username_index.search(prefix, ignore_case, offset, limit)
+            found = [self._lookup(user_id) for user_id in user_ids]
+        return total, [f[1] for f in found if f]
+
+    def add_user(self, user: User) -> bool:
+        """添加新用户：优先复用已删除用户的槽位，否则追加到末尾"""
+        return self.add_users([user])
+
+    def add_users(self, users: List[User]) -> bool:
+        """批量添加：写完所有槽位后统一刷盘并更新一次文件头，任一用户名或ID已存在时整批不添加"""
+        with self._exclusive():
+            usernames = {user.username for user in users}
+            user_ids = {user.user_id for user in users}
+            if (len(usernames) != len(users) or len(user_ids) != len(users)
+                    or any(name in self._username_index for name in usernames)
+                    or any(user_id in self._slots for user_id in user_ids)):
+                return False
+            try:
+                packed = [_pack(user, user.version) for user in users]
+            except ValueError as e:
+                print(f"保存用户数据时出错: {e}")
+                return False
+            slot_count, layout = self._header()
+            slots = [self._free.pop() for _ in range(min(len(users), len(self._free)))]
+            appended = len(users) - len(slots)
+            slots.extend(range(slot_count, slot_count + appended))
+            slot_count += appended
+            self._reserve(slot_count)
+            for slot, data in zip(slots, packed):
+                start = _offset(slot)
+                self._mm[start:start + RECORD_SIZE] = data
+            if slots:
+                start = _offset(min(slots))
+                self._flush(start, _offset(max(slots)) + RECORD_SIZE - start)
+            # 先写槽位再更新文件头，其他进程看到新的槽位数时槽位内容已经完整
+            self._set_header(slot_count, layout + 1)
+            for slot, user in zip(slots, users):
+                self._slots[user.user_id] = slot
+                self._username_index[user.username] = user.user_id
+            return True
+
+    def _check_update(self, users: List[User]) -> Optional[List[Tuple[int, User, bytes, str]]]:
+        """
+        校验一批更新并编码新的槽位，返回 [(槽位号, 旧用户, 新槽位, 新用户名)]
+        用户不存在、新用户名冲突或字段超长时返回 None，版本冲突时抛出 ConcurrentModificationError
+        """
+        found = [self._lookup(user.user_id) for user in users]
+        if any(item is None for item in found):
+            return None
+        conflicts = [user.user_id for user, (_, old_user) in zip(users, found) if user.version != old_user.version]
+        if conflicts:
+            raise ConcurrentModificationError(conflicts)
+        if any(user.username != old_user.username and user.username in self._username_index
+               for user, (_, old_user) in zip(users, found)):
+            return None
+        try:
+            return [(slot, old_user, _pack(user, user.version + 1), user.username)
+                    for user, (slot, old_user) in zip(users, found)]
+        except ValueError as e:
+            print(f"保存用户数据时出错: {e}")
+            return None
+
+    def update_user(self, user: User) -> bool:
+        """原地更新用户（按版本号比较并交换），只刷新槽位所在的页"""
+        with self._exclusive():
+            planned = self._check_update([user])
+            if planned is None:
+                return False
+            self._write_user(*planned[0])
+        user.version += 1
+        return True
+
+    def update_users(self, users: List[User]) -> bool:
+        """
+        批量更新：先把整批结果写入重做日志并 fsync，再逐个原地改写槽位，
+        中途崩溃时由下一次写入或重新打开时重放日志，整批要么全部生效要么全部不生效
+        """
+        with self._exclusive():
+            planned = self._check_update(users)
+            if planned is None:
+                return False
+            if len(planned) > 1:
+                records = [{"op": "put", "user": _unpack(packed).to_dict()} for _, _, packed, _ in planned]
+                try:
+                    self._journal.append({"op": "batch", "records": records})
+                except OSError as e:
+                    print(f"写入日志时出错: {e}")
+                    return False
+            batch = len(planned) > 1
+            for item in planned:
+                # 整批已记入日志，槽位改写完后统一刷盘一次，不必每个槽位 msync
+                self._write_user(*item, flush=not batch)
+            if batch:
+                if self.flush:
+                    self._mm.flush()
+                self._journal.truncate()
+        for user in users:
+            user.version += 1
+        return True
+
+    def delete_user(self, user_id: str) -> bool:
+        """删除用户：清除槽位的占用标记，槽位留给之后添加的用户"""
+        with self._exclusive():
+            found = self._lookup(user_id)
+            if found is None:
+                return False
+            slot, user = found
+            start = _offset(slot)
+            self._mm[start + FLAGS_OFFSET] = 0
+            self._flush(start, RECORD_SIZE)
+            slot_count, layout = self._header()
+            self._set_header(slot_count, layout + 1)
+            del self._slots[user_id]
+            del self._username_index[user.username]
+            self._free.append(slot)
+            return True
+
+    def close(self) -> None:
+        """刷新并关闭映射"""
+        with self._lock:
+            if self._mm is not None:
+                self._mm.flush()
+            self._close_file()
+            self._journal.close()
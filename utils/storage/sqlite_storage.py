@@ -0,0 +1,257 @@
+import os
+import sqlite3
+import threading
+from typing import Iterator, List, Optional, Tuple
+from models.user import User
+from utils.metrics import instrument_methods
+from utils.storage.base import ConcurrentModificationError, StorageBackend
+
+# 列顺序与 User.to_dict 的字段保持一致
+COLUMNS = ("user_id", "username", "password", "balance_cents", "is_frozen", "is_lost",
+           "is_using", "session_token", "last_login", "created_at", "version")
+# UPDATE 时由参数赋值的列，version 由 SQL 自增
+UPDATE_COLUMNS = COLUMNS[1:-1]
+BOOL_COLUMNS = ("is_frozen", "is_lost", "is_using")
+
+CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    password TEXT NOT NULL,
+    balance_cents INTEGER NOT NULL DEFAULT 0,
+    is_frozen INTEGER NOT NULL DEFAULT 0,
+    is_lost INTEGER NOT NULL DEFAULT 0,
+    is_using INTEGER NOT NULL DEFAULT 0,
+    session_token TEXT,
+    last_login TEXT,
+    created_at TEXT,
+    version INTEGER NOT NULL DEFAULT 0
+)
+"""
+CREATE_USERNAME_INDEX_SQL = "CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username ON users (username)"
+# 忽略大小写的用户名索引，用于前缀查找（SQLite 的 NOCASE 只忽略 ASCII 字母的大小写）
+CREATE_USERNAME_NOCASE_INDEX_SQL = ("CREATE INDEX IF NOT EXISTS idx_users_username_nocase "
+                                    "ON users (username COLLATE NOCASE)")
+
+SELECT_SQL = f"SELECT {', '.join(COLUMNS)} FROM users"
+# 按 rowid 分页扫描
+PAGE_SQL = f"SELECT rowid, {', '.join(COLUMNS)} FROM users WHERE rowid > ? ORDER BY rowid LIMIT ?"
+INSERT_SQL = f"INSERT INTO users ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+UPDATE_SQL = (f"UPDATE users SET {', '.join(c + ' = ?' for c in UPDATE_COLUMNS)}, version = version + 1 "
+              "WHERE user_id = ? AND version = ?")
+DELETE_SQL = "DELETE FROM users WHERE user_id = ?"
+# 用户名前缀区间：[prefix, prefix + U+10FFFF)，区分大小写时再比较前缀本身；
+# 直接按索引顺序返回，仅大小写不同的用户名之间的先后不作保证
+PREFIX_WHERE_SQL = ("WHERE username COLLATE NOCASE >= ? AND username COLLATE NOCASE < ? "
+                    "AND (? OR substr(username, 1, ?) = ?)")
+SEARCH_SQL = (f"{SELECT_SQL} {PREFIX_WHERE_SQL} "
+              "ORDER BY username COLLATE NOCASE LIMIT ? OFFSET ?")
+COUNT_SQL = f"SELECT COUNT(*) FROM users {PREFIX_WHERE_SQL}"
+
+
+@instrument_methods("storage")
+class SqliteStorage(StorageBackend):
+    """SQLite 存储：WAL 模式，按 user_id 和 username 建索引，单行读写"""
+
+    def __init__(self, data_file: str = "data/users.db"):
+        self.data_file = data_file
+        data_dir = os.path.dirname(data_file)
+        if data_dir:
+            os.makedirs(data_dir, exist_ok=True)
+        # sqlite3 会缓存语句，固定的 SQL 文本即相当于预编译语句
+        self._conn = sqlite3.connect(data_file, check_same_thread=False, isolation_level=None)
+        self._lock = threading.RLock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(CREATE_TABLE_SQL)
+            self._migrate()
+            self._conn.execute(CREATE_USERNAME_INDEX_SQL)
+            self._conn.execute(CREATE_USERNAME_NOCASE_INDEX_SQL)
+
+    def _migrate(self) -> None:
+        """为旧版本创建的数据库补充新增的列"""
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(users)")}
+        if "version" not in existing:
+            self._conn.execute("ALTER TABLE users ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        if "balance_cents" not in existing:
+            # 旧表以 REAL 存储元，换算为整数分
+            self._conn.execute("ALTER TABLE users ADD COLUMN balance_cents INTEGER NOT NULL DEFAULT 0")
+            self._conn.execute("UPDATE users SET balance_cents = CAST(ROUND(balance * 100) AS INTEGER)")
+
+    @staticmethod
+    def _to_row(user: User) -> tuple:
+        """User 转换为按 COLUMNS 排列的行"""
+        data = user.to_dict()
+        return tuple(int(data[c]) if c in BOOL_COLUMNS else data[c] for c in COLUMNS)
+
+    @staticmethod
+    def _from_row(row: tuple) -> User:
+        """数据库行转换为 User"""
+        data = dict(zip(COLUMNS, row))
+        for column in BOOL_COLUMNS:
+            data[column] = bool(data[column])
+        return User.from_dict(data)
+
+    def load_users(self) -> List[User]:
+        """加载所有用户"""
+        with self._lock:
+            rows = self._conn.execute(SELECT_SQL + " ORDER BY rowid").fetchall()
+        return [self._from_row(row) for row in rows]
+
+    def iter_users(self, batch_size: int = 1000) -> Iterator[User]:
+        """
+        逐批读取所有用户，内存占用与用户总数无关
+        按 rowid 分页查询，迭代期间不长时间占用连接锁
+        """
+        last_rowid = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(PAGE_SQL, (last_rowid, batch_size)).fetchall()
+            for row in rows:
+                yield self._from_row(row[1:])
+            if len(rows) < batch_size:
+                return
+            last_rowid = rows[-1][0]
+
+    def _rollback(self) -> None:
+        """
+        回滚未结束的写事务（已提交或已回滚时不做任何事）
+        写事务中出现任何异常都要回滚，否则连接停留在事务中，之后的 BEGIN 全部失败，写锁也一直被占用
+        """
+        if self._conn.in_transaction:
+            self._conn.execute("ROLLBACK")
+
+    def save_users(self, users: List[User]) -> bool:
+        """用给定的用户列表整体替换表内容"""
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.execute("DELETE FROM users")
+                self._conn.executemany(INSERT_SQL, (self._to_row(user) for user in users))
+                self._conn.execute("COMMIT")
+                return True
+            except sqlite3.Error as e:
+                self._rollback()
+                print(f"保存用户数据时出错: {e}")
+                return False
+            except BaseException:
+                self._rollback()
+                raise
+
+    def find_user_by_username(self, username: str) -> Optional[User]:
+        """根据用户名查找用户"""
+        with self._lock:
+            row = self._conn.execute(SELECT_SQL + " WHERE username = ?", (username,)).fetchone()
+        return self._from_row(row) if row else None
+
+    def find_user_by_id(self, user_id: str) -> Optional[User]:
+        """根据用户ID查找用户"""
+        with self._lock:
+            row = self._conn.execute(SELECT_SQL + " WHERE user_id = ?", (user_id,)).fetchone()
+        return self._from_row(row) if row else None
+
+    def search_users(self, prefix: str, ignore_case: bool = True, offset: int = 0,
+                     limit: int = 20) -> Tuple[int, List[User]]:
+        """按用户名前缀分页查找（走忽略大小写的用户名索引）"""
+        params = (prefix, prefix + "\U0010ffff", ignore_case, len(prefix), prefix)
+        with self._lock:
+            total = self._conn.execute(COUNT_SQL, params).fetchone()[0]
+            rows = self._conn.execute(SEARCH_SQL, params + (limit, offset)).fetchall()
+        return total, [self._from_row(row) for row in rows]
+
+    def add_user(self, user: User) -> bool:
+        """添加新用户"""
+        with self._lock:
+            try:
+                self._conn.execute(INSERT_SQL, self._to_row(user))
+                return True
+            except sqlite3.IntegrityError:
+                # 用户名或ID已存在
+                return False
+
+    def add_users(self, users: List[User]) -> bool:
+        """批量添加：在一个事务内插入，任一用户名或ID已存在时整批回滚"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(INSERT_SQL, (self._to_row(user) for user in users))
+                self._conn.execute("COMMIT")
+                return True
+            except sqlite3.IntegrityError:
+                self._rollback()
+                return False
+            except sqlite3.Error as e:
+                self._rollback()
+                print(f"保存用户数据时出错: {e}")
+                return False
+            except BaseException:
+                self._rollback()
+                raise
+
+    @staticmethod
+    def _update_params(user: User) -> list:
+        """UPDATE_SQL 的参数"""
+        data = user.to_dict()
+        params = [int(data[c]) if c in BOOL_COLUMNS else data[c] for c in UPDATE_COLUMNS]
+        return params + [user.user_id, user.version]
+
+    def update_user(self, user: User) -> bool:
+        """更新用户信息（单行 UPDATE，按版本号比较并交换）"""
+        params = self._update_params(user)
+        with self._lock:
+            try:
+                cursor = self._conn.execute(UPDATE_SQL, params)
+            except sqlite3.IntegrityError:
+                # 新用户名与其他用户冲突
+                return False
+            if cursor.rowcount == 0:
+                exists = self._conn.execute("SELECT 1 FROM users WHERE user_id = ?",
+                                            (user.user_id,)).fetchone()
+                if exists:
+                    raise ConcurrentModificationError([user.user_id])
+                return False
+        user.version += 1
+        return True
+
+    def update_users(self, users: List[User]) -> bool:
+        """批量更新：在一个事务内执行所有 UPDATE，只提交一次"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                missing, conflicts = False, []
+                for user in users:
+                    if self._conn.execute(UPDATE_SQL, self._update_params(user)).rowcount == 0:
+                        exists = self._conn.execute("SELECT 1 FROM users WHERE user_id = ?",
+                                                    (user.user_id,)).fetchone()
+                        if exists:
+                            conflicts.append(user.user_id)
+                        else:
+                            missing = True
+                if conflicts:
+                    raise ConcurrentModificationError(conflicts)
+                if missing:
+                    self._rollback()
+                    return False
+                self._conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                self._rollback()
+                print(f"保存用户数据时出错: {e}")
+                return False
+            except BaseException:
+                self._rollback()
+                raise
+        for user in users:
+            user.version += 1
+        return True
+
+    def delete_user(self, user_id: str) -> bool:
+        """删除用户"""
+        with self._lock:
+            cursor = self._conn.execute(DELETE_SQL, (user_id,))
+        return cursor.rowcount == 1
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()